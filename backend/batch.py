@@ -0,0 +1,305 @@
+# backend/batch.py
+# Bulk offline restyle: every photo in a folder × the chosen scenario/clothing
+# combinations from assets/prompts.json, using the same services as /generate
+# (optimize → prompt → model → logo overlay → renditions → upload) without
+# going through HTTP. Jobs run on --concurrency workers behind an admission
+# controller that also enforces --rpm. Every finished job is appended to the
+# manifest (JSONL, or SQLite for a .db path), so re-running the same command
+# after a crash or Ctrl-C skips what is already done.
+#
+#   python -m backend.batch photos/ [--scenarios all] [--clothing all] [--concurrency 4]
+#       [--rpm 50] [--tpm 40000] [--manifest batch-manifest.jsonl] [--output-format webp] [--dry-run]
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from .services.admission import AdmissionController, estimate_tokens
+from .services.executor import run_in_executor
+from .services.image_encoder import normalize_format
+from .services.image_pipeline import ImagePipeline
+from .services.ingest import ingest_bytes, UploadRejected
+from .services.metrics import span
+from .services.renditions import encode_renditions, upload_renditions, build_srcset
+from .services.supabase_uploader import upload_image_to_supabase_async
+from .utils.prompts import prompt_catalog
+from .routes.generate import provider_router
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".avif", ".gif", ".bmp", ".tif", ".tiff"}
+
+
+class JsonlManifest:
+    def __init__(self, path: str):
+        self.path = path
+
+    def completed(self) -> set[str]:
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from a crash
+                    if entry.get("status") == "done":
+                        done.add(entry["id"])
+        return done
+
+    def record(self, entry: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteManifest:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, data TEXT, updated_at REAL)"
+        )
+        self._conn.commit()
+
+    def completed(self) -> set[str]:
+        return {row[0] for row in self._conn.execute("SELECT id FROM jobs WHERE status = 'done'")}
+
+    def record(self, entry: dict) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+            (entry["id"], entry["status"], json.dumps(entry), time.time())
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def open_manifest(path: str):
+    return SqliteManifest(path) if path.endswith((".db", ".sqlite", ".sqlite3")) else JsonlManifest(path)
+
+
+def _select(requested: str, available) -> list[str]:
+    if requested == "all":
+        return list(available)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise SystemExit(f"Unknown option(s): {', '.join(unknown)} (available: {', '.join(available)})")
+    return names
+
+
+def find_photos(inputs: list[str]) -> list[Path]:
+    photos = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            photos.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES))
+        else:
+            photos.append(path)
+    return photos
+
+
+# Stable job id: same photo content + prompt text + format → same id across
+# runs; editing a prompt in prompts.json makes its jobs pending again
+def job_id(photo_digest: str, prompt_fingerprint: str, output_format: str) -> str:
+    key = "\x00".join((photo_digest, prompt_fingerprint, output_format))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:20]
+
+
+class BatchRunner:
+    def __init__(self, manifest, concurrency: int = 4, rpm: float = 0, output_format: str | None = None,
+                 upload=None, tpm: float = 0):
+        self.manifest = manifest
+        self.concurrency = concurrency
+        self.output_format = normalize_format(output_format)
+        self.upload = upload or upload_image_to_supabase_async
+        # Same controller as the API: caps concurrent model calls and sleeps
+        # off the --rpm / --tpm budgets (the deadline is effectively unbounded here)
+        self.limiter = AdmissionController(concurrency=concurrency, queue_size=concurrency,
+                                           queue_timeout=1e9, rpm=rpm, tpm=tpm)
+        self.inputs: dict[Path, asyncio.Task] = {}
+        self.latencies: list[float] = []
+        self.model_time = 0.0
+        self.done = self.failed = self.skipped = 0
+
+    # Decode + downscale each photo once, shared by all of its combinations
+    def _model_input(self, photo: Path) -> asyncio.Task:
+        if photo not in self.inputs:
+            async def prepare() -> bytes:
+                upload = ingest_bytes(await asyncio.to_thread(photo.read_bytes))
+                try:
+                    pipeline = await run_in_executor(ImagePipeline.from_upload, upload)
+                    buffer, _ = await run_in_executor(pipeline.model_input, max_size=512, quality=85)
+                finally:
+                    upload.close()
+                return buffer.getvalue()
+            self.inputs[photo] = asyncio.ensure_future(prepare())
+        return self.inputs[photo]
+
+    async def run_job(self, job: dict) -> dict:
+        start = time.perf_counter()
+        optimized = await self._model_input(Path(job["image"]))
+        prompt = prompt_catalog.get(job["scenario"], job["clothing"]).text
+
+        async with self.limiter.slot(images=1, tokens=estimate_tokens(prompt, 512, "1024x1024", "low")):
+            with span("model", source="batch") as model_span:
+                generated = await provider_router.edit(
+                    optimized, prompt, size="1024x1024", quality="low",
+                    output_format="jpeg", output_compression=80
+                )
+
+        result = await run_in_executor(ImagePipeline.from_bytes, generated.images[0])
+        await run_in_executor(result.overlay_logo)
+        renditions = await encode_renditions(result.image, self.output_format)
+        urls = await upload_renditions(renditions, upload=self.upload)
+        return {
+            "image_url": urls[max(urls)],
+            "renditions": {str(width): url for width, url in urls.items()},
+            "srcset": build_srcset(urls),
+            "provider": generated.provider,
+            "model_time": round(model_span.elapsed, 3),
+            "elapsed": round(time.perf_counter() - start, 3),
+        }
+
+    async def _worker(self, queue: asyncio.Queue, total: int) -> None:
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            entry = {key: job[key] for key in ("id", "image", "scenario", "clothing")}
+            try:
+                entry.update(await self.run_job(job), status="done")
+                self.done += 1
+                self.latencies.append(entry["elapsed"])
+                self.model_time += entry["model_time"]
+            except Exception as e:
+                entry.update(status="failed", error=str(e))
+                self.failed += 1
+            entry["ts"] = round(time.time(), 3)
+            self.manifest.record(entry)
+            finished = self.done + self.failed
+            mark = "✅" if entry["status"] == "done" else "❌"
+            print(f"{mark} [{finished}/{total}] {Path(job['image']).name} · {job['scenario']} · {job['clothing']}"
+                  + (f" → {entry['image_url']}" if entry["status"] == "done" else f": {entry['error']}"))
+
+    async def run(self, jobs: list[dict]) -> dict:
+        completed = self.manifest.completed()
+        pending = [job for job in jobs if job["id"] not in completed]
+        self.skipped = len(jobs) - len(pending)
+
+        # Bounded queue: jobs are fed as workers free up, not all at once
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        async def produce():
+            for job in pending:
+                await queue.put(job)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(self._worker(queue, len(pending))) for _ in range(self.concurrency)]
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # A worker that dies (e.g. the manifest can't be written) stops the run
+            for task in tasks:
+                task.cancel()
+        return self.stats(time.perf_counter() - start)
+
+    def stats(self, wall: float) -> dict:
+        ordered = sorted(self.latencies)
+
+        def pct(q: float):
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+        return {
+            "done": self.done,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "wall_time": round(wall, 2),
+            "images_per_minute": round(self.done / wall * 60, 1) if wall else 0.0,
+            "job_p50": pct(0.5),
+            "job_p95": pct(0.95),
+            "model_share": round(self.model_time / sum(ordered), 3) if ordered else None,
+        }
+
+
+def build_jobs(photos: list[Path], scenarios: list[str], clothing: list[str], output_format: str) -> list[dict]:
+    jobs = []
+    for photo in photos:
+        digest = hashlib.sha256(photo.read_bytes()).hexdigest()
+        for scenario, garment in itertools.product(scenarios, clothing):
+            jobs.append({
+                "id": job_id(digest, prompt_catalog.get(scenario, garment).fingerprint, output_format),
+                "image": str(photo),
+                "scenario": scenario,
+                "clothing": garment,
+            })
+    return jobs
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.batch", description="Bulk offline restyle")
+    parser.add_argument("inputs", nargs="+", help="photo files or folders")
+    parser.add_argument("--scenarios", default="all", help="comma-separated scenario names, or 'all'")
+    parser.add_argument("--clothing", default="all", help="comma-separated clothing names, or 'all'")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=0, help="provider requests per minute (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="provider tokens per minute (0 = unlimited)")
+    parser.add_argument("--manifest", default="batch-manifest.jsonl", help=".jsonl, or .db for SQLite")
+    parser.add_argument("--output-format", default=None)
+    parser.add_argument("--dry-run", action="store_true", help="list pending jobs and exit")
+    args = parser.parse_args(argv)
+
+    data = prompt_catalog.data()
+    scenarios = _select(args.scenarios, data["scenario"])
+    clothing = _select(args.clothing, data["clothing"])
+    photos = find_photos(args.inputs)
+    output_format = normalize_format(args.output_format)
+
+    # Unreadable files are reported up front instead of failing every combination
+    readable = []
+    for photo in photos:
+        try:
+            ingest_bytes(photo.read_bytes()).close()
+            readable.append(photo)
+        except (OSError, UploadRejected) as e:
+            print(f"⚠️ Skipping {photo}: {e}")
+    jobs = build_jobs(readable, scenarios, clothing, output_format)
+
+    manifest = open_manifest(args.manifest)
+    try:
+        if args.dry_run:
+            completed = manifest.completed()
+            pending = [job for job in jobs if job["id"] not in completed]
+            for job in pending:
+                print(f"{job['id']}  {job['image']}  {job['scenario']}  {job['clothing']}")
+            print(f"{len(pending)} pending, {len(jobs) - len(pending)} already done")
+            return 0
+
+        print(f"📸 {len(readable)} photos × {len(scenarios)} scenarios × {len(clothing)} clothing = {len(jobs)} jobs"
+              f" (concurrency {args.concurrency}, rpm {args.rpm or 'unlimited'})")
+        runner = BatchRunner(manifest, args.concurrency, args.rpm, output_format, tpm=args.tpm)
+        stats = asyncio.run(runner.run(jobs))
+    finally:
+        manifest.close()
+
+    print(f"\nDone {stats['done']}, failed {stats['failed']}, skipped (already done) {stats['skipped']}")
+    print(f"  wall time      {stats['wall_time']}s")
+    print(f"  throughput     {stats['images_per_minute']} images/min")
+    if stats["job_p50"] is not None:
+        print(f"  job latency    p50 {stats['job_p50']}s  p95 {stats['job_p95']}s")
+        print(f"  model share    {stats['model_share']:.0%} of job time")
+    print(f"  manifest       {args.manifest}")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# backend/benchmarks/bench_clients.py
+# Client cold-start cost and connection reuse: a fresh httpx client per
+# request (what the old requests.post/get calls did) vs the pooled registry
+# client. Without --url a local keep-alive server is used and the number of
+# TCP connections it accepted is reported; point --url at a real upstream
+# (e.g. https://<project>.supabase.co/storage/v1/version) to include TLS.
+#
+#   python -m backend.benchmarks.bench_clients [--requests 50] [--concurrency 5] [--url URL]
+import argparse
+import asyncio
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from ..services.clients import ClientRegistry, build_http_client
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections: set = set()
+
+    def setup(self):
+        super().setup()
+        CountingHandler.connections.add(self.client_address)
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_local_server() -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+
+async def run_requests(url: str, total: int, concurrency: int, get_client) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await get_client(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    return time.perf_counter() - start
+
+
+async def fresh_client_get(url: str):
+    async with httpx.AsyncClient() as http:
+        (await http.get(url)).raise_for_status()
+
+
+def cold_start() -> dict[str, float]:
+    # Import + construct cost of each upstream client, as paid on first use
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    registry = ClientRegistry()
+    start = time.perf_counter()
+    from openai import AsyncOpenAI
+    openai_import = time.perf_counter() - start
+    registry.get("http:openai", build_http_client)
+    registry.get("openai", lambda: AsyncOpenAI(http_client=registry.get("http:openai", build_http_client)))
+    start = time.perf_counter()
+    import supabase  # noqa: F401
+    supabase_import = time.perf_counter() - start
+    asyncio.run(registry.aclose())
+    return {
+        "import openai": openai_import,
+        "import supabase": supabase_import,
+        **{f"build {name}": seconds for name, seconds in registry.init_times.items()},
+    }
+
+
+async def connection_reuse(url: str, total: int, concurrency: int, http2: bool) -> dict:
+    results = {}
+    CountingHandler.connections.clear()
+    results["fresh client/request"] = (await run_requests(url, total, concurrency, fresh_client_get),
+                                       len(CountingHandler.connections))
+
+    registry = ClientRegistry()
+    pooled = registry.http("bench", http2=http2)
+
+    async def pooled_get(target):
+        (await pooled.get(target)).raise_for_status()
+
+    await pooled_get(url)  # warm the pool
+    CountingHandler.connections.clear()
+    results["pooled registry"] = (await run_requests(url, total, concurrency, pooled_get),
+                                  len(CountingHandler.connections))
+    await registry.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark client cold start and connection reuse")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--http2", action="store_true")
+    args = parser.parse_args()
+
+    print("Cold start (first use)")
+    for name, seconds in cold_start().items():
+        print(f"  {name:<22} {seconds * 1000:8.1f} ms")
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_local_server()
+    try:
+        results = asyncio.run(connection_reuse(url, args.requests, args.concurrency, args.http2))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(f"\n{args.requests} GETs to {url}, concurrency {args.concurrency}")
+    for name, (seconds, connections) in results.items():
+        opened = f"{connections} connections" if server is not None else "n/a"
+        print(f"  {name:<22} {seconds / args.requests * 1000:8.2f} ms/request   {opened}")
+
+
+if __name__ == "__main__":
+    main()
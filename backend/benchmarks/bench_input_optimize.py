@@ -0,0 +1,126 @@
+# backend/benchmarks/bench_input_optimize.py
+# Input-stage cost over a corpus of representative uploads, per path:
+#   full decode   decode everything, thumbnail, optimize=True (original code)
+#   thumbnail     lazy open, thumbnail's own 2x draft, optimize=True (previous)
+#   current       optimize_input_image: explicit draft, no optimize pass,
+#                 passthrough for uploads already within limits
+# Each case runs in a fresh interpreter so peak RSS (ru_maxrss) is per path.
+#
+#   python -m backend.benchmarks.bench_input_optimize [--runs 5] [--corpus DIR]
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# name → (size, format); photo-like content so JPEG sizes are realistic
+CORPUS = {
+    "12MP phone photo": ((4032, 3024), "JPEG"),
+    "8MP photo": ((3264, 2448), "JPEG"),
+    "3MP photo": ((2048, 1536), "JPEG"),
+    "1080p photo": ((1920, 1080), "JPEG"),
+    "PNG screenshot": ((1170, 2532), "PNG"),
+    "small JPEG (passthrough)": ((480, 360), "JPEG"),
+}
+
+WORKER = r"""
+import json, resource, sys, time
+from io import BytesIO
+from PIL import Image
+from backend.services.optimize_images import optimize_input_image
+
+# High-water RSS in KB. ru_maxrss survives exec on Linux (it would report the
+# parent's peak), so prefer VmHWM, which starts fresh with the new process.
+def peak_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+path, mode, runs = sys.argv[1], sys.argv[2], int(sys.argv[3])
+data = open(path, "rb").read()
+baseline = peak_kb()
+
+def full_decode():
+    with Image.open(BytesIO(data)) as img:
+        img.load()
+        img.thumbnail((512, 512), Image.Resampling.LANCZOS)
+        img.convert("RGB").save(BytesIO(), format="JPEG", quality=85, optimize=True)
+
+def thumbnail():
+    with Image.open(BytesIO(data)) as img:
+        img.thumbnail((512, 512), Image.Resampling.LANCZOS)
+        img.convert("RGB").save(BytesIO(), format="JPEG", quality=85, optimize=True)
+
+def current():
+    with Image.open(BytesIO(data)) as img:
+        optimize_input_image(img, original_size=len(data), source_bytes=data)
+
+fn = {"full decode": full_decode, "thumbnail": thumbnail, "current": current}[mode]
+times = []
+for _ in range(runs):
+    start = time.perf_counter()
+    fn()
+    times.append(time.perf_counter() - start)
+peak = peak_kb()
+print(json.dumps({"ms": sorted(times)[len(times) // 2] * 1000, "peak_mb": (peak - baseline) / 1024}))
+"""
+
+
+def photo(size: tuple[int, int]) -> Image.Image:
+    # Smooth gradient + grain: compresses like a real photo, not like flat colour
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 24)
+    return Image.merge("RGB", (gradient, Image.blend(gradient, noise, 0.3), noise))
+
+
+def build_corpus(directory: Path) -> dict[str, Path]:
+    paths = {}
+    for name, (size, fmt) in CORPUS.items():
+        path = directory / f"{size[0]}x{size[1]}.{fmt.lower()}"
+        if not path.exists():
+            buffer = BytesIO()
+            photo(size).save(buffer, format=fmt, **({"quality": 88} if fmt == "JPEG" else {}))
+            path.write_bytes(buffer.getvalue())
+        paths[name] = path
+    return paths
+
+
+def measure(path: Path, mode: str, runs: int) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", WORKER, str(path), mode, str(runs)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the input optimization paths")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--corpus", type=Path, default=None, help="directory to cache the generated corpus")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = build_corpus(args.corpus or Path(tmp))
+        modes = ("full decode", "thumbnail", "current")
+        print(f"{'case':<26}{'bytes':>10}  " + "".join(f"{m:>22}" for m in modes))
+        for name, path in corpus.items():
+            cells = []
+            for mode in modes:
+                result = measure(path, mode, args.runs)
+                cells.append(f"{result['ms']:8.1f} ms {result['peak_mb']:6.1f} MB")
+            print(f"{name:<26}{path.stat().st_size:>10,}  " + "".join(f"{c:>22}" for c in cells))
+        print("\nms = median per call; MB = peak RSS growth over the loaded file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# backend/benchmarks/bench_logo_overlay.py
+# Per-call cost of the logo overlay, before and after the cached engine.
+#
+#   python -m backend.benchmarks.bench_logo_overlay [--runs 50] [--size 1024]
+import argparse
+import time
+from io import BytesIO
+from PIL import Image
+from ..services.logo_overlay import ASSETS_DIR, LogoOverlayEngine
+
+
+# The original implementation: reads, converts and resizes the logo on every call
+def legacy_apply(base_image: Image.Image) -> Image.Image:
+    logo = Image.open(ASSETS_DIR / "gnb-white-logo.png").convert("RGBA")
+    logo_width = int(base_image.width * 0.30)
+    logo_height = int(logo.height * (logo_width / logo.width))
+    logo = logo.resize((logo_width, logo_height), Image.LANCZOS)
+    position = (base_image.width - logo_width - 20, base_image.height - logo_height - 40)
+    base_image.paste(logo, position, logo)
+    return base_image
+
+
+def time_per_call(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the logo overlay")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--size", type=int, default=1024)
+    args = parser.parse_args()
+
+    base = Image.new("RGBA", (args.size, args.size), (120, 90, 60, 255))
+    buffer = BytesIO()
+    base.convert("RGB").save(buffer, format="JPEG", quality=80)
+    jpeg_bytes = buffer.getvalue()
+
+    engine = LogoOverlayEngine()
+    engine.apply(base.copy())  # warm the asset + resize cache
+
+    results = {
+        "legacy composite": time_per_call(lambda: legacy_apply(base.copy()), args.runs),
+        "engine composite": time_per_call(lambda: engine.apply(base.copy()), args.runs),
+        "copy only (floor)": time_per_call(lambda: base.copy(), args.runs),
+        "engine bytes→PNG": time_per_call(lambda: engine.overlay(jpeg_bytes), args.runs),
+    }
+
+    print(f"Logo overlay on {args.size}x{args.size}, {args.runs} runs")
+    for name, seconds in results.items():
+        print(f"  {name:<20} {seconds * 1000:8.2f} ms/call")
+    speedup = results["legacy composite"] / results["engine composite"]
+    print(f"  composite speedup    {speedup:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# backend/benchmarks/bench_metrics.py
+# Per-span instrumentation overhead: an empty span (context manager and
+# decorator) vs bare perf_counter timing, plus the cost of a /metrics render.
+#
+#   python -m backend.benchmarks.bench_metrics [--runs 200000]
+import argparse
+import time
+from ..services.metrics import MetricsRegistry, span
+
+
+def time_per_call(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark span/histogram overhead")
+    parser.add_argument("--runs", type=int, default=200_000)
+    args = parser.parse_args()
+
+    def bare():
+        start = time.perf_counter()
+        time.perf_counter() - start
+
+    def with_span():
+        with span("bench"):
+            pass
+
+    @span("bench")
+    def decorated():
+        pass
+
+    results = {
+        "loop only (floor)": time_per_call(lambda: None, args.runs),
+        "bare perf_counter": time_per_call(bare, args.runs),
+        "span context": time_per_call(with_span, args.runs),
+        "span decorator": time_per_call(decorated, args.runs),
+    }
+
+    # Scrape cost with a realistic number of series (9 stages × 15 buckets)
+    scrape = MetricsRegistry()
+    histogram = scrape.histogram("bench_seconds", "bench", labels=("stage",))
+    for stage in ("read", "convert", "compress", "prompt", "model", "decode", "overlay", "encode", "upload"):
+        histogram.observe(0.1, stage)
+    render_time = time_per_call(scrape.render, 1000)
+
+    print(f"Instrumentation overhead, {args.runs:,} runs")
+    for name, seconds in results.items():
+        print(f"  {name:<20} {seconds * 1e9:8.0f} ns/call")
+    overhead = results["span context"] - results["bare perf_counter"]
+    print(f"  span over bare       {overhead * 1e9:8.0f} ns/call")
+    print(f"  /metrics render      {render_time * 1e6:8.1f} µs ({len(scrape.render().splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
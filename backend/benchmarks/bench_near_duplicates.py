@@ -0,0 +1,66 @@
+# backend/benchmarks/bench_near_duplicates.py
+# Near-duplicate lookup cost as the index grows: multi-index hashing vs a
+# linear Hamming scan over the same random 64-bit hashes, plus dHash time on
+# a 512px model input.
+#
+#   python -m backend.benchmarks.bench_near_duplicates [--entries 1000000] [--threshold 6]
+import argparse
+import random
+import time
+from io import BytesIO
+from PIL import Image
+from ..services.near_duplicates import MultiIndexHash, dhash_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate index")
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--threshold", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    hashes = [rng.getrandbits(64) for _ in range(args.entries)]
+    start = time.perf_counter()
+    table = MultiIndexHash()
+    for i, h in enumerate(hashes):
+        table.add(i, h, i)
+    build_time = time.perf_counter() - start
+
+    # Half the queries are near copies of indexed hashes, half are new photos
+    queries = []
+    for n in range(args.queries):
+        h = rng.choice(hashes) if n % 2 == 0 else rng.getrandbits(64)
+        for bit in rng.sample(range(64), rng.randrange(0, args.threshold + 1)):
+            h ^= 1 << bit
+        queries.append(h)
+
+    start = time.perf_counter()
+    indexed = [table.nearest(q, args.threshold) for q in queries]
+    index_time = (time.perf_counter() - start) / len(queries)
+
+    scan_queries = queries[:max(1, min(len(queries), 20_000_000 // args.entries))]
+    start = time.perf_counter()
+    scanned = [min((h ^ q).bit_count() for h in hashes) for q in scan_queries]
+    scan_time = (time.perf_counter() - start) / len(scan_queries)
+    agree = all((match[0] if match else None) == (d if d <= args.threshold else None)
+                for match, d in zip(indexed, scanned))
+
+    buffer = BytesIO()
+    Image.effect_mandelbrot((512, 384), (-2, -1.2, 1, 1.2), 64).convert("RGB").save(buffer, format="JPEG")
+    image = buffer.getvalue()
+    start = time.perf_counter()
+    for _ in range(200):
+        dhash_bytes(image)
+    hash_time = (time.perf_counter() - start) / 200
+
+    print(f"Near-duplicate index, {args.entries:,} entries, threshold {args.threshold}")
+    print(f"  build                {build_time:8.2f} s")
+    print(f"  multi-index lookup   {index_time * 1e6:8.1f} µs/query")
+    print(f"  linear scan          {scan_time * 1e6:8.1f} µs/query ({len(scan_queries)} queries)")
+    print(f"  speedup              {scan_time / index_time:8.0f}x (results agree: {agree})")
+    print(f"  dHash of 512px JPEG  {hash_time * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# backend/benchmarks/bench_startup.py
+# Cold-start cost of the Vercel entry point, each run in a fresh interpreter:
+# `-X importtime` for the import of backend.vercel_python_entry (total and
+# heaviest modules), wall time from process start to the first response from
+# the ASGI app, and to the first /generate. The SDK imports and client builds
+# are deferred to that first real call, so it runs against the local fake
+# OpenAI and Storage servers (fake_upstreams.py, no model latency): the
+# deferred cost is counted without any network. --budget-ms makes it exit
+# non-zero when the time to the first generation regresses.
+#
+#   python -m backend.benchmarks.bench_startup [--runs 5] [--top 15] [--budget-ms 1500]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from .load_e2e import free_port, wait_for_port
+
+ENTRY = "backend.vercel_python_entry"
+ROOT = Path(__file__).resolve().parents[2]
+# Heavy SDKs that should stay out of the import path
+DEFERRED = ("openai", "supabase", "google.cloud.aiplatform_v1")
+
+FIRST_REQUEST = f"""
+import time
+start = time.perf_counter()
+import asyncio, json, sys, httpx
+from {ENTRY} import app
+imported = time.perf_counter()
+
+from io import BytesIO
+from PIL import Image
+
+photo = BytesIO()
+Image.new("RGB", (1200, 900), "orange").save(photo, format="JPEG")
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+        # Framework only: routing and middleware, no upstream client touched
+        probe = await http.get("/api/jobs/cold-start")
+        probed = time.perf_counter()
+        loaded = [m for m in {DEFERRED!r} if m in sys.modules]
+        # First real call: imports the SDKs and builds the OpenAI + Supabase clients
+        generated = await http.post(
+            "/api/generate", files={{"file": ("dog.jpg", photo.getvalue(), "image/jpeg")}}
+        )
+        return probe, probed, loaded, generated
+
+probe, probed, loaded, generated = asyncio.run(first_requests())
+done = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - start,
+    "first_request_s": probed - start,
+    "first_generate_s": done - probed,
+    "first_generation_s": done - start,
+    "status": probe.status_code,
+    "generate_status": generated.status_code,
+    "loaded": loaded,
+    "loaded_after_generate": [m for m in {DEFERRED!r} if m in sys.modules],
+}}))
+"""
+
+
+def bench_env(upstreams: tuple[int, int] | None = None) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    env.setdefault("SUPABASE_URL", "http://localhost")
+    env.setdefault("SUPABASE_API_KEY", "bench")
+    if upstreams is not None:
+        openai_port, storage_port = upstreams
+        env.update({
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+            "SUPABASE_URL": f"http://127.0.0.1:{storage_port}",
+            "RESULT_CACHE_DB": "",  # a persisted hit would skip the model call
+        })
+    return env
+
+
+# Fake OpenAI + Storage with no injected latency, on free local ports
+def start_fake_upstreams() -> tuple[subprocess.Popen, tuple[int, int]]:
+    ports = (free_port(), free_port())
+    process = subprocess.Popen([
+        sys.executable, "-m", "backend.benchmarks.fake_upstreams",
+        "--openai-port", str(ports[0]), "--storage-port", str(ports[1]),
+        "--model-latency", "0", "--storage-latency", "0",
+    ], cwd=ROOT)
+    try:
+        for port in ports:
+            wait_for_port(port, process)
+    except Exception:
+        process.terminate()
+        raise
+    return process, ports
+
+
+def import_times() -> tuple[float, list[tuple[float, str]]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY}"],
+        cwd=ROOT, env=bench_env(), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.append((int(cumulative) / 1e6, name.strip()))
+    total = next(seconds for seconds, name in modules if name == ENTRY)
+    return total, modules
+
+
+def first_request(upstreams: tuple[int, int]) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST],
+        cwd=ROOT, env=bench_env(upstreams), capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the serverless entry point")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if median time to the first generation exceeds this")
+    args = parser.parse_args()
+
+    fakes, upstreams = start_fake_upstreams()
+    try:
+        first_request(upstreams)  # compile .pyc files so every measured run is comparable
+        runs = [first_request(upstreams) for _ in range(args.runs)]
+    finally:
+        fakes.terminate()
+
+    total, modules = import_times()
+    print(f"import {ENTRY}: {total * 1000:.0f} ms (-X importtime, cumulative)")
+    for seconds, name in sorted(modules, reverse=True)[1:args.top + 1]:
+        print(f"  {name:<40} {seconds * 1000:8.1f} ms")
+
+    def median_ms(key: str) -> float:
+        return statistics.median(r[key] for r in runs) * 1000
+
+    generation_ms = median_ms("first_generation_s")
+    print(f"\n{args.runs} fresh processes (median)")
+    print(f"  import app               {median_ms('import_s'):8.1f} ms")
+    print(f"  time to first request    {median_ms('first_request_s'):8.1f} ms   (status {runs[0]['status']})")
+    print(f"  deferred SDKs loaded     {', '.join(runs[0]['loaded']) or 'none'}")
+    print(f"  first /generate          {median_ms('first_generate_s'):8.1f} ms   "
+          f"(status {runs[0]['generate_status']}, SDK imports + client builds + pipeline)")
+    print(f"  time to first generation {generation_ms:8.1f} ms")
+    print(f"  SDKs loaded by then      {', '.join(runs[0]['loaded_after_generate']) or 'none'}")
+
+    if args.budget_ms is not None and generation_ms > args.budget_ms:
+        print(f"❌ Over budget: {generation_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
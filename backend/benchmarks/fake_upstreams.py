@@ -0,0 +1,124 @@
+# backend/benchmarks/fake_upstreams.py
+# Local stand-ins for the OpenAI images API and Supabase Storage, with
+# injectable latency (log-normal around a median) and failure rates, so the
+# real app can be load-tested end to end without network or spend. Serves
+# both on one event loop:
+#
+#   python -m backend.benchmarks.fake_upstreams [--openai-port 9101] [--storage-port 9102]
+#       [--model-latency 2.0] [--model-failure-rate 0.0] [--storage-latency 0.08]
+import argparse
+import asyncio
+import base64
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from io import BytesIO
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+
+@dataclass
+class FaultProfile:
+    latency: float = 0.0   # median seconds
+    sigma: float = 0.25    # log-normal spread; 0 = fixed latency
+    failure_rate: float = 0.0
+    failure_status: int = 500
+    seed: int = 7
+    rng: random.Random = field(init=False)
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+
+    def delay(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        return self.latency * math.exp(self.rng.gauss(0, self.sigma)) if self.sigma else self.latency
+
+    def fails(self) -> bool:
+        return self.rng.random() < self.failure_rate
+
+    async def apply(self) -> JSONResponse | None:
+        await asyncio.sleep(self.delay())
+        if self.fails():
+            headers = {"retry-after": "1"} if self.failure_status == 429 else {}
+            return JSONResponse({"error": {"message": "injected failure"}}, self.failure_status, headers=headers)
+        return None
+
+
+# What the fake model returns: a 1024px JPEG with some structure
+def model_result_b64(size: int = 1024) -> str:
+    image = Image.effect_mandelbrot((size, size), (-2, -1.5, 1, 1.5), 80).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def build_fake_openai(profile: FaultProfile) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+    result = model_result_b64()
+
+    @app.post("/v1/images/edits")
+    async def edit(request: Request):
+        app.state.calls += 1
+        form = await request.form()
+        failure = await profile.apply()
+        if failure is not None:
+            return failure
+        n = int(form.get("n") or 1)
+        return {"created": int(time.time()), "data": [{"b64_json": result}] * n}
+
+    return app
+
+
+def build_fake_storage(profile: FaultProfile) -> FastAPI:
+    app = FastAPI()
+    app.state.objects = {}
+
+    @app.post("/storage/v1/object/{bucket}/{path:path}")
+    async def upload(bucket: str, path: str, request: Request):
+        body = await request.body()
+        failure = await profile.apply()
+        if failure is not None:
+            return failure
+        app.state.objects[f"{bucket}/{path}"] = len(body)
+        return {"Key": f"{bucket}/{path}", "Id": path}
+
+    return app
+
+
+async def serve(openai_app: FastAPI, storage_app: FastAPI, openai_port: int, storage_port: int,
+                host: str = "127.0.0.1") -> None:
+    import uvicorn
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        for app, port in ((openai_app, openai_port), (storage_app, storage_port))
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI images + Supabase storage")
+    parser.add_argument("--openai-port", type=int, default=9101)
+    parser.add_argument("--storage-port", type=int, default=9102)
+    parser.add_argument("--model-latency", type=float, default=2.0)
+    parser.add_argument("--model-sigma", type=float, default=0.25)
+    parser.add_argument("--model-failure-rate", type=float, default=0.0)
+    parser.add_argument("--model-failure-status", type=int, default=500)
+    parser.add_argument("--storage-latency", type=float, default=0.08)
+    parser.add_argument("--storage-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    openai_profile = FaultProfile(args.model_latency, args.model_sigma, args.model_failure_rate,
+                                  args.model_failure_status, args.seed)
+    storage_profile = FaultProfile(args.storage_latency, 0.25, args.storage_failure_rate, 503, args.seed + 1)
+    asyncio.run(serve(
+        build_fake_openai(openai_profile), build_fake_storage(storage_profile), args.openai_port, args.storage_port
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# backend/benchmarks/load_admission.py
+# Overload test for admission control. A simulated upstream serves
+# --capacity calls at --service seconds each and slows down linearly past
+# that (as a saturated provider does); arrivals come in at --rate per second,
+# well above what it can serve. Compares letting every call through with
+# the AdmissionController in front, reporting latency percentiles for
+# served calls and how many were shed with 429/503.
+#
+#   python -m backend.benchmarks.load_admission [--rate 80] [--duration 5] [--capacity 4]
+import argparse
+import asyncio
+import random
+import time
+from ..services.admission import AdmissionController, AdmissionRejected
+
+
+class SaturatingUpstream:
+    def __init__(self, capacity: int, service: float):
+        self.capacity = capacity
+        self.service = service
+        self.in_flight = 0
+
+    async def call(self):
+        self.in_flight += 1
+        try:
+            overload = max(0, self.in_flight - self.capacity) / self.capacity
+            await asyncio.sleep(self.service * (1 + overload))
+        finally:
+            self.in_flight -= 1
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(rate: float, duration: float, upstream: SaturatingUpstream,
+              controller: AdmissionController | None, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    served, shed = [], []
+
+    async def request():
+        start = time.perf_counter()
+        try:
+            if controller is None:
+                await upstream.call()
+            else:
+                async with controller.slot():
+                    await upstream.call()
+            served.append(time.perf_counter() - start)
+        except AdmissionRejected:
+            shed.append(time.perf_counter() - start)
+
+    tasks = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(request()))
+        await asyncio.sleep(rng.expovariate(rate))  # Poisson arrivals
+    await asyncio.gather(*tasks)
+
+    return {
+        "arrivals": len(tasks),
+        "served": len(served),
+        "shed": len(shed),
+        "p50": percentile(served, 0.50) if served else 0.0,
+        "p95": percentile(served, 0.95) if served else 0.0,
+        "max": max(served) if served else 0.0,
+        "shed_p95": percentile(shed, 0.95) if shed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test admission control under overload")
+    parser.add_argument("--rate", type=float, default=80, help="arrivals per second")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--service", type=float, default=0.2, help="seconds per call at capacity")
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--queue-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    capacity_rps = args.capacity / args.service
+    print(f"Upstream: {args.capacity} slots × {args.service}s (≈{capacity_rps:.0f} req/s), "
+          f"offered {args.rate:.0f} req/s for {args.duration:.0f}s")
+
+    scenarios = {
+        "no admission": None,
+        "admission": AdmissionController(args.capacity, args.queue_size, args.queue_timeout),
+    }
+    for name, controller in scenarios.items():
+        upstream = SaturatingUpstream(args.capacity, args.service)
+        result = asyncio.run(run(args.rate, args.duration, upstream, controller))
+        print(f"\n{name}")
+        print(f"  served {result['served']}/{result['arrivals']}   shed {result['shed']} "
+              f"(p95 reject in {result['shed_p95'] * 1000:.1f} ms)")
+        print(f"  latency p50 {result['p50']:.2f}s   p95 {result['p95']:.2f}s   max {result['max']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
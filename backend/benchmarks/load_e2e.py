@@ -0,0 +1,298 @@
+# backend/benchmarks/load_e2e.py
+# End-to-end load test: starts the fake upstreams (fake_upstreams.py) and
+# backend.main:app under uvicorn as separate processes, drives POST
+# /api/generate with --concurrency closed-loop clients for --duration
+# seconds, and reports latency percentiles, throughput, errors and the
+# per-stage breakdown scraped from /api/metrics. Results are written as JSON;
+# with --baseline the run is compared against an earlier one and the exit
+# code is 1 if p95 or throughput regressed by more than --tolerance.
+#
+#   python -m backend.benchmarks.load_e2e [--concurrency 8] [--duration 20] [--model-latency 2]
+#       [--out results.json] [--baseline baseline.json] [--env MODEL_CONCURRENCY=8]
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from io import BytesIO
+import httpx
+from PIL import Image, ImageDraw, ImageFilter
+from .load_admission import percentile
+
+STAGE_METRIC = "gnb_stage_duration_seconds"
+_SAMPLE = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"process exited with {process.returncode} before listening on {port}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on {port} after {timeout}s")
+
+
+# Distinct phone-sized photos so the exact cache can't short-circuit the run
+def make_photos(count: int, size=(1600, 1200), seed: int = 1) -> list[bytes]:
+    photos = []
+    for n in range(count):
+        rng = random.Random(seed + n)
+        image = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(30):
+            x, y = rng.randrange(size[0]), rng.randrange(size[1])
+            draw.ellipse([x, y, x + rng.randrange(80, 600), y + rng.randrange(80, 600)],
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = BytesIO()
+        image.filter(ImageFilter.GaussianBlur(2)).save(buffer, format="JPEG", quality=90)
+        photos.append(buffer.getvalue())
+    return photos
+
+
+# {stage: {"count", "sum", "buckets": [(le, cumulative), ...]}} from Prometheus text
+def parse_stage_histograms(text: str) -> dict:
+    stages: dict[str, dict] = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match or not match.group(1).startswith(STAGE_METRIC):
+            continue
+        name, labels, value = match.groups()
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', labels))
+        stage = stages.setdefault(labels["stage"], {"count": 0, "sum": 0.0, "buckets": []})
+        if name.endswith("_bucket"):
+            stage["buckets"].append((float(labels["le"]), float(value)))
+        elif name.endswith("_sum"):
+            stage["sum"] = float(value)
+        elif name.endswith("_count"):
+            stage["count"] = int(float(value))
+    return stages
+
+
+# Per-stage mean and p95 (bucket upper bound) for the samples taken during the run
+def stage_breakdown(before: dict, after: dict) -> dict:
+    breakdown = {}
+    for stage, end in after.items():
+        start = before.get(stage, {"count": 0, "sum": 0.0, "buckets": []})
+        count = end["count"] - start["count"]
+        if count <= 0:
+            continue
+        start_buckets = dict(start["buckets"])
+        buckets = [(le, cumulative - start_buckets.get(le, 0)) for le, cumulative in end["buckets"]]
+        p95 = next((le for le, cumulative in buckets if cumulative >= 0.95 * count), float("inf"))
+        breakdown[stage] = {
+            "count": count,
+            "mean": round((end["sum"] - start["sum"]) / count, 4),
+            "p95_le": p95 if p95 != float("inf") else None,
+        }
+    return breakdown
+
+
+async def drive(base_url: str, photos: list[bytes], concurrency: int, duration: float,
+                warmup: int, form: dict) -> tuple[list[tuple[float, int, str | None]], float]:
+    samples: list[tuple[float, int, str | None]] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        counter = 0
+
+        async def one(record: bool) -> None:
+            nonlocal counter
+            photo = photos[counter % len(photos)]
+            counter += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/api/generate", files={"file": ("dog.jpg", photo, "image/jpeg")}, data=form
+                )
+                status = response.status_code
+                # /generate reports some failures as 200 {"error": ...}
+                error = response.json().get("error")
+            except Exception as e:
+                status, error = 0, type(e).__name__
+            if record:
+                samples.append((time.perf_counter() - start, status, error))
+
+        await asyncio.gather(*(one(False) for _ in range(warmup)))
+
+        started = time.perf_counter()
+        deadline = started + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                await one(True)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+def summarize(samples, elapsed: float, stages: dict, config: dict) -> dict:
+    ok = [latency for latency, status, error in samples if status == 200 and error is None]
+    errors: dict[str, int] = {}
+    for _, status, error in samples:
+        if status != 200 or error is not None:
+            key = str(status) if status else error
+            errors[key] = errors.get(key, 0) + 1
+    latency = {}
+    if ok:
+        latency = {
+            "p50": round(percentile(ok, 0.50), 4),
+            "p95": round(percentile(ok, 0.95), 4),
+            "p99": round(percentile(ok, 0.99), 4),
+            "mean": round(sum(ok) / len(ok), 4),
+            "max": round(max(ok), 4),
+        }
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": errors,
+        "elapsed": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency": latency,
+        "stages": stages,
+    }
+
+
+# Relative change per headline metric; a regression is p95 up or rps down past tolerance
+def compare(result: dict, baseline: dict, tolerance: float) -> tuple[dict, bool]:
+    changes = {}
+    for name, current, previous in [
+        *[(f"latency.{q}", result["latency"].get(q), baseline["latency"].get(q)) for q in ("p50", "p95", "p99")],
+        ("rps", result["rps"], baseline["rps"]),
+    ]:
+        if current is not None and previous:
+            changes[name] = round((current - previous) / previous, 4)
+    regressed = changes.get("latency.p95", 0) > tolerance or changes.get("rps", 0) < -tolerance
+    return changes, regressed
+
+
+def print_report(result: dict) -> None:
+    config = result["config"]
+    print(f"E2E load: concurrency {config['concurrency']}, {result['elapsed']}s, "
+          f"model ~{config['model_latency']}s, storage ~{config['storage_latency']}s")
+    print(f"  requests {result['requests']}, ok {result['ok']}, errors {result['errors'] or 'none'}")
+    print(f"  throughput {result['rps']:.2f} req/s")
+    if result["latency"]:
+        lat = result["latency"]
+        print(f"  latency p50 {lat['p50']:.3f}s  p95 {lat['p95']:.3f}s  p99 {lat['p99']:.3f}s  max {lat['max']:.3f}s")
+    print("  stages (mean / p95 bucket):")
+    for stage, info in result["stages"].items():
+        p95 = f"≤{info['p95_le']:g}s" if info["p95_le"] is not None else ">max"
+        print(f"    {stage:<10} {info['mean'] * 1000:9.1f} ms  {p95:>8}  ({info['count']} samples)")
+
+
+def start_processes(args) -> tuple[list[subprocess.Popen], int]:
+    openai_port, storage_port, app_port = free_port(), free_port(), free_port()
+    fakes = subprocess.Popen([
+        sys.executable, "-m", "backend.benchmarks.fake_upstreams",
+        "--openai-port", str(openai_port), "--storage-port", str(storage_port),
+        "--model-latency", str(args.model_latency), "--model-failure-rate", str(args.model_failure_rate),
+        "--model-failure-status", str(args.model_failure_status),
+        "--storage-latency", str(args.storage_latency), "--storage-failure-rate", str(args.storage_failure_rate),
+    ])
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "SUPABASE_URL": f"http://127.0.0.1:{storage_port}",
+        "SUPABASE_API_KEY": "load-test",
+    }
+    if not args.cache:
+        env.update({"RESULT_CACHE_SIZE": "0", "RESULT_CACHE_DB": "", "NEAR_DUP_CACHE": "false"})
+    for pair in args.env:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+         "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL if not args.app_logs else None,
+    )
+    processes = [fakes, app]
+    try:
+        wait_for_port(openai_port, fakes)
+        wait_for_port(storage_port, fakes)
+        wait_for_port(app_port, app)
+    except Exception:
+        for process in processes:
+            process.terminate()
+        raise
+    return processes, app_port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against fake upstreams")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--photos", type=int, default=32,
+                        help="distinct inputs; keep well above concurrency or single-flight coalesces them")
+    parser.add_argument("--model-latency", type=float, default=2.0)
+    parser.add_argument("--model-failure-rate", type=float, default=0.0)
+    parser.add_argument("--model-failure-status", type=int, default=500)
+    parser.add_argument("--storage-latency", type=float, default=0.08)
+    parser.add_argument("--storage-failure-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the result/near-duplicate caches on")
+    parser.add_argument("--delivery", default=None, help="delivery form field (url, inline, local)")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the app process")
+    parser.add_argument("--app-logs", action="store_true")
+    parser.add_argument("--out", default=None, help="write the JSON result here")
+    parser.add_argument("--baseline", default=None, help="compare against this earlier JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    photos = make_photos(args.photos)
+    processes, app_port = start_processes(args)
+    base_url = f"http://127.0.0.1:{app_port}"
+    form = {"delivery": args.delivery} if args.delivery else {}
+    try:
+        before = parse_stage_histograms(httpx.get(f"{base_url}/api/metrics").text)
+        samples, elapsed = asyncio.run(drive(base_url, photos, args.concurrency, args.duration, args.warmup, form))
+        after = parse_stage_histograms(httpx.get(f"{base_url}/api/metrics").text)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    config = {key: getattr(args, key) for key in (
+        "concurrency", "duration", "photos", "model_latency", "model_failure_rate", "storage_latency",
+        "storage_failure_rate", "cache", "delivery", "env"
+    )}
+    result = summarize(samples, elapsed, stage_breakdown(before, after), config)
+    print_report(result)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"  wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        changes, regressed = compare(result, baseline, args.tolerance)
+        print(f"  vs baseline {args.baseline}:")
+        for name, change in changes.items():
+            print(f"    {name:<12} {change:+.1%}")
+        if regressed:
+            print(f"  ❌ regression beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
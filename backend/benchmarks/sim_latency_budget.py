@@ -0,0 +1,135 @@
+# backend/benchmarks/sim_latency_budget.py
+# Discrete-event simulation of /generate through a traffic spike: Poisson
+# arrivals, MODEL_CONCURRENCY model slots with a FIFO queue in front, and a
+# per-level service time (log-normal model call + local stages). Runs the
+# real LatencyBudgetController against it in virtual time and compares the
+# resulting p95 with every request pinned to one level, so controller
+# changes can be checked in seconds instead of with a live load test.
+#
+#   python -m backend.benchmarks.sim_latency_budget [--mode balanced] [--peak-rate 0.45] [--concurrency 4]
+import argparse
+import heapq
+import math
+import random
+from collections import Counter, deque
+from ..services.latency_budget import LatencyBudgetController, LEVELS, MODE_LEVELS, P95_TARGETS
+from .load_admission import percentile
+
+# Per level: (median model seconds, local stage seconds). Medium quality is
+# much slower than low; smaller inputs and lighter encodes shave the rest.
+LEVEL_COSTS = {0: (28.0, 0.45), 1: (12.0, 0.40), 2: (10.0, 0.35), 3: (8.0, 0.15), 4: (6.5, 0.08)}
+
+# (seconds, arrivals per second): off-peak, spike, off-peak again
+DEFAULT_PHASES = ((600, 0.2), (900, 0.45), (600, 0.2))
+
+
+def arrivals(phases, rng: random.Random) -> list[float]:
+    times, start = [], 0.0
+    for duration, rate in phases:
+        t = start
+        while True:
+            t += rng.expovariate(rate)
+            if t >= start + duration:
+                break
+            times.append(t)
+        start += duration
+    return times
+
+
+# Returns one (arrival, latency, level) per request. With fixed_level set the
+# controller is bypassed (the pre-budget behaviour at level 2).
+def simulate(mode: str = "balanced", phases=DEFAULT_PHASES, concurrency: int = 4, sigma: float = 0.25,
+             seed: int = 11, controller: LatencyBudgetController | None = None,
+             fixed_level: int | None = None, costs=LEVEL_COSTS) -> list[tuple[float, float, int]]:
+    rng = random.Random(seed)
+    controller = controller or LatencyBudgetController()
+    now = 0.0
+    controller.clock = lambda: now  # virtual time
+    events = [(t, i, "arrival", None) for i, t in enumerate(arrivals(phases, rng))]
+    heapq.heapify(events)
+    sequence = len(events)
+    waiting: deque = deque()
+    busy = 0
+    results = []
+
+    def start(now: float, request: dict) -> None:
+        nonlocal busy, sequence
+        busy += 1
+        model_median, local = costs[request["level"]]
+        request["model_time"] = model_median * math.exp(rng.gauss(0, sigma))
+        sequence += 1
+        heapq.heappush(events, (now + request["model_time"] + local, sequence, "done", request))
+
+    while events:
+        now, _, kind, request = heapq.heappop(events)
+        if kind == "arrival":
+            if fixed_level is None:
+                settings, _ = controller.choose(mode, queue_depth=len(waiting), concurrency=concurrency)
+                level = settings.level
+            else:
+                level = fixed_level
+            request = {"arrival": now, "level": level}
+            if busy < concurrency:
+                start(now, request)
+            else:
+                waiting.append(request)
+        else:
+            busy -= 1
+            latency = now - request["arrival"]
+            results.append((request["arrival"], latency, request["level"]))
+            if fixed_level is None:
+                controller.observe(mode, latency, request["model_time"], request["level"])
+            if waiting:
+                start(now, waiting.popleft())
+    return sorted(results)
+
+
+def summarize(results, phases=DEFAULT_PHASES) -> dict:
+    latencies = [latency for _, latency, _ in results]
+    bounds, start = [], 0.0
+    for duration, _ in phases:
+        bounds.append((start, start + duration))
+        start += duration
+    per_phase = []
+    for low, high in bounds:
+        phase = [(latency, level) for arrival, latency, level in results if low <= arrival < high]
+        per_phase.append({
+            "requests": len(phase),
+            "p95": round(percentile([latency for latency, _ in phase], 0.95), 2) if phase else None,
+            "levels": dict(sorted(Counter(level for _, level in phase).items())),
+        })
+    return {
+        "requests": len(results),
+        "p50": round(percentile(latencies, 0.50), 2),
+        "p95": round(percentile(latencies, 0.95), 2),
+        "max": round(max(latencies), 2),
+        "phases": per_phase,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the latency-budget controller through a load spike")
+    parser.add_argument("--mode", default="balanced", choices=sorted(P95_TARGETS))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--base-rate", type=float, default=0.2, help="off-peak arrivals per second")
+    parser.add_argument("--peak-rate", type=float, default=0.45, help="spike arrivals per second")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    phases = ((600, args.base_rate), (900, args.peak_rate), (600, args.base_rate))
+    print(f"mode {args.mode}, p95 target {P95_TARGETS[args.mode]:g}s, levels {MODE_LEVELS[args.mode]}")
+    runs = {"adaptive": simulate(args.mode, phases, args.concurrency, seed=args.seed)}
+    for level in range(MODE_LEVELS[args.mode][0], MODE_LEVELS[args.mode][1] + 1):
+        runs[f"fixed L{level}"] = simulate(args.mode, phases, args.concurrency, seed=args.seed, fixed_level=level)
+
+    for name, results in runs.items():
+        summary = summarize(results, phases)
+        print(f"\n{name:<10} {summary['requests']} requests  p50 {summary['p50']}s  "
+              f"p95 {summary['p95']}s  max {summary['max']}s")
+        for index, phase in enumerate(summary["phases"]):
+            print(f"  phase {index}: p95 {phase['p95']}s  levels {phase['levels']}")
+    print("\nlevels:", ", ".join(f"L{s.level}={s.input_max_size}px/{s.model_quality}" for s in LEVELS))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 # backend/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -7,8 +8,42 @@ import os
 load_dotenv()
 # Import routes
 from .routes.generate import router as generate_router
+from .routes.jobs import router as jobs_router
+from .routes.metrics import router as metrics_router
+from .routes.uploads import router as uploads_router
+from .routes.results import router as results_router
+from .services.clients import clients
+from .services.supabase_uploader import temp_objects
+from .services.ingest import UploadLimitMiddleware
+from .utils.prompts import prompt_catalog
+
+
+# Long-lived servers can build the upstream SDK clients at startup instead of
+# on the first request; serverless cold starts keep them lazy (the default)
+PREWARM_CLIENTS = os.getenv("PREWARM_CLIENTS", "false").lower() in ("1", "true", "yes")
+
+
+# Upstream clients are created lazily on first use; the prompt catalog is
+# compiled at startup (a broken prompts.json fails the boot, not a request).
+# Shutdown drains pending temp-object cleanup and closes every connection pool
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.clients = clients
+    prompt_catalog.load()
+    if PREWARM_CLIENTS:
+        from .routes.generate import client as openai_client
+        from .services.supabase_uploader import get_async_supabase
+        openai_client.images  # builds the lazy OpenAI client
+        await get_async_supabase()
+    yield
+    await temp_objects.flush()
+    await clients.aclose()
+
+
 # Create FastAPI app instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# Oversized uploads are refused before multipart parsing (inside CORS so the 413 is readable)
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -19,3 +54,7 @@ app.add_middleware(
 
 # Include the generate route
 app.include_router(generate_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
+app.include_router(uploads_router, prefix="/api")
+app.include_router(results_router, prefix="/api")
@@ -1,152 +1,675 @@
 # routes/generate.py
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from io import BytesIO
 import base64
+import itertools
+import json
 import os
-from openai import OpenAI
 from ..services.convert_to_png import convert_to_png
-from ..services.supabase_uploader import upload_image_to_supabase
-from ..services.logo_overlay import overlay_gnb_logo
-from ..utils.prompts import build_prompt
-from ..services.optimize_images import optimize_input_image
+from ..services.supabase_uploader import upload_image_to_supabase_async, upload_stream_to_supabase, temp_objects
+from ..services.executor import run_in_executor
+from ..services.clients import clients
+from ..services.metrics import span, log_event, REQUEST_SECONDS
+from ..services.admission import model_admission, AdmissionRejected, estimate_tokens
+from ..services.resilience import deadline_scope, current_deadline, UpstreamUnavailable, REQUEST_DEADLINE
+from ..services.latency_budget import (
+    latency_controller, default_settings, budget_report, BudgetSettings, BUDGET_MODES, LATENCY_BUDGET
+)
+from ..services.image_pipeline import ImagePipeline, pixel_mb
+from ..services.optimize_images import ImageTooLarge
+from ..services.ingest import ingest_upload, IngestedUpload, UploadRejected
+from ..utils.prompts import build_prompt, prompt_fingerprint
+from ..services.result_cache import result_cache, make_cache_key
+from ..services.near_duplicates import near_duplicates, dhash_bytes, NEAR_DUP_CACHE
+from ..services.image_encoder import normalize_format
+from ..services.renditions import encode_renditions, upload_renditions, build_srcset
+from ..services.providers import build_router, ImagenProvider, FluxProvider
+from ..services.single_flight import IDEMPOTENCY_TTL, SingleFlight, generation_flight, idempotency_store
+from ..services.result_store import result_store, DELIVERY_MODES
+from ..services.direct_uploads import StoredInput, parse_upload_key, read_stored_input, input_cache
 import time
-import requests
+import asyncio
 
 router = APIRouter()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Built on first use from the shared registry (pooled httpx transport). The
+# SDK import itself is deferred too: it is the largest part of a cold start.
+# Retries are ours (services/resilience), bounded by the request deadline.
+def _build_openai():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=clients.http("openai"), max_retries=0)
+
+
+client = clients.lazy("openai", _build_openai)
+
+# Upstream image models; /generate goes through the router, the experimental
+# routes below call their provider directly
+provider_router = build_router(client)
+imagen_provider = ImagenProvider()
+flux_provider = FluxProvider()
+
+# Concurrent requests for the same uploaded object read and optimize it once
+input_flight = SingleFlight()
+
+# How /generate hands back the image: "url" waits for the durable upload,
+# "inline" (data URL) and "local" (short-lived /api/results URL) respond as
+# soon as it is encoded and upload in the background
+RESULT_DELIVERY = os.getenv("RESULT_DELIVERY", "url")
 
 PROMPT_BASE = "Same dog in a dark brown sweater with a green GNB patch, resting on a plush couch with soft pillows and warm wood textures under ambient light"
 
-# Generate image using OpenAI's GPT-Image model
+# Errors that keep their own status: rejected uploads (413 too large, 415 not
+# an image we read), and capacity errors (our admission control, an open
+# circuit or a spent deadline, or the provider's own 429) with a
+# Retry-After so clients back off instead of retrying blind
+def _error_status(e: Exception) -> tuple[int, dict] | None:
+    if isinstance(e, ImageTooLarge):
+        return 413, {}
+    if isinstance(e, UploadRejected):
+        return e.status_code, {}
+    if isinstance(e, FileNotFoundError):
+        return 404, {}
+    if isinstance(e, (AdmissionRejected, UpstreamUnavailable)):
+        return e.status_code, e.headers
+    if getattr(e, "status_code", None) == 429:
+        response = getattr(e, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        return 429, {"Retry-After": retry_after or "5"}
+    return None
+
+
+async def _emit(on_stage, stage: str, **info):
+    if on_stage is not None:
+        await on_stage(stage, info)
+
+
+# Model call → decode → logo overlay → upload. Runs once per cache key even
+# when identical requests arrive concurrently (see generation_flight).
+async def _edit_overlay_upload(optimized_bytes: bytes, prompt: str, cache_key: str, output_format: str,
+                               on_stage=None, delivery: str = "url", settings: BudgetSettings | None = None) -> dict:
+    settings = settings or default_settings()
+    # 🎯 Model call (provider picked by the latency-aware router)
+    # Admission control first: waits for a slot or fails fast with 429/503
+    tokens = estimate_tokens(prompt, settings.input_max_size, settings.model_size, settings.model_quality)
+    async with model_admission.slot(images=1, tokens=tokens):
+        await _emit(on_stage, "model_running")
+        with span("model") as model_span:
+            generated = await provider_router.edit(
+                optimized_bytes,
+                prompt,
+                size=settings.model_size,        # picked by the latency budget
+                quality=settings.model_quality,
+                output_format="jpeg",
+                output_compression=80  # Good balance
+            )
+    openai_time = model_span.elapsed
+
+    rendered = await _render_and_upload(
+        generated.images[0], output_format, on_stage, openai_time, delivery=delivery, cache_key=cache_key,
+        settings=settings
+    )
+    # Deferred deliveries are cached once their permanent URLs exist (_cache_delivered)
+    if delivery == "url":
+        result_cache.set(cache_key, {
+            "image_url": rendered["image_url"],
+            "renditions": rendered["renditions"],
+            "srcset": rendered["srcset"]
+        })
+    return {
+        **rendered,
+        "openai_time": openai_time,
+        "provider": {"name": generated.provider, "hedged": generated.hedged, "failover": generated.failover}
+    }
+
+
+# Decode one model result → logo overlay → renditions → parallel upload (or,
+# for deferred delivery, into the in-memory result store)
+async def _render_and_upload(image_data: bytes, output_format: str, on_stage=None, openai_time: float = 0.0,
+                             delivery: str = "url", cache_key: str | None = None,
+                             settings: BudgetSettings | None = None) -> dict:
+    settings = settings or default_settings()
+    with span("decode") as decode_span:
+        result_image = await run_in_executor(ImagePipeline.from_bytes, image_data)
+    process_time = decode_span.elapsed
+
+    # Logo overlay (composited in place on the decoded result)
+    with span("overlay") as overlay_span:
+        await run_in_executor(result_image.overlay_logo)
+    overlay_time = overlay_span.elapsed
+    await _emit(on_stage, "overlay", openai_time=round(openai_time, 3), overlay_time=round(overlay_time, 3))
+
+    # 📱 Rendition set (e.g. 256/512/1024), each encoded once, concurrently
+    with span("encode", format=output_format) as encode_span:
+        renditions = await encode_renditions(
+            result_image.image, output_format, settings.output_widths,
+            max_bytes=settings.output_max_bytes, quality=settings.output_quality
+        )
+    result_image.timings["encode_time"] = encode_span.elapsed
+    full_width = max(renditions)
+    encoded = renditions[full_width]
+
+    stored = None
+    if delivery == "url":
+        # All renditions upload in parallel
+        with span("upload", files=len(renditions)) as upload_span:
+            rendition_urls = await upload_renditions(renditions, upload=upload_image_to_supabase_async)
+        upload_time = upload_span.elapsed
+        image_url = rendition_urls[full_width]
+    else:
+        # Served from memory now; the route schedules the durable upload
+        stored = result_store.put(renditions, cache_key)
+        rendition_urls = stored.local_urls()
+        upload_time = 0.0
+        image_url = stored.data_url() if delivery == "inline" else rendition_urls[full_width]
+
+    renditions_map = {str(width): url for width, url in rendition_urls.items()}
+    srcset = build_srcset(rendition_urls)
+    await _emit(on_stage, "uploaded" if stored is None else "stored",
+                upload_time=round(upload_time, 3), image_url=image_url)
+
+    deferred = {} if stored is None else {"result_id": stored.id, "result_url": f"/api/results/{stored.id}"}
+    return {
+        **deferred,
+        "image_url": image_url,
+        "renditions": renditions_map,
+        "srcset": srcset,
+        "process_time": process_time,
+        "overlay_time": overlay_time,
+        "upload_time": upload_time,
+        "pipeline": result_image.stats(),
+        "output": {
+            "format": encoded.format,
+            "quality": encoded.quality,
+            "encoded_size": encoded.size,
+            "rendition_sizes": {str(width): r.size for width, r in renditions.items()}
+        },
+    }
+
+
+# Open the upload once and downscale it into the JPEG the model receives
+async def _prepare_model_input(source: bytes | IngestedUpload | StoredInput, settings: BudgetSettings | None = None):
+    settings = settings or default_settings()
+    if isinstance(source, StoredInput):
+        return await _prepare_stored_input(source, settings)
+    # Open once; Pillow reads PNG/JPEG/WebP/... directly, so no PNG round-trip
+    opener = ImagePipeline.from_upload if isinstance(source, IngestedUpload) else ImagePipeline.from_bytes
+    with span("convert") as convert_span:
+        source_image = await run_in_executor(opener, source)
+    convert_time = convert_span.elapsed
+
+    # 🚀 OPTIMIZE IMAGE FOR SPEED (smaller = faster; the latency budget picks the size)
+    with span("compress"):
+        optimized_image, compression_stats = await run_in_executor(
+            source_image.model_input,
+            max_size=settings.input_max_size,
+            quality=settings.input_quality
+        )
+
+    # Set the filename for OpenAI
+    optimized_image.name = "dog.jpg"  # Use .jpg since we're optimizing as JPEG
+    return convert_time, optimized_image, compression_stats
+
+
+# Uploaded straight to storage: read it back once, then serve the optimized
+# input from input_cache (object keys are never reused; one entry per input size)
+async def _prepare_stored_input(stored: StoredInput, settings: BudgetSettings):
+    entry_key = f"{stored.key}:{settings.input_max_size}:{settings.input_quality}"
+    cached = input_cache.get(entry_key)
+    hit = cached is not None
+    if not hit:
+        async def load() -> dict:
+            with span("read", source="storage"):
+                upload = await read_stored_input(stored)
+            try:
+                convert_time, optimized, stats = await _prepare_model_input(upload, settings)
+            finally:
+                upload.close()
+            entry = {"data": optimized.getvalue(), "stats": stats, "convert_time": convert_time}
+            input_cache.set(entry_key, entry)
+            return entry
+        cached, _ = await input_flight.do(entry_key, load)
+
+    optimized_image = BytesIO(cached["data"])
+    optimized_image.name = "dog.jpg"
+    stats = {**cached["stats"], "input_cache_hit": hit}
+    if hit:
+        stats["compression_time"] = 0.0
+        stats["pixel_bytes"] = 0
+    return (0.0 if hit else cached["convert_time"]), optimized_image, stats
+
+
+# The /generate pipeline on an ingested upload, a stored object (or raw
+# bytes), shared with the job API. Raises on failure; on_stage(stage, info) is awaited at every stage transition.
+async def run_generation(image: bytes | IngestedUpload | StoredInput, scenario: str | None = None, clothing: str | None = None,
+                         output_format: str | None = None, on_stage=None,
+                         started_at: float | None = None, read_time: float = 0.0, delivery: str = "url",
+                         prompt: str | None = None, budget: str | None = None) -> dict:
+    total_start = started_at or time.perf_counter()
+    output_format = normalize_format(output_format)
+
+    # 🎚️ Input size, model quality and output encoding for this request, from
+    # the budget mode's rolling latencies and how many model calls are queued
+    budget = budget or LATENCY_BUDGET
+    settings, budget_reason = latency_controller.choose(
+        budget, queue_depth=model_admission.waiting, concurrency=model_admission.concurrency
+    )
+    variant = settings.variant(output_format)
+
+    convert_time, optimized_image, compression_stats = await _prepare_model_input(image, settings)
+    await _emit(
+        on_stage, "optimized",
+        compression_time=round(compression_stats['compression_time'], 3),
+        compression_ratio=round(compression_stats['compression_ratio'], 1)
+    )
+
+    # Routes resolve (and validate) the prompt up front and pass it in
+    with span("prompt") as prompt_span:
+        prompt = prompt or build_prompt(scenario, clothing)
+        fingerprint = prompt_fingerprint(prompt)
+    prompt_time = prompt_span.elapsed
+    print("🧠 Final prompt:", prompt)
+    await _emit(on_stage, "prompt_built", prompt_time=round(prompt_time, 3))
+
+    # ♻️ Same optimized photo + same prompt → reuse the stored result
+    cache_key = make_cache_key(optimized_image.getbuffer(), prompt, variant=variant)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return await _cached_response(cached, total_start, compression_stats, on_stage)
+
+    # 🐕 Same photo re-compressed or slightly cropped → perceptual-hash match
+    near_namespace = phash = None
+    if NEAR_DUP_CACHE:
+        with span("phash"):
+            phash = await run_in_executor(dhash_bytes, optimized_image.getvalue())
+        near_namespace = f"{fingerprint}:{variant}"
+        match = near_duplicates.lookup(near_namespace, phash)
+        if match is not None:
+            distance, cached = match
+            return await _cached_response(
+                cached, total_start, compression_stats, on_stage, near_duplicate=True, distance=distance
+            )
+
+    # 🤝 Identical request already running → wait for its result instead
+    # (per delivery mode: a "url" caller must not get a local URL back)
+    upstream, shared = await generation_flight.do(
+        cache_key if delivery == "url" else f"{cache_key}:{delivery}",
+        lambda: _edit_overlay_upload(
+            optimized_image.getvalue(), prompt, cache_key, output_format, on_stage, delivery, settings
+        )
+    )
+    if shared:
+        print("🤝 Joined in-flight generation:", upstream["image_url"])
+        await _emit(on_stage, "uploaded", image_url=upstream["image_url"], shared=True)
+    if phash is not None:
+        _index_near_duplicate(upstream, near_namespace, phash)
+    image_url = upstream["image_url"]
+    openai_time = upstream["openai_time"]
+    process_time = upstream["process_time"]
+    overlay_time = upstream["overlay_time"]
+    upload_time = upstream["upload_time"]
+
+    total_time = time.perf_counter() - total_start
+    latency_controller.observe(budget, total_time, openai_time, settings.level)
+    print(f"✅ Generated in {total_time:.3f}s (model {openai_time:.3f}s):", image_url)
+    log_event(
+        "generation",
+        cache_hit=False,
+        shared_inflight=shared,
+        total_time=round(total_time, 4),
+        read_time=round(read_time, 4),
+        convert_time=round(convert_time, 4),
+        compression_time=round(compression_stats['compression_time'], 4),
+        compressed_bytes=compression_stats['compressed_size'],
+        prompt_time=round(prompt_time, 4),
+        model_time=round(openai_time, 4),
+        decode_time=round(process_time, 4),
+        overlay_time=round(overlay_time, 4),
+        upload_time=round(upload_time, 4),
+        provider=upstream["provider"]["name"],
+    )
+
+    deferred = {key: upstream[key] for key in ("result_id", "result_url") if key in upstream}
+    deadline = current_deadline()
+    return {
+        **deferred,
+        "image_url": image_url,
+        "renditions": upstream["renditions"],
+        "srcset": upstream["srcset"],
+        "performance": {
+            "total_time": round(total_time, 3),
+            "openai_time": round(openai_time, 3),
+            "compression_time": round(compression_stats['compression_time'], 3),
+            "compression_ratio": round(compression_stats['compression_ratio'], 1),
+            "upload_time": round(upload_time, 3),
+            "cache": {"hit": False, **result_cache.stats()},
+            "shared_inflight": shared,
+            "pipeline": upstream["pipeline"],
+            "output": upstream["output"],
+            "provider": upstream["provider"],
+            "delivery": delivery,
+            "prompt_fingerprint": fingerprint,
+            "deadline": deadline.stats() if deadline is not None else None,
+            "latency_budget": budget_report(budget, settings, budget_reason),
+            # This request's own peak (input and output stages run one after the other)
+            "pixel_memory_mb": max(pixel_mb(compression_stats.get("pixel_bytes", 0)),
+                                   upstream["pipeline"]["pixel_memory_mb"])
+        }
+    }
+
+
+async def _cached_response(cached: dict, total_start: float, compression_stats: dict, on_stage=None,
+                           **near) -> dict:
+    total_time = time.perf_counter() - total_start
+    print(f"♻️ {'Near-duplicate' if near else 'Result cache'} hit after {total_time:.3f}s:", cached["image_url"])
+    log_event("generation", cache_hit=True, total_time=round(total_time, 4), **near)
+    await _emit(on_stage, "cached", image_url=cached["image_url"], **near)
+    return {
+        "image_url": cached["image_url"],
+        "renditions": cached.get("renditions", {}),
+        "srcset": cached.get("srcset", ""),
+        "performance": {
+            "total_time": round(total_time, 3),
+            "openai_time": 0.0,
+            "compression_time": round(compression_stats['compression_time'], 3),
+            "compression_ratio": round(compression_stats['compression_ratio'], 1),
+            "upload_time": 0.0,
+            "cache": {"hit": True, **near, **result_cache.stats()},
+            "pixel_memory_mb": pixel_mb(compression_stats.get("pixel_bytes", 0))
+        }
+    }
+
+
+# Permanent results go into the near-duplicate index now; deferred ones once
+# their background upload finishes (see _cache_delivered)
+def _index_near_duplicate(upstream: dict, namespace: str, phash: int) -> None:
+    if "result_id" in upstream:
+        stored = result_store.get(upstream["result_id"])
+        if stored is not None:
+            stored.meta["near_duplicate"] = (namespace, phash)
+        return
+    near_duplicates.add(namespace, phash, {key: upstream[key] for key in ("image_url", "renditions", "srcset")})
+
+
+# Background upload finished: later identical requests get the permanent URLs
+def _cache_delivered(stored) -> None:
+    result = stored.to_dict()
+    entry = {key: result[key] for key in ("image_url", "renditions", "srcset")}
+    if stored.cache_key:
+        result_cache.set(stored.cache_key, entry)
+    if "near_duplicate" in stored.meta:
+        near_duplicates.add(*stored.meta["near_duplicate"], entry)
+    # The replay pointed at the result store, which drops the entry after its
+    # TTL: from now on it replays the permanent URLs for the full IDEMPOTENCY_TTL
+    if "idempotency_key" in stored.meta:
+        replay = idempotency_store.get(stored.meta["idempotency_key"])
+        if replay is not None:
+            replay = {key: value for key, value in replay.items() if key not in ("result_id", "result_url")}
+            idempotency_store.set(stored.meta["idempotency_key"], {**replay, **entry})
+
+
+# What an Idempotency-Key replays. An inline data URL (up to a few hundred
+# KB) is swapped for the result's local image URL, so the store holds
+# references rather than images; result_url leads to the permanent URL.
+def _replayable(result: dict) -> dict:
+    if not result["image_url"].startswith("data:"):
+        return result
+    full_width = max(result["renditions"], key=int)
+    return {**result, "image_url": result["renditions"][full_width]}
+
+
+# Remember the response for an Idempotency-Key. A deferred delivery's local
+# URLs only live as long as the result store keeps the entry, so its replay
+# expires no later than that, unless the upload rewrites it first.
+def _store_replay(idempotency_key: str, result: dict) -> None:
+    if "result_id" not in result:
+        idempotency_store.set(idempotency_key, result)
+        return
+    stored = result_store.get(result["result_id"])
+    if stored is not None:
+        stored.meta["idempotency_key"] = idempotency_key
+    idempotency_store.set(idempotency_key, _replayable(result), ttl=min(IDEMPOTENCY_TTL, result_store.ttl))
+
+
+# Generate image using OpenAI's GPT-Image model. Takes the photo either as a
+# multipart file or as the key of an object uploaded via /api/uploads.
 @router.post("/generate")
 async def generate(
-    file: UploadFile = File(...),
+    background_tasks: BackgroundTasks,
+    file: UploadFile | None = File(None),
+    key: str | None = Form(None),
     scenario: str = Form(None),
-    clothing: str = Form(None)
+    clothing: str = Form(None),
+    output_format: str = Form(None),
+    delivery: str = Form(None),
+    latency_budget: str = Form(None),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key")
 ):
-    total_start = time.time()
-    print("📥 Received file:", file.filename)
+    total_start = time.perf_counter()
+    if (file is None) == (key is None):
+        raise HTTPException(status_code=422, detail="Send either a file or an upload key")
+    print("📥 Received file:", file.filename if file is not None else key)
     print("🎨 Scenario:", scenario, "| Clothing:", clothing)
 
     try:
-        # File reading timing
-        read_start = time.time()
-        image_bytes = await file.read()
-        read_time = time.time() - read_start
-        print(f"⏱️ File read time: {read_time:.3f}s")
-
-        # PNG conversion timing (if needed)
-        convert_start = time.time()
-        if not file.filename.lower().endswith((".png", ".jpg", ".jpeg")):
-            image_bytes = convert_to_png(image_bytes)
-        convert_time = time.time() - convert_start
-        if convert_time > 0.001:  # Only log if significant
-            print(f"⏱️ PNG conversion time: {convert_time:.3f}s")
-
-        # 🚀 OPTIMIZE IMAGE FOR SPEED
-        optimized_image, compression_stats = optimize_input_image(
-            image_bytes, 
-            max_size=512,  # Smaller = faster (use 256 for even more speed)
-            quality=85     # Balance between quality and speed
-        )
-        
-        # Set the filename for OpenAI
-        optimized_image.name = "dog.jpg"  # Use .jpg since we're optimizing as JPEG
-
-        # Build prompt timing
-        prompt_start = time.time()
+        output_format = normalize_format(output_format)
+        stored = parse_upload_key(key) if key is not None else None
+        # Unknown scenario/clothing is a 422 here, before any upstream call
         prompt = build_prompt(scenario, clothing)
-        prompt_time = time.time() - prompt_start
-        print("🧠 Final prompt:", prompt)
-        print(f"⏱️ Prompt build time: {prompt_time:.3f}s")
-
-        # 🎯 OpenAI API call timing
-        print("🚀 Starting OpenAI API call...")
-        openai_start = time.time()
-        
-        response = client.images.edit(
-            model="gpt-image-1",
-            image=optimized_image,
-            prompt=prompt,
-            size="1024x1024",        # 🚀 Smaller size = faster processing
-            quality="low",         # Keep low for speed
-            output_format="jpeg",
-            output_compression=80  # Good balance
-        )
-        
-        openai_time = time.time() - openai_start
-        print(f"⏱️ OpenAI API time: {openai_time:.3f}s")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    delivery = delivery or RESULT_DELIVERY
+    if delivery not in DELIVERY_MODES:
+        raise HTTPException(status_code=422, detail=f"delivery must be one of {', '.join(DELIVERY_MODES)}")
+    if latency_budget is not None and latency_budget not in BUDGET_MODES:
+        raise HTTPException(status_code=422, detail=f"latency_budget must be one of {', '.join(BUDGET_MODES)}")
+
+    # 🔁 Retried request with a key we've already answered → replay it
+    if idempotency_key:
+        replay = idempotency_store.get(idempotency_key)
+        if replay is not None:
+            print("🔁 Replaying response for Idempotency-Key:", idempotency_key)
+            return JSONResponse(replay, headers={"Idempotent-Replayed": "true"})
 
-        # Image processing timing
-        process_start = time.time()
-        img_b64 = response.data[0].b64_json
-        decoded_image = base64.b64decode(img_b64)
-        process_time = time.time() - process_start
-        print(f"⏱️ Image decode time: {process_time:.3f}s")
-
-        # Logo overlay timing
-        overlay_start = time.time()
-        logo_overlayed_image = overlay_gnb_logo(decoded_image)
-        overlay_time = time.time() - overlay_start
-        print(f"⏱️ Logo overlay time: {overlay_time:.3f}s")
-
-        # Upload timing
-        upload_start = time.time()
-        image_url = upload_image_to_supabase(logo_overlayed_image.getvalue())
-        upload_time = time.time() - upload_start
-        print(f"⏱️ Upload time: {upload_time:.3f}s")
-
-        # Total timing summary
-        total_time = time.time() - total_start
-        
-        print("\n" + "="*50)
-        print("📊 PERFORMANCE SUMMARY")
-        print("="*50)
-        print(f"📁 File read:        {read_time:.3f}s")
-        print(f"🔄 PNG conversion:   {convert_time:.3f}s") 
-        print(f"🗜️  Image compression: {compression_stats['compression_time']:.3f}s")
-        print(f"   └─ Size reduction: {compression_stats['compression_ratio']:.1f}%")
-        print(f"   └─ {compression_stats['original_size']:,} → {compression_stats['compressed_size']:,} bytes")
-        print(f"🧠 Prompt build:     {prompt_time:.3f}s")
-        print(f"🤖 OpenAI API:       {openai_time:.3f}s  ⭐ MAIN BOTTLENECK")
-        print(f"🖼️  Image decode:     {process_time:.3f}s")
-        print(f"🎨 Logo overlay:     {overlay_time:.3f}s")
-        print(f"☁️  Upload:           {upload_time:.3f}s")
-        print(f"⏱️  TOTAL TIME:       {total_time:.3f}s")
-        
-        # Performance insights
-        if openai_time > 3:
-            print("💡 OpenAI is slow - try smaller image size or simpler prompt")
-        if compression_stats['compression_time'] > 0.5:
-            print("💡 Compression is slow - reduce max_size or quality")
-        if upload_time > 1:
-            print("💡 Upload is slow - check network/Supabase performance")
-            
-        print("="*50)
-
-        return {
-            "image_url": image_url,
-            "performance": {
-                "total_time": round(total_time, 3),
-                "openai_time": round(openai_time, 3),
-                "compression_time": round(compression_stats['compression_time'], 3),
-                "compression_ratio": round(compression_stats['compression_ratio'], 1),
-                "upload_time": round(upload_time, 3)
-            }
-        }
+    try:
+        # One time budget for every stage below (queueing, model, upload)
+        with deadline_scope(REQUEST_DEADLINE):
+            # Size-checked and sniffed in chunks; the pipeline reads the spooled file
+            with span("read") as read_span:
+                upload = stored or await ingest_upload(file)
+
+            result = await run_generation(
+                upload, scenario, clothing, output_format,
+                started_at=total_start, read_time=read_span.elapsed, delivery=delivery, prompt=prompt,
+                budget=latency_budget
+            )
+        if "result_id" in result:
+            # Durable upload after the response; the permanent URL shows up at result_url
+            background_tasks.add_task(
+                result_store.deliver, result["result_id"],
+                upload=upload_image_to_supabase_async, on_uploaded=_cache_delivered
+            )
+        REQUEST_SECONDS.observe(time.perf_counter() - total_start, "generate", "ok")
+        if idempotency_key:
+            _store_replay(idempotency_key, result)
+        return result
 
     except Exception as e:
-        total_time = time.time() - total_start
+        total_time = time.perf_counter() - total_start
+        REQUEST_SECONDS.observe(total_time, "generate", "error")
         print(f"❌ OpenAI Error after {total_time:.3f}s:", e)
-        return {"error": str(e), "total_time": round(total_time, 3)}
+        log_event("generation_failed", error=str(e), total_time=round(total_time, 4))
+        body = {"error": str(e), "total_time": round(total_time, 3)}
+        status = _error_status(e)
+        if status is not None:
+            status_code, headers = status
+            return JSONResponse(body, status_code=status_code, headers=headers)
+        return body
+
+
+BATCH_MAX_VARIATIONS = int(os.getenv("BATCH_MAX_VARIATIONS", "4"))
+BATCH_MAX_COMBINATIONS = int(os.getenv("BATCH_MAX_COMBINATIONS", "12"))
+# Cap on concurrent model calls for one batch request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+
+
+def _stream_line(item: dict, stream: str) -> str:
+    if stream == "sse":
+        return f"event: {item['type']}\ndata: {json.dumps(item)}\n\n"
+    return json.dumps(item) + "\n"
+
+
+# 📸 Multi-shot "photoshoot": optimize the photo once, then either ask for n
+# variations in one images.edit call, or fan out over scenario × clothing
+# combinations (capped at BATCH_CONCURRENCY). Every result is overlaid and
+# uploaded as soon as it arrives and streamed back as NDJSON (or SSE), so
+# the first image shows without waiting for the slowest.
+@router.post("/generate/batch")
+async def generate_batch(
+    file: UploadFile = File(...),
+    scenario: str = Form(None),
+    clothing: str = Form(None),
+    scenarios: list[str] = Form(None),
+    clothings: list[str] = Form(None),
+    n: int = Form(3),
+    output_format: str = Form(None),
+    latency_budget: str = Form(None),
+    stream: str = Query("ndjson", pattern="^(ndjson|sse)$")
+):
+    batch_start = time.perf_counter()
+    try:
+        output_format = normalize_format(output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if latency_budget is not None and latency_budget not in BUDGET_MODES:
+        raise HTTPException(status_code=422, detail=f"latency_budget must be one of {', '.join(BUDGET_MODES)}")
+
+    fan_out = bool(scenarios or clothings)
+    if fan_out:
+        combinations = list(itertools.product(scenarios or [scenario], clothings or [clothing]))
+        if len(combinations) > BATCH_MAX_COMBINATIONS:
+            raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_COMBINATIONS} combinations per batch")
+    elif not 1 <= n <= BATCH_MAX_VARIATIONS:
+        raise HTTPException(status_code=422, detail=f"n must be between 1 and {BATCH_MAX_VARIATIONS}")
+    try:
+        prompts = [build_prompt(*combo) for combo in combinations] if fan_out else [build_prompt(scenario, clothing)]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # 🎚️ One set of budget settings for the whole batch. Batch latencies are
+    # not fed back to the controller: a streamed batch isn't a /generate request
+    budget = latency_budget or LATENCY_BUDGET
+    settings, budget_reason = latency_controller.choose(
+        budget, queue_depth=model_admission.waiting, concurrency=model_admission.concurrency
+    )
+    variant = settings.variant(output_format)
+
+    try:
+        upload = await ingest_upload(file)
+        _, optimized_image, compression_stats = await _prepare_model_input(upload, settings)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not read image: {e}")
+    optimized_bytes = optimized_image.getvalue()
+    print(f"📸 Batch: {'fan-out' if fan_out else f'{n} variations'}, input optimized once")
+
+    async def run_combination(index: int, combo_scenario, combo_clothing, limit: asyncio.Semaphore) -> dict:
+        prompt = prompts[index]
+        cache_key = make_cache_key(optimized_bytes, prompt, variant=variant)
+        cached = result_cache.get(cache_key)
+        if cached is None:
+            async with limit:
+                cached, _ = await generation_flight.do(
+                    cache_key,
+                    lambda: _edit_overlay_upload(optimized_bytes, prompt, cache_key, output_format, settings=settings)
+                )
+        return {"index": index, "scenario": combo_scenario, "clothing": combo_clothing, **cached}
+
+    async def run_variation(index: int, image_data: bytes) -> dict:
+        return {"index": index, **await _render_and_upload(image_data, output_format, settings=settings)}
+
+    # One deadline for every model call and upload of the batch. Entered and
+    # left here rather than in body(): tasks created inside copy it, and a
+    # context variable must not stay set across the generator's yields.
+    async def produce():
+        with deadline_scope(REQUEST_DEADLINE):
+            if fan_out:
+                limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+                return [
+                    asyncio.create_task(run_combination(i, combo_scenario, combo_clothing, limit))
+                    for i, (combo_scenario, combo_clothing) in enumerate(combinations)
+                ]
+            tokens = estimate_tokens(
+                prompts[0], settings.input_max_size, settings.model_size, settings.model_quality, n=n
+            )
+            async with model_admission.slot(images=n, tokens=tokens):
+                generated = await provider_router.edit(
+                    optimized_bytes,
+                    prompts[0],
+                    n=n,
+                    size=settings.model_size,
+                    quality=settings.model_quality,
+                    output_format="jpeg",
+                    output_compression=80
+                )
+            return [asyncio.create_task(run_variation(i, image)) for i, image in enumerate(generated.images)]
+
+    async def body():
+        total = len(combinations) if fan_out else n
+        yield _stream_line({
+            "type": "started",
+            "total": total,
+            "compression_time": round(compression_stats["compression_time"], 3),
+            "latency_budget": budget_report(budget, settings, budget_reason)
+        }, stream)
+
+        tasks = []
+        succeeded = 0
+        try:
+            tasks = await produce()
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    item = await finished
+                except Exception as e:
+                    yield _stream_line({"type": "error", "error": str(e)}, stream)
+                    continue
+                succeeded += 1
+                yield _stream_line({
+                    "type": "result",
+                    "index": item["index"],
+                    "scenario": item.get("scenario", scenario),
+                    "clothing": item.get("clothing", clothing),
+                    "image_url": item["image_url"],
+                    "renditions": item["renditions"],
+                    "srcset": item["srcset"],
+                    "elapsed": round(time.perf_counter() - batch_start, 3)
+                }, stream)
+        except Exception as e:
+            print("❌ Batch error:", e)
+            yield _stream_line({"type": "error", "error": str(e)}, stream)
+        finally:
+            # Client went away or we failed: don't leave model calls running
+            for task in tasks:
+                task.cancel()
+
+        yield _stream_line({
+            "type": "done",
+            "succeeded": succeeded,
+            "total_time": round(time.perf_counter() - batch_start, 3)
+        }, stream)
+
+    media_type = "text/event-stream" if stream == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
 
 
 # Used for testing DALL·E 3 generation
 @router.post("/generate-dalle")
 async def generate_dalle():
     try:
-        response = client.images.generate(
+        response = await client.images.generate(
             model="dall-e-3",
             prompt=PROMPT_BASE,
             n=1,
@@ -157,7 +680,7 @@ async def generate_dalle():
 
         img_b64 = response.data[0].b64_json
         image_bytes = base64.b64decode(img_b64)
-        image_url = upload_image_to_supabase(image_bytes)
+        image_url = await upload_image_to_supabase_async(image_bytes)
 
         return {"url": image_url}
 
@@ -169,41 +692,14 @@ async def generate_dalle():
 @router.post("/generate-imagen")
 async def generate_imagen(file: UploadFile = File(...)):
     try:
-        image_bytes = await file.read()
-        if not file.filename.lower().endswith(".png"):
-            image_bytes = convert_to_png(image_bytes)
-
-        image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-        prediction_client = aiplatform_v1.PredictionServiceClient()
-
-        endpoint = (
-            f"projects/{os.getenv('VERTEX_PROJECT_ID')}/locations/us-central1/publishers/google/models/imagen-3.0-generate-002"
-        )
-
-        instances = [{
-            "prompt": PROMPT_BASE,
-            "image": {
-                "bytesBase64Encoded": image_b64
-            }
-        }]
-
-        parameters = {
-            "sampleCount": 1,
-            "aspectRatio": "1:1",
-            "guidanceScale": 12,
-            "seed": 42
-        }
+        # Convert based on the sniffed format, not on what the filename claims
+        upload = await ingest_upload(file)
+        image_bytes = upload.read_bytes()
+        if upload.format != "png":
+            image_bytes = await run_in_executor(convert_to_png, image_bytes)
 
-        response = prediction_client.predict(
-            endpoint=endpoint,
-            instances=instances,
-            parameters=parameters,
-        )
-
-        prediction = response.predictions[0]
-        img_b64 = prediction["bytesBase64Encoded"]
-        image_bytes = base64.b64decode(img_b64)
-        image_url = upload_image_to_supabase(image_bytes)
+        images = await imagen_provider.edit(image_bytes, PROMPT_BASE)
+        image_url = await upload_image_to_supabase_async(images[0])
 
         return {"url": image_url}
 
@@ -212,78 +708,68 @@ async def generate_imagen(file: UploadFile = File(...)):
         return {"error": str(e)}
 
 
-FLUX_API_URL = "https://api.aimlapi.com/v1/images/generations"
-FLUX_API_KEY = os.getenv("FLUX_API_KEY")
 #Used for testing Flux generation
 @router.post("/generate-flux")
 async def generate_flux(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     scenario: str = Form(None),
     clothing: str = Form(None)
 ):
-    total_start = time.time()
+    total_start = time.perf_counter()
     print("📥 Flux file received:", file.filename)
     print("🎨 Scenario:", scenario, "| Clothing:", clothing)
 
     try:
-        # Read image bytes
-        image_bytes = await file.read()
-
-        # Upload to Supabase temporarily to get a public image URL for Flux
-        temp_image_url = upload_image_to_supabase(image_bytes)
-        print("☁️ Uploaded temp image for Flux:", temp_image_url)
-
-        # Build prompt
         prompt = build_prompt(scenario, clothing)
-        print("🧠 Flux prompt:", prompt)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-        # Call Flux API
-        start_flux = time.time()
-        response = requests.post(
-            FLUX_API_URL,
-            headers={
-                "Authorization": f"Bearer {FLUX_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "image_url": temp_image_url,
-                "prompt": prompt,
-                "model": "flux/kontext-max/image-to-image",
-            },
-            timeout=60
-        )
-        flux_time = time.time() - start_flux
-        print(f"⚡ Flux API time: {flux_time:.2f}s")
-
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        data = response.json()
-        if "data" not in data or not data["data"]:
-            raise HTTPException(status_code=500, detail="Flux returned no image.")
-
-        generated_image_url = data["data"][0]["url"]
+    try:
+        # Validate the upload and shrink it before anything goes over the wire
+        upload = await ingest_upload(file)
+        _, optimized_image, compression_stats = await _prepare_model_input(upload)
 
-        # Download the generated image
-        img_response = requests.get(generated_image_url)
-        img_response.raise_for_status()
+        print("🧠 Flux prompt:", prompt)
 
-        # Upload Flux result to Supabase
-        final_url = upload_image_to_supabase(img_response.content)
-        total_time = time.time() - total_start
+        # Call Flux API (input sent inline as a data URL where accepted). Flux
+        # bills per image, so it counts against MODEL_RPM but not MODEL_TPM.
+        async with model_admission.slot(images=1):
+            with span("model", provider="flux") as flux_span:
+                result_urls = await flux_provider.generate(optimized_image.getvalue(), prompt)
+        flux_time = flux_span.elapsed
+
+        # Stream the Flux result straight into Supabase, chunk by chunk
+        with span("upload", provider="flux") as transfer_span:
+            async with flux_provider.stream(result_urls[0]) as result:
+                content_type = result.headers.get("content-type", "image/jpeg").split(";")[0]
+                extension = content_type.split("/")[-1] if content_type.startswith("image/") else "jpeg"
+                final_url = await upload_stream_to_supabase(
+                    result.aiter_bytes(), extension=extension, content_type=content_type
+                )
+        transfer_time = transfer_span.elapsed
+        total_time = time.perf_counter() - total_start
+
+        # Temp inputs (only used when inline input is refused) are removed in batches
+        background_tasks.add_task(temp_objects.flush_if_due)
 
         print("✅ Flux generation complete:", final_url)
-        print(f"⏱️ Total Flux route time: {total_time:.2f}s")
 
         return {
             "image_url": final_url,
             "performance": {
                 "total_time": round(total_time, 2),
-                "flux_api_time": round(flux_time, 2)
+                "flux_api_time": round(flux_time, 2),
+                "compression_time": round(compression_stats['compression_time'], 3),
+                "transfer_time": round(transfer_time, 2),
+                "inline_input": flux_provider.inline_input
             }
         }
 
     except Exception as e:
-        total_time = time.time() - total_start
+        total_time = time.perf_counter() - total_start
         print(f"❌ Flux Error after {total_time:.2f}s:", e)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        status = _error_status(e)
+        if status is not None:
+            raise HTTPException(status_code=status[0], detail=str(e), headers=status[1])
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,120 @@
+# routes/jobs.py
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import time
+from ..services.image_encoder import normalize_format
+from ..services.job_store import job_store
+from ..services.metrics import REQUEST_SECONDS
+from ..services.ingest import ingest_upload, IngestedUpload, UploadRejected
+from ..services.resilience import deadline_scope, REQUEST_DEADLINE
+from ..services.latency_budget import BUDGET_MODES
+from ..utils.prompts import build_prompt
+from .generate import run_generation
+
+router = APIRouter()
+
+# How often the SSE stream checks the store for new events
+EVENT_POLL_INTERVAL = 0.25
+
+
+async def _run_job(job_id: str, upload: IngestedUpload, scenario, clothing, output_format, prompt=None,
+                   budget=None):
+    async def on_stage(stage: str, info: dict):
+        job_store.add_event(job_id, stage, info)
+
+    started_at = time.perf_counter()
+    try:
+        with deadline_scope(REQUEST_DEADLINE):
+            result = await run_generation(
+                upload, scenario, clothing, output_format,
+                on_stage=on_stage, started_at=started_at, prompt=prompt, budget=budget
+            )
+        job_store.finish(job_id, result)
+        REQUEST_SECONDS.observe(time.perf_counter() - started_at, "jobs", "ok")
+        print(f"✅ Job {job_id} done in {time.perf_counter() - started_at:.3f}s")
+    except Exception as e:
+        REQUEST_SECONDS.observe(time.perf_counter() - started_at, "jobs", "error")
+        print(f"❌ Job {job_id} failed after {time.perf_counter() - started_at:.3f}s:", e)
+        job_store.fail(job_id, str(e))
+    finally:
+        upload.close()
+
+
+# Start a generation and return immediately; the work runs after the response
+@router.post("/jobs", status_code=202)
+async def create_job(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    scenario: str = Form(None),
+    clothing: str = Form(None),
+    output_format: str = Form(None),
+    latency_budget: str = Form(None)
+):
+    try:
+        output_format = normalize_format(output_format)
+        prompt = build_prompt(scenario, clothing)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if latency_budget is not None and latency_budget not in BUDGET_MODES:
+        raise HTTPException(status_code=422, detail=f"latency_budget must be one of {', '.join(BUDGET_MODES)}")
+
+    # Copied into our own spool: the request's upload is closed once we respond
+    try:
+        upload = await ingest_upload(file, copy=True)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    job = job_store.create()
+    # Still queued: the job only runs once the background task picks it up
+    job_store.add_event(job.id, "received", {"bytes": upload.size, "format": upload.format}, status="queued")
+    background_tasks.add_task(_run_job, job.id, upload, scenario, clothing, output_format, prompt, latency_budget)
+    print("📮 Job queued:", job.id)
+
+    return {
+        "job_id": job.id,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events"
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+def _sse(seq: int, event: dict) -> str:
+    return f"id: {seq}\nevent: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+
+# Server-sent events: replays past stages, then streams new ones until the job ends
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Resume after the last event the browser saw when it reconnects
+    last_event_id = request.headers.get("Last-Event-ID")
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    async def stream():
+        sent = start
+        while True:
+            job = job_store.get(job_id)
+            if job is None:
+                return  # evicted from the store while we were streaming
+            for seq in range(sent, len(job.events)):
+                yield _sse(seq, job.events[seq])
+            sent = len(job.events)
+            if job.done or await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
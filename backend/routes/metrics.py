@@ -0,0 +1,46 @@
+# routes/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..services.metrics import registry
+from ..services.result_cache import result_cache
+from ..services.near_duplicates import near_duplicates
+from .generate import provider_router
+
+router = APIRouter()
+
+CACHE_LOOKUPS = registry.gauge(
+    "gnb_result_cache_lookups", "Result cache lookups since start", labels=("result",)
+)
+NEAR_DUP_LOOKUPS = registry.gauge(
+    "gnb_near_duplicate_lookups", "Perceptual-hash lookups since start", labels=("result",)
+)
+NEAR_DUP_ENTRIES = registry.gauge("gnb_near_duplicate_entries", "Hashes in the near-duplicate index")
+PROVIDER_LATENCY = registry.gauge(
+    "gnb_provider_latency_seconds", "Rolling provider latency percentiles", labels=("provider", "quantile")
+)
+PROVIDER_ERROR_RATE = registry.gauge(
+    "gnb_provider_error_rate", "Rolling provider error rate", labels=("provider",)
+)
+
+
+# Point-in-time values owned by other services, copied in at scrape time
+def _collect() -> None:
+    stats = result_cache.stats()
+    CACHE_LOOKUPS.set("hit", value=stats["hits"])
+    CACHE_LOOKUPS.set("miss", value=stats["misses"])
+    near = near_duplicates.stats()
+    NEAR_DUP_LOOKUPS.set("hit", value=near["hits"])
+    NEAR_DUP_LOOKUPS.set("miss", value=near["misses"])
+    NEAR_DUP_ENTRIES.set(value=near["entries"])
+    for name, provider in provider_router.stats().items():
+        for quantile in ("p50", "p95"):
+            if provider[quantile] is not None:
+                PROVIDER_LATENCY.set(name, quantile[1:], value=provider[quantile])
+        PROVIDER_ERROR_RATE.set(name, value=provider["error_rate"])
+
+
+# Prometheus scrape endpoint
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    _collect()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
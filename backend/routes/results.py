@@ -0,0 +1,28 @@
+# routes/results.py
+from fastapi import APIRouter, HTTPException, Response
+from ..services.result_store import result_store
+
+router = APIRouter()
+
+
+# Upload status of a deferred result; permanent URLs once status is "uploaded"
+@router.get("/results/{result_id}")
+async def get_result(result_id: str):
+    stored = result_store.get(result_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    return stored.to_dict()
+
+
+# Short-lived local copy of one rendition, served from memory
+@router.get("/results/{result_id}/image/{width}")
+async def get_result_image(result_id: str, width: int):
+    stored = result_store.get(result_id)
+    if stored is None or width not in stored.renditions:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    encoded = stored.renditions[width]
+    return Response(
+        encoded.data,
+        media_type=encoded.content_type,
+        headers={"Cache-Control": f"private, max-age={result_store.ttl}"}
+    )
@@ -0,0 +1,26 @@
+# routes/uploads.py
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from ..services.direct_uploads import sign_upload, InvalidUploadKey
+
+router = APIRouter()
+
+
+class UploadRequest(BaseModel):
+    extension: str = "jpg"
+
+
+# Signed URL for uploading the photo straight to storage. The client PUTs the
+# file to upload_url, then calls /api/generate with `key` instead of a file,
+# so large photos never go through this function's request body.
+@router.post("/uploads")
+async def create_upload(request: UploadRequest | None = None):
+    try:
+        signed = await sign_upload((request or UploadRequest()).extension)
+    except InvalidUploadKey as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        print("❌ Upload signing error:", e)
+        raise HTTPException(status_code=502, detail=str(e))
+    print("🔏 Signed upload:", signed["key"])
+    return signed
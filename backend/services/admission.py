@@ -0,0 +1,193 @@
+# backend/services/admission.py
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from .metrics import registry
+from .resilience import time_left
+
+# Admission control in front of the upstream model calls. At most
+# MODEL_CONCURRENCY calls run at once; up to MODEL_QUEUE_SIZE more wait, each
+# for at most MODEL_QUEUE_TIMEOUT seconds. Optional token buckets keep us
+# under the provider's requests/images per minute (MODEL_RPM) and tokens per
+# minute (MODEL_TPM, charged with estimate_tokens() per call). Anything that can't be served in time is rejected
+# straight away with a Retry-After hint instead of piling onto the provider.
+
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "4"))
+MODEL_QUEUE_SIZE = int(os.getenv("MODEL_QUEUE_SIZE", "16"))
+MODEL_QUEUE_TIMEOUT = float(os.getenv("MODEL_QUEUE_TIMEOUT", "10"))
+MODEL_RPM = float(os.getenv("MODEL_RPM", "0"))  # 0 = unlimited
+MODEL_TPM = float(os.getenv("MODEL_TPM", "0"))  # 0 = unlimited
+
+QUEUE_DEPTH = registry.gauge("gnb_admission_queue_depth", "Model calls waiting for a slot")
+IN_FLIGHT = registry.gauge("gnb_admission_in_flight", "Model calls currently running")
+WAIT_SECONDS = registry.histogram(
+    "gnb_admission_wait_seconds", "Time spent queued before a model call started",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+REJECTED = registry.counter(
+    "gnb_admission_rejected_total", "Model calls rejected by admission control", labels=("reason",)
+)
+
+
+# gpt-image-1 output tokens per image, by size and quality
+OUTPUT_IMAGE_TOKENS = {
+    "1024x1024": {"low": 272, "medium": 1056, "high": 4160},
+    "1024x1536": {"low": 408, "medium": 1584, "high": 6240},
+    "1536x1024": {"low": 400, "medium": 1568, "high": 6208},
+}
+
+
+# Tokens one images.edit call is billed for, worked out before the call so
+# it can be charged against MODEL_TPM: prompt text (~4 characters a token),
+# the input image (fit in 2048px, short side at most 768px, 129 tokens per
+# 512px tile plus 65) and n output images. input_size is the longest side
+# of the input, treated as a square: an upper bound for any aspect ratio.
+def estimate_tokens(prompt: str, input_size: int | None, size: str = "1024x1024", quality: str = "low",
+                    n: int = 1) -> int:
+    tokens = math.ceil(len(prompt) / 4)
+    if input_size:
+        side = min(input_size, 768)  # a square's short side
+        tokens += 65 + 129 * math.ceil(side / 512) ** 2
+    per_image = OUTPUT_IMAGE_TOKENS.get(size, OUTPUT_IMAGE_TOKENS["1024x1024"])
+    return tokens + n * per_image.get(quality, per_image["high"])
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, status_code: int, retry_after: float):
+        super().__init__(f"Upstream capacity exhausted ({reason}), retry in {math.ceil(retry_after)}s")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> dict:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+# Tokens refill continuously at rate_per_minute; capacity defaults to one
+# minute's worth. Callers reserve ahead (the balance may go negative) and
+# sleep off their share, so waiters are served in arrival order.
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+
+class AdmissionController:
+    def __init__(self, concurrency: int = MODEL_CONCURRENCY, queue_size: int = MODEL_QUEUE_SIZE,
+                 queue_timeout: float = MODEL_QUEUE_TIMEOUT, rpm: float = MODEL_RPM, tpm: float = MODEL_TPM):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.request_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.token_bucket = TokenBucket(tpm) if tpm > 0 else None
+        self.waiting = 0
+        self.in_flight = 0
+        # Callers inside slot(), queued or running (the semaphore can't tell us
+        # about acquires that are scheduled but haven't run yet)
+        self.admitted = 0
+        # Smoothed slot hold time, for Retry-After estimates
+        self.service_time = 1.0
+        self._loop = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    # asyncio primitives belong to one event loop; rebuild if the loop changed
+    # (tests spin up a fresh loop per request)
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self.waiting = self.in_flight = self.admitted = 0
+        return self._semaphore
+
+    def retry_after(self) -> float:
+        return self.service_time * (self.waiting + 1) / self.concurrency
+
+    def _reject(self, reason: str, status_code: int, retry_after: float):
+        REJECTED.inc(reason)
+        raise AdmissionRejected(reason, status_code, retry_after)
+
+    def _publish(self) -> None:
+        QUEUE_DEPTH.set(value=self.waiting)
+        IN_FLIGHT.set(value=self.in_flight)
+
+    # Hold one upstream slot: `images` counts against MODEL_RPM, `tokens` against MODEL_TPM
+    @asynccontextmanager
+    async def slot(self, images: int = 1, tokens: int = 0):
+        semaphore = self.semaphore()
+        if self.admitted >= self.concurrency + self.queue_size:
+            self._reject("queue_full", 503, self.retry_after())
+
+        start = time.monotonic()
+        # Never queue past the request's own deadline
+        queue_timeout = time_left(self.queue_timeout)
+        self.admitted += 1
+        self.waiting += 1
+        self._publish()
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout", 503, self.retry_after())
+            finally:
+                self.waiting -= 1
+                self._publish()
+        except BaseException:
+            self.admitted -= 1
+            raise
+
+        try:
+            # Rate limits: sleep off the deficit if it fits in the remaining deadline
+            remaining = max(0.0, queue_timeout - (time.monotonic() - start))
+            buckets = [(bucket, amount) for bucket, amount in
+                       ((self.request_bucket, images), (self.token_bucket, tokens)) if bucket and amount]
+            delay = max((bucket.wait_time(amount) for bucket, amount in buckets), default=0.0)
+            if delay > remaining:
+                self._reject("rate_limited", 429, delay)
+            for bucket, amount in buckets:
+                bucket.take(amount)
+            if delay:
+                await asyncio.sleep(delay)
+            WAIT_SECONDS.observe(time.monotonic() - start)
+
+            self.in_flight += 1
+            self._publish()
+            held = time.monotonic()
+            try:
+                yield
+            finally:
+                self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - held)
+                self.in_flight -= 1
+                self._publish()
+        finally:
+            self.admitted -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "queue_size": self.queue_size,
+        }
+
+
+model_admission = AdmissionController()
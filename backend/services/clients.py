@@ -0,0 +1,114 @@
+# backend/services/clients.py
+import asyncio
+import inspect
+import os
+import time
+import httpx
+
+# One place that owns every upstream client (OpenAI, Supabase, Flux, Vertex).
+# Clients are built on first use rather than at import, share keep-alive
+# connection pools, and are closed together from the FastAPI lifespan hook.
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2 = os.getenv("HTTP2", "false").lower() in ("1", "true", "yes")
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_http_client(http2: bool = HTTP2, max_connections: int = HTTP_MAX_CONNECTIONS,
+                      max_keepalive: int = HTTP_MAX_KEEPALIVE, timeout: float = HTTP_TIMEOUT,
+                      connect_timeout: float = HTTP_CONNECT_TIMEOUT, **kwargs) -> httpx.AsyncClient:
+    if http2 and not http2_available():
+        print("⚠️ HTTP2=true but the h2 package is missing, using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        **kwargs,
+    )
+
+
+class ClientRegistry:
+    def __init__(self):
+        self._clients: dict[str, object] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.init_times: dict[str, float] = {}
+
+    def get(self, name: str, factory):
+        client = self._clients.get(name)
+        if client is None:
+            start = time.perf_counter()
+            client = self._clients[name] = factory()
+            self.init_times[name] = time.perf_counter() - start
+            print(f"🔌 Client ready: {name} ({self.init_times[name] * 1000:.1f} ms)")
+        return client
+
+    # For SDKs whose constructor must be awaited (e.g. supabase acreate_client)
+    async def aget(self, name: str, factory):
+        if name in self._clients:
+            return self._clients[name]
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name not in self._clients:
+                start = time.perf_counter()
+                self._clients[name] = await factory()
+                self.init_times[name] = time.perf_counter() - start
+                print(f"🔌 Client ready: {name} ({self.init_times[name] * 1000:.1f} ms)")
+        return self._clients[name]
+
+    # Pooled httpx client per upstream, so one slow host can't starve the others' pool
+    def http(self, name: str, **kwargs) -> httpx.AsyncClient:
+        return self.get(f"http:{name}", lambda: build_http_client(**kwargs))
+
+    def lazy(self, name: str, factory) -> "LazyClient":
+        return LazyClient(self, name, factory)
+
+    def names(self) -> list[str]:
+        return list(self._clients)
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        self._locks = {}
+        for name, client in clients.items():
+            close = getattr(client, "aclose", None) or getattr(client, "close", None)
+            if close is None:
+                transport = getattr(client, "transport", None)
+                close = getattr(transport, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"⚠️ Closing {name} failed:", e)
+        print(f"🔌 Closed {len(clients)} clients")
+
+
+# Stands in for a client at module level; the real one is built on first attribute access
+class LazyClient:
+    def __init__(self, registry: ClientRegistry, name: str, factory):
+        self._registry = registry
+        self._name = name
+        self._factory = factory
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name, self._factory), attr)
+
+
+clients = ClientRegistry()
@@ -0,0 +1,63 @@
+# backend/services/direct_uploads.py
+import os
+import re
+from dataclasses import dataclass
+from uuid import uuid4
+from .ingest import ingest_stream
+from .result_cache import MemoryCacheBackend
+from .supabase_uploader import create_signed_upload_url, stream_object
+
+# Direct-to-storage uploads: POST /api/uploads hands out a signed URL under
+# UPLOAD_PREFIX, the client PUTs its photo to storage, then calls /generate
+# with the object key instead of a file. The API only reads the object back
+# once per key: the optimized model input is cached, since keys are never
+# overwritten.
+
+UPLOAD_PREFIX = "uploads/"
+# Objects read back from storage skip the API body limit, so they get their own cap
+STORED_INPUT_MAX_BYTES = int(os.getenv("STORED_INPUT_MAX_BYTES", str(50 * 1024 * 1024)))
+INPUT_CACHE_SIZE = int(os.getenv("INPUT_CACHE_SIZE", "256"))
+INPUT_CACHE_TTL = int(os.getenv("INPUT_CACHE_TTL", "3600"))
+
+UPLOAD_EXTENSIONS = {"jpg", "jpeg", "png", "webp", "heic", "avif", "gif"}
+_KEY_PATTERN = re.compile(rf"^{UPLOAD_PREFIX}[0-9a-f]{{32}}\.[a-z]+$")
+
+
+class InvalidUploadKey(ValueError):
+    pass
+
+
+# Reference to an object the client uploaded straight to storage
+@dataclass(frozen=True)
+class StoredInput:
+    key: str
+
+
+def new_upload_key(extension: str = "jpg") -> str:
+    extension = extension.lower().lstrip(".")
+    if extension not in UPLOAD_EXTENSIONS:
+        raise InvalidUploadKey(f"Unsupported extension: {extension}")
+    return f"{UPLOAD_PREFIX}{uuid4().hex}.{extension}"
+
+
+# Only keys we handed out: no reading arbitrary objects (or results) from the bucket
+def parse_upload_key(key: str) -> StoredInput:
+    if not _KEY_PATTERN.match(key or ""):
+        raise InvalidUploadKey(f"Not an upload key: {key!r}")
+    return StoredInput(key)
+
+
+async def sign_upload(extension: str = "jpg") -> dict:
+    key = new_upload_key(extension)
+    signed = await create_signed_upload_url(key)
+    return {"key": key, "method": "PUT", "max_bytes": STORED_INPUT_MAX_BYTES, **signed}
+
+
+# Streams the object into a spooled buffer with the usual size/format checks
+async def read_stored_input(stored: StoredInput):
+    async with stream_object(stored.key) as response:
+        return await ingest_stream(response.aiter_bytes(), max_bytes=STORED_INPUT_MAX_BYTES)
+
+
+# Optimized model input per key: {"data": bytes, "stats": compression stats}
+input_cache = MemoryCacheBackend(max_entries=INPUT_CACHE_SIZE, ttl=INPUT_CACHE_TTL)
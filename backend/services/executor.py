@@ -0,0 +1,18 @@
+# backend/services/executor.py
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Bounded thread pool for CPU-bound PIL work (convert, optimize, overlay).
+# Pillow releases the GIL while decoding/encoding, so a few threads keep the
+# event loop free without oversubscribing a small serverless CPU.
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-worker")
+
+
+# Run a blocking function on the image pool and await its result
+async def run_in_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
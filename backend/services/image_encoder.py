@@ -0,0 +1,113 @@
+# backend/services/image_encoder.py
+import os
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from PIL import Image, features
+
+# Output encoding for the final image. A 1024x1024 photographic PNG is
+# several MB; WebP/AVIF/progressive JPEG at a byte budget is ~10x smaller
+# and looks the same to the customer.
+
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "webp")
+OUTPUT_QUALITY = int(os.getenv("OUTPUT_QUALITY", "85"))
+# Target size for the encoded file; quality is searched to fit under it
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", "300000"))
+MIN_QUALITY = 40
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+FORMAT_ALIASES = {"jpg": "jpeg"}
+
+
+def avif_supported() -> bool:
+    return features.check("avif")
+
+
+def supported_formats() -> list[str]:
+    return [fmt for fmt in CONTENT_TYPES if fmt != "avif" or avif_supported()]
+
+
+def normalize_format(fmt: str | None) -> str:
+    fmt = (fmt or OUTPUT_FORMAT).lower()
+    fmt = FORMAT_ALIASES.get(fmt, fmt)
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"Unsupported output format '{fmt}', expected one of {supported_formats()}")
+    if fmt == "avif" and not avif_supported():
+        # Older Pillow builds without libavif: WebP is the closest match
+        return "webp"
+    return fmt
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    format: str
+    quality: int | None
+    attempts: int
+    encode_time: float
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def extension(self) -> str:
+        return self.format
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPES[self.format]
+
+
+def _save(image: Image.Image, fmt: str, quality: int | None) -> BytesIO:
+    buffer = BytesIO()
+    if fmt == "png":
+        image.save(buffer, format="PNG")
+    elif fmt == "jpeg":
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality, progressive=True)
+    elif fmt == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buffer, format="AVIF", quality=quality, speed=8)
+    return buffer
+
+
+# Encode once at a fixed quality, or binary-search the highest quality that
+# fits max_bytes (PNG is lossless, so the budget doesn't apply to it)
+def encode_image(image: Image.Image, fmt: str | None = None, quality: int | None = None,
+                 max_bytes: int | None = OUTPUT_MAX_BYTES) -> EncodedImage:
+    start = time.perf_counter()
+    fmt = normalize_format(fmt)
+
+    if fmt == "png":
+        buffer = _save(image, fmt, None)
+        return EncodedImage(buffer.getvalue(), fmt, None, 1, time.perf_counter() - start)
+
+    quality = quality or OUTPUT_QUALITY
+    buffer = _save(image, fmt, quality)
+    attempts = 1
+
+    if max_bytes and buffer.tell() > max_bytes and quality > MIN_QUALITY:
+        low, high = MIN_QUALITY, quality - 1
+        best, best_quality = None, MIN_QUALITY
+        while low <= high:
+            mid = (low + high) // 2
+            candidate = _save(image, fmt, mid)
+            attempts += 1
+            if candidate.tell() <= max_bytes:
+                best, best_quality = candidate, mid
+                low = mid + 1
+            else:
+                high = mid - 1
+        if best is None:
+            # Nothing fits: the search ended on MIN_QUALITY, ship that rather than failing
+            best = candidate
+        buffer, quality = best, best_quality
+
+    return EncodedImage(buffer.getvalue(), fmt, quality, attempts, time.perf_counter() - start)
@@ -0,0 +1,102 @@
+# backend/services/image_pipeline.py
+import base64
+import time
+from io import BytesIO
+from PIL import Image
+from .optimize_images import optimize_input_image, check_pixel_budget, pixel_bytes, PASSTHROUGH_MAX_BYTES
+from .logo_overlay import logo_engine
+from .image_encoder import EncodedImage, encode_image, OUTPUT_MAX_BYTES
+
+
+# Carries one decoded PIL image through the generate stages so it is decoded
+# once on the way in and encoded once on the way out. Replaces the old
+# convert_to_png → optimize_input_image → overlay_gnb_logo chain, which
+# decoded and re-encoded the same pixels at every step.
+class ImagePipeline:
+    def __init__(self, image: Image.Image, source_size: int = 0, source: bytes | None = None):
+        self.image = image
+        self.source_size = source_size
+        # Original upload, kept so model_input can pass it through untouched
+        self.source = source
+        self.encoded_size = 0
+        self.timings: dict[str, float] = {}
+        # Most decoded pixel memory this pipeline held at once (Pillow's own
+        # buffers, which neither tracemalloc nor a shared RSS can attribute)
+        self.peak_pixel_bytes = 0
+
+    def _held(self, nbytes: int) -> None:
+        self.peak_pixel_bytes = max(self.peak_pixel_bytes, nbytes)
+
+    # Opens lazily: only the header is parsed here, pixels are decoded by the
+    # first stage that needs them (which lets JPEG thumbnailing decode at a
+    # reduced scale). Any format Pillow reads works, so no PNG conversion step.
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ImagePipeline":
+        start = time.perf_counter()
+        image = Image.open(BytesIO(data))
+        check_pixel_budget(image)  # header only, before any decode
+        pipeline = cls(image, len(data), data)
+        pipeline.timings["open_time"] = time.perf_counter() - start
+        return pipeline
+
+    # Reads straight from the spooled upload (see services/ingest.py). Only an
+    # upload small enough to be passed through is copied into memory.
+    @classmethod
+    def from_upload(cls, upload) -> "ImagePipeline":
+        if upload.size <= PASSTHROUGH_MAX_BYTES:
+            return cls.from_bytes(upload.read_bytes())
+        start = time.perf_counter()
+        upload.file.seek(0)
+        image = Image.open(upload.file)
+        check_pixel_budget(image)
+        pipeline = cls(image, upload.size)
+        pipeline.timings["open_time"] = time.perf_counter() - start
+        return pipeline
+
+    @classmethod
+    def from_base64(cls, b64: str) -> "ImagePipeline":
+        start = time.perf_counter()
+        pipeline = cls.from_bytes(base64.b64decode(b64))
+        pipeline.timings["decode_time"] = time.perf_counter() - start
+        return pipeline
+
+    # Downscaled JPEG for the model upload (the only intermediate encode)
+    def model_input(self, max_size: int = 512, quality: int = 85) -> tuple[BytesIO, dict]:
+        start = time.perf_counter()
+        buffer, stats = optimize_input_image(
+            self.image, max_size=max_size, quality=quality,
+            original_size=self.source_size, source_bytes=self.source
+        )
+        self.timings["model_input_time"] = time.perf_counter() - start
+        self._held(stats.get("pixel_bytes", 0))
+        return buffer, stats
+
+    def overlay_logo(self, logo: str = "white") -> "ImagePipeline":
+        start = time.perf_counter()
+        # Composited in place if already RGBA, otherwise the decoded result and
+        # its RGBA copy exist together
+        source = pixel_bytes(self.image.size, self.image.mode)
+        copied = self.image.mode != "RGBA"
+        self.image = logo_engine.apply(self.image, logo)
+        self._held(source + pixel_bytes(self.image.size, self.image.mode) if copied else source)
+        self.timings["overlay_time"] = time.perf_counter() - start
+        return self
+
+    # Final encode, done exactly once per request (plus quality probes when
+    # a byte budget is set, see encode_image)
+    def encode(self, fmt: str | None = None, quality: int | None = None,
+               max_bytes: int | None = OUTPUT_MAX_BYTES) -> EncodedImage:
+        encoded = encode_image(self.image, fmt, quality=quality, max_bytes=max_bytes)
+        self.encoded_size = encoded.size
+        self.timings["encode_time"] = encoded.encode_time
+        return encoded
+
+    def stats(self) -> dict:
+        timings = {name: round(seconds, 4) for name, seconds in self.timings.items()}
+        timings["wall_time"] = round(sum(self.timings.values()), 4)
+        timings["pixel_memory_mb"] = pixel_mb(self.peak_pixel_bytes)
+        return timings
+
+
+def pixel_mb(nbytes: int) -> float:
+    return round(nbytes / 2**20, 2)
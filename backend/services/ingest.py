@@ -0,0 +1,227 @@
+# backend/services/ingest.py
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO
+
+# Upload ingestion: bounded size, real format from magic bytes (never the
+# filename or the client's Content-Type), and a spooled buffer (memory under
+# SPOOL_MAX_MEMORY, temp file above) that the image pipeline reads from.
+# UploadLimitMiddleware rejects oversized bodies before multipart parsing.
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+SPOOL_MAX_MEMORY = int(os.getenv("SPOOL_MAX_MEMORY", str(1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+# Headroom for multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Formats the pipeline can open (HEIC only with the optional pillow-heif plugin)
+SUPPORTED_FORMATS = {"jpeg", "png", "webp", "gif", "bmp", "tiff", "avif"}
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    SUPPORTED_FORMATS.add("heic")
+except ImportError:
+    pass
+
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"}
+AVIF_BRANDS = {b"avif", b"avis"}
+
+
+class UploadRejected(ValueError):
+    status_code = 400
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+
+
+class UnsupportedUpload(UploadRejected):
+    status_code = 415
+
+
+def sniff_format(head: bytes) -> str | None:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    # ISO-BMFF: size, "ftyp", major brand
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in AVIF_BRANDS:
+            return "avif"
+        if brand in HEIF_BRANDS:
+            return "heic"
+    return None
+
+
+@dataclass
+class IngestedUpload:
+    file: BinaryIO
+    size: int
+    format: str
+
+    @property
+    def content_type(self) -> str:
+        return f"image/{self.format}"
+
+    def read_bytes(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _check_size(size: int, max_bytes: int) -> None:
+    if size > max_bytes:
+        raise UploadTooLarge(f"Upload is larger than {max_bytes / 1024 / 1024:.0f}MB")
+
+
+def _check_format(head: bytes) -> str:
+    fmt = sniff_format(head)
+    if fmt is None or fmt not in SUPPORTED_FORMATS:
+        raise UnsupportedUpload(f"Unsupported image type ({fmt or 'unknown'})")
+    return fmt
+
+
+# Validates an UploadFile chunk by chunk. The format is checked on the first
+# chunk, so junk is rejected without reading the rest. With copy=True the
+# data goes into our own spooled file, which outlives the request (the job
+# API hands it to a background task after the response).
+async def ingest_upload(upload, max_bytes: int | None = None, copy: bool = False) -> IngestedUpload:
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    if upload.size is not None:
+        _check_size(upload.size, max_bytes)
+
+    await upload.seek(0)
+    head = await upload.read(CHUNK_SIZE)
+    fmt = _check_format(head)
+
+    if not copy:
+        size = upload.size
+        if size is None:
+            size = len(head)
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                _check_size(size, max_bytes)
+        await upload.seek(0)
+        return IngestedUpload(upload.file, size, fmt)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        spool.write(head)
+        size = len(head)
+        while chunk := await upload.read(CHUNK_SIZE):
+            size += len(chunk)
+            _check_size(size, max_bytes)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return IngestedUpload(spool, size, fmt)
+
+
+# Same checks for an async byte stream (e.g. an object read back from storage).
+# Chunks can be tiny, so the format is sniffed once enough of the head arrived.
+async def ingest_stream(chunks, max_bytes: int | None = None) -> IngestedUpload:
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    head = b""
+    fmt = None
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            _check_size(size, max_bytes)
+            if fmt is None and len(head) < 32:
+                head += chunk[:32]
+                if len(head) >= 32:
+                    fmt = _check_format(head)
+            spool.write(chunk)
+        if fmt is None:
+            fmt = _check_format(head)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return IngestedUpload(spool, size, fmt)
+
+
+# Same checks for bytes already in memory (tests, CLI, storage reads)
+def ingest_bytes(data: bytes, max_bytes: int | None = None) -> IngestedUpload:
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    _check_size(len(data), max_bytes)
+    fmt = _check_format(data[:CHUNK_SIZE])
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    spool.write(data)
+    spool.seek(0)
+    return IngestedUpload(spool, len(data), fmt)
+
+
+# Pure ASGI middleware: refuses upload requests whose declared Content-Length
+# is over the limit before the body is read, and cuts off chunked bodies as
+# soon as they cross it. Either way the client gets a 413.
+class UploadLimitMiddleware:
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+                 path_prefixes: tuple[str, ...] = ("/api/generate", "/api/jobs")):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefixes):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            return await self._reject(send)
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if exceeded and not started:
+                return  # the 413 below replaces whatever the app tries to send
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = b'{"error": "Upload too large", "detail": "Upload too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,189 @@
+# backend/services/job_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from uuid import uuid4
+
+# Job records for the async /api/jobs API. A job moves queued → running →
+# succeeded | failed and collects one event per pipeline stage, which the
+# polling and SSE endpoints replay to the client. Events recorded before the
+# worker picks the job up (e.g. "received") pass status="queued".
+
+JOB_STORE_DB = os.getenv("JOB_STORE_DB")  # e.g. /tmp/gnb-jobs.db
+JOB_STORE_MAX_JOBS = int(os.getenv("JOB_STORE_MAX_JOBS", "1000"))
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"
+    stage: str | None = None
+    events: list[dict] = field(default_factory=list)
+    result: dict | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _event(job: Job, stage: str, data: dict) -> dict:
+    return {"stage": stage, "elapsed": round(time.time() - job.created_at, 3), **data}
+
+
+class JobStore(ABC):
+    @abstractmethod
+    def create(self) -> Job:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Job | None:
+        ...
+
+    @abstractmethod
+    def add_event(self, job_id: str, stage: str, data: dict | None = None, status: str = "running") -> None:
+        ...
+
+    @abstractmethod
+    def finish(self, job_id: str, result: dict) -> None:
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str) -> None:
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, max_jobs: int = JOB_STORE_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> Job:
+        job = Job(id=uuid4().hex)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def _update(self, job_id: str, stage: str, data: dict, **changes) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.events.append(_event(job, stage, data))
+            job.stage = stage
+            job.updated_at = time.time()
+            for name, value in changes.items():
+                setattr(job, name, value)
+
+    def add_event(self, job_id: str, stage: str, data: dict | None = None, status: str = "running") -> None:
+        self._update(job_id, stage, data or {}, status=status)
+
+    def finish(self, job_id: str, result: dict) -> None:
+        self._update(job_id, "succeeded", {"image_url": result.get("image_url")},
+                     status="succeeded", result=result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._update(job_id, "failed", {"error": error}, status="failed", error=error)
+
+
+# Same behaviour backed by SQLite, for local runs that outlive the process
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT,"
+            " result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, seq));"
+        )
+        self._conn.commit()
+
+    def create(self) -> Job:
+        job = Job(id=uuid4().hex)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (job.id, job.status, job.created_at, job.updated_at),
+            )
+            self._conn.commit()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, stage, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            events = [
+                json.loads(event) for (event,) in self._conn.execute(
+                    "SELECT event FROM job_events WHERE job_id = ? ORDER BY seq", (job_id,)
+                )
+            ]
+        return Job(
+            id=row[0], status=row[1], stage=row[2],
+            result=json.loads(row[3]) if row[3] else None, error=row[4],
+            created_at=row[5], updated_at=row[6], events=events,
+        )
+
+    def _update(self, job_id: str, stage: str, data: dict, status: str,
+                result: dict | None = None, error: str | None = None) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, (SELECT COUNT(*) FROM job_events WHERE job_id = ?) FROM jobs WHERE id = ?",
+                (job_id, job_id),
+            ).fetchone()
+            if row is None:
+                return
+            event = {"stage": stage, "elapsed": round(time.time() - row[0], 3), **data}
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                (job_id, row[1], json.dumps(event)),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, updated_at = ?,"
+                " result = COALESCE(?, result), error = COALESCE(?, error) WHERE id = ?",
+                (status, stage, time.time(), json.dumps(result) if result is not None else None, error, job_id),
+            )
+            self._conn.commit()
+
+    def add_event(self, job_id: str, stage: str, data: dict | None = None, status: str = "running") -> None:
+        self._update(job_id, stage, data or {}, status)
+
+    def finish(self, job_id: str, result: dict) -> None:
+        self._update(job_id, "succeeded", {"image_url": result.get("image_url")}, "succeeded", result=result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._update(job_id, "failed", {"error": error}, "failed", error=error)
+
+
+def build_default_job_store() -> JobStore:
+    if JOB_STORE_DB:
+        return SQLiteJobStore(JOB_STORE_DB)
+    return InMemoryJobStore()
+
+
+job_store = build_default_job_store()
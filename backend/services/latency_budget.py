@@ -0,0 +1,208 @@
+# backend/services/latency_budget.py
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from .renditions import RENDITION_WIDTHS
+from .image_encoder import OUTPUT_MAX_BYTES
+
+# Request-level latency budget. Each level trades quality for speed on the
+# three knobs we control: how far the input is downscaled before the model
+# call, what we ask the model for, and how much work the output encode does.
+# A mode (fast / balanced / best) is a p95 target plus a range of levels; the
+# controller starts each mode at its preferred level and, from the rolling
+# latencies it observes and the current admission queue depth, steps down
+# when the target is at risk. It steps back up once latencies have headroom
+# and the better level's model time fits the current request rate.
+
+LATENCY_BUDGET = os.getenv("LATENCY_BUDGET", "balanced")
+# p95 targets in seconds (request received → response ready)
+P95_TARGETS = {
+    "fast": float(os.getenv("LATENCY_TARGET_FAST", "12")),
+    "balanced": float(os.getenv("LATENCY_TARGET_BALANCED", "25")),
+    "best": float(os.getenv("LATENCY_TARGET_BEST", "60")),
+}
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "50"))
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "10"))
+# Step down once the rolling p95 passes this fraction of the target (before
+# it is missed: by then a queue has built up), back up below LATENCY_HEADROOM
+LATENCY_DEGRADE_AT = float(os.getenv("LATENCY_DEGRADE_AT", "0.85"))
+LATENCY_HEADROOM = float(os.getenv("LATENCY_HEADROOM", "0.6"))
+# ...and only if the better level would keep at most this share of the model
+# slots busy at the current request rate
+LATENCY_MAX_UTILIZATION = float(os.getenv("LATENCY_MAX_UTILIZATION", "0.8"))
+
+BUDGET_MODES = tuple(P95_TARGETS)
+
+
+@dataclass(frozen=True)
+class BudgetSettings:
+    level: int
+    input_max_size: int
+    input_quality: int
+    model_size: str
+    model_quality: str
+    output_widths: tuple[int, ...]
+    output_quality: int | None
+    output_max_bytes: int | None
+
+    # Cache/near-duplicate variant: the reference level keeps the plain
+    # format so existing cache keys stay valid
+    def variant(self, output_format: str) -> str:
+        return output_format if self.level == REFERENCE_LEVEL else f"{output_format}:L{self.level}"
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "output_widths": list(self.output_widths)}
+
+
+# Best quality first. Level 2 is what /generate always used before budgets.
+LEVELS = (
+    BudgetSettings(0, 1024, 90, "1024x1024", "medium", RENDITION_WIDTHS, None, OUTPUT_MAX_BYTES),
+    BudgetSettings(1, 768, 85, "1024x1024", "low", RENDITION_WIDTHS, None, OUTPUT_MAX_BYTES),
+    BudgetSettings(2, 512, 85, "1024x1024", "low", RENDITION_WIDTHS, None, OUTPUT_MAX_BYTES),
+    # No byte-budget search (one encode per width) and fewer renditions
+    BudgetSettings(3, 384, 80, "1024x1024", "low", RENDITION_WIDTHS[-2:], 80, None),
+    BudgetSettings(4, 256, 75, "1024x1024", "low", RENDITION_WIDTHS[-1:], 75, None),
+)
+REFERENCE_LEVEL = 2
+
+# (preferred, most degraded) level per mode
+MODE_LEVELS = {"best": (0, 2), "balanced": (2, 4), "fast": (3, 4)}
+
+
+def default_settings() -> BudgetSettings:
+    return LEVELS[REFERENCE_LEVEL]
+
+
+def _p95(samples) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class _ModeState:
+    def __init__(self, level: int, window: int):
+        self.level = level
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.model_times: deque[float] = deque(maxlen=window)
+        # Model seconds per level, kept across steps: what a level would cost now
+        self.level_model_times: dict[int, deque[float]] = {}
+        self.completions: deque[float] = deque(maxlen=window)
+        self.concurrency = 1
+        self.reason = "preferred"
+
+
+def _mean(samples) -> float | None:
+    return sum(samples) / len(samples) if samples else None
+
+
+class LatencyBudgetController:
+    def __init__(self, targets: dict = P95_TARGETS, window: int = LATENCY_WINDOW,
+                 min_samples: int = LATENCY_MIN_SAMPLES, degrade_at: float = LATENCY_DEGRADE_AT,
+                 headroom: float = LATENCY_HEADROOM, max_utilization: float = LATENCY_MAX_UTILIZATION,
+                 levels=LEVELS, mode_levels: dict = MODE_LEVELS, clock=time.monotonic):
+        self.targets = dict(targets)
+        self.window = window
+        self.min_samples = min_samples
+        self.degrade_at = degrade_at
+        self.headroom = headroom
+        self.max_utilization = max_utilization
+        self.levels = levels
+        self.mode_levels = mode_levels
+        self.clock = clock
+        self._states = {mode: _ModeState(mode_levels[mode][0], window) for mode in targets}
+
+    # Settings for the next request in `mode`. Queued model calls ahead of it
+    # cost roughly queue_depth / concurrency model times before it even
+    # starts, so a deep queue degrades straight away instead of waiting for
+    # the p95 to catch up.
+    def choose(self, mode: str, queue_depth: int = 0, concurrency: int | None = None) -> tuple[BudgetSettings, str]:
+        state = self._states[mode]
+        if concurrency:
+            state.concurrency = concurrency
+        target = self.targets[mode]
+        worst = self.mode_levels[mode][1]
+        level, reason = state.level, state.reason
+
+        if queue_depth and state.model_times:
+            model_time = _mean(state.model_times)
+            expected = (_p95(state.latencies) or model_time) + queue_depth / state.concurrency * model_time
+            if expected > self.degrade_at * target:
+                level += 2 if expected > 1.5 * target else 1
+                reason = "queue"
+        return self.levels[min(level, worst)], reason
+
+    # Share of the model slots the given level would keep busy at the current
+    # completion rate; None until there is enough history to tell
+    def utilization(self, mode: str, level: int) -> float | None:
+        state = self._states[mode]
+        model_time = _mean(state.level_model_times.get(level))
+        if model_time is None or len(state.completions) < self.min_samples:
+            return None
+        span = state.completions[-1] - state.completions[0]
+        if span <= 0:
+            return None
+        rate = (len(state.completions) - 1) / span
+        return rate * model_time / state.concurrency
+
+    # Completed (non-cached) request: total latency, its model stage and the
+    # level it ran at. Requests still finishing at a better level than the
+    # current one say nothing about it, so only their model time is kept.
+    def observe(self, mode: str, latency: float, model_time: float | None = None, level: int | None = None) -> None:
+        state = self._states[mode]
+        state.completions.append(self.clock())
+        if model_time is not None:
+            state.model_times.append(model_time)
+            if level is not None:
+                state.level_model_times.setdefault(level, deque(maxlen=self.window)).append(model_time)
+        if level is not None and level < state.level:
+            return
+        state.latencies.append(latency)
+        if len(state.latencies) < self.min_samples:
+            return
+
+        target = self.targets[mode]
+        preferred, worst = self.mode_levels[mode]
+        p95 = _p95(state.latencies)
+        if p95 > self.degrade_at * target and state.level < worst:
+            self._step(state, +1, f"p95 {p95:.1f}s near {target:g}s target")
+        elif p95 < self.headroom * target and state.level > preferred and self._can_recover(mode, state):
+            self._step(state, -1, "recovered")
+
+    # Step back up only when the better level would not saturate the model
+    # slots at the current request rate (its latency at low load says
+    # nothing about a spike), and on a full window when that is unknown
+    def _can_recover(self, mode: str, state: _ModeState) -> bool:
+        utilization = self.utilization(mode, state.level - 1)
+        if utilization is None:
+            return len(state.latencies) == state.latencies.maxlen
+        return utilization < self.max_utilization
+
+    # New level: the latency window described the old settings, start it
+    # afresh (model times stay, the queue estimate needs them right away)
+    def _step(self, state: _ModeState, delta: int, reason: str) -> None:
+        state.level += delta
+        state.reason = reason
+        state.latencies.clear()
+        print(f"🎚️ Latency budget → level {state.level} ({reason})")
+
+    def stats(self) -> dict:
+        return {
+            mode: {
+                "level": state.level,
+                "target_p95": self.targets[mode],
+                "p95": _p95(state.latencies),
+                "samples": len(state.latencies),
+                "reason": state.reason,
+            }
+            for mode, state in self._states.items()
+        }
+
+
+latency_controller = LatencyBudgetController()
+
+
+def budget_report(mode: str, settings: BudgetSettings, reason: str, controller=None) -> dict:
+    controller = controller or latency_controller
+    return {"mode": mode, "target_p95": controller.targets[mode], "reason": reason, **settings.to_dict()}
@@ -1,31 +1,71 @@
 from PIL import Image
 from io import BytesIO
 from pathlib import Path
+from functools import lru_cache
+import threading
 
-def overlay_gnb_logo(ai_image_bytes: bytes) -> BytesIO:
-    # Load base image from bytes
-    base_image = Image.open(BytesIO(ai_image_bytes)).convert("RGBA")
-
-    # Resolve path to logo: backend/services/ → backend/assets/gnb-white-logo.png
-    logo_path = Path(__file__).resolve().parent.parent / "assets" / "gnb-white-logo.png"
-    print("🔍 Using logo path:", logo_path)
-
-    # Load and resize logo
-    logo = Image.open(logo_path).convert("RGBA")
-    logo_width = int(base_image.width * 0.30)
-    logo_ratio = logo_width / logo.width
-    logo_height = int(logo.height * logo_ratio)
-    logo = logo.resize((logo_width, logo_height), Image.LANCZOS)
-
-    # Paste in bottom-right corner with margin
-    position = (
-        base_image.width - logo_width - 20,
-        base_image.height - logo_height - 40
-    )
-    base_image.paste(logo, position, logo)
-
-    # Save to in-memory PNG
-    output_buffer = BytesIO()
-    base_image.save(output_buffer, format="PNG")
-    output_buffer.seek(0)
-    return output_buffer
+# backend/services/ → backend/assets/
+ASSETS_DIR = Path(__file__).resolve().parent.parent / "assets"
+
+LOGO_FILES = {
+    "white": "gnb-white-logo.png",
+    "green": "gnb-green-logo.png",
+}
+
+
+# Loads each logo once and memoizes its resized variants per base width.
+# Generated images are almost always 1024px wide, so after the first
+# request the overlay is a single alpha_composite on the corner region.
+class LogoOverlayEngine:
+    def __init__(self, assets_dir: Path = ASSETS_DIR, width_ratio: float = 0.30,
+                 margin: tuple[int, int] = (20, 40), cache_size: int = 32):
+        self.assets_dir = Path(assets_dir)
+        self.width_ratio = width_ratio
+        self.margin = margin
+        self._originals: dict[str, Image.Image] = {}
+        self._lock = threading.Lock()
+        self.resized_logo = lru_cache(maxsize=cache_size)(self._resize_logo)
+
+    def load_logo(self, logo: str) -> Image.Image:
+        if logo not in LOGO_FILES:
+            raise ValueError(f"Unknown logo '{logo}', expected one of {sorted(LOGO_FILES)}")
+        with self._lock:
+            if logo not in self._originals:
+                with Image.open(self.assets_dir / LOGO_FILES[logo]) as img:
+                    self._originals[logo] = img.convert("RGBA")
+            return self._originals[logo]
+
+    def _resize_logo(self, logo: str, base_width: int) -> Image.Image:
+        original = self.load_logo(logo)
+        logo_width = int(base_width * self.width_ratio)
+        logo_height = int(original.height * (logo_width / original.width))
+        return original.resize((logo_width, logo_height), Image.LANCZOS)
+
+    # Composite the logo into the bottom-right corner of an RGBA image, in place
+    def apply(self, base_image: Image.Image, logo: str = "white") -> Image.Image:
+        if base_image.mode != "RGBA":
+            base_image = base_image.convert("RGBA")
+        logo_image = self.resized_logo(logo, base_image.width)
+        position = (
+            max(0, base_image.width - logo_image.width - self.margin[0]),
+            max(0, base_image.height - logo_image.height - self.margin[1])
+        )
+        base_image.alpha_composite(logo_image, dest=position)
+        return base_image
+
+    def overlay(self, ai_image_bytes: bytes, logo: str = "white") -> BytesIO:
+        with Image.open(BytesIO(ai_image_bytes)) as img:
+            base_image = self.apply(img.convert("RGBA"), logo)
+
+        # Save to in-memory PNG
+        output_buffer = BytesIO()
+        base_image.save(output_buffer, format="PNG")
+        output_buffer.seek(0)
+        return output_buffer
+
+
+logo_engine = LogoOverlayEngine()
+
+
+def overlay_gnb_logo(ai_image_bytes: bytes, logo: str = "white") -> BytesIO:
+    return logo_engine.overlay(ai_image_bytes, logo)
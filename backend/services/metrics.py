@@ -0,0 +1,189 @@
+# backend/services/metrics.py
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Minimal in-process instrumentation: span() times a stage with perf_counter
+# and feeds a per-stage histogram; the registry renders everything in the
+# Prometheus text format for /api/metrics. With METRICS_JSON_LOGS=true every
+# span and log_event() is also written as one JSON line to stdout.
+
+METRICS_JSON_LOGS = os.getenv("METRICS_JSON_LOGS", "false").lower() in ("1", "true", "yes")
+
+# Seconds; spans cover sub-millisecond prompt builds up to minute-long model calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+STAGES = ("read", "convert", "compress", "prompt", "phash", "model", "decode", "overlay", "encode", "upload")
+
+
+def _label_str(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labels, key)} {value:g}" for key, value in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, *label_values: str, value: float) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values → [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return int(sum(series[:-1])) if series else 0
+
+    def sum(self, *label_values: str) -> float:
+        series = self._series.get(label_values)
+        return series[-1] if series else 0.0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "gnb_stage_duration_seconds", "Time spent in each generation stage", labels=("stage",)
+)
+STAGE_ERRORS = registry.counter(
+    "gnb_stage_errors_total", "Stages that raised", labels=("stage",)
+)
+REQUEST_SECONDS = registry.histogram(
+    "gnb_request_duration_seconds", "End-to-end generation time", labels=("route", "outcome")
+)
+
+
+def log_event(event: str, **fields) -> None:
+    if METRICS_JSON_LOGS:
+        print(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str), flush=True)
+
+
+class span:
+    """Time a stage: ``with span("model") as s: ...`` then read ``s.elapsed``,
+    or decorate a sync/async function with ``@span("decode")``."""
+
+    __slots__ = ("stage", "fields", "start", "elapsed")
+
+    def __init__(self, stage: str, **fields):
+        self.stage = stage
+        self.fields = fields
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(self.elapsed, self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.stage)
+        if METRICS_JSON_LOGS:
+            log_event("span", stage=self.stage, seconds=round(self.elapsed, 6),
+                      error=exc_type.__name__ if exc_type else None, **self.fields)
+
+    def __call__(self, fn):
+        stage, fields = self.stage, self.fields
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage, **fields):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage, **fields):
+                return fn(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,163 @@
+# backend/services/near_duplicates.py
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from PIL import Image
+
+# Near-duplicate lookup for re-uploaded photos. The exact result cache keys on
+# the optimized bytes, so the same photo re-compressed by a messaging app or
+# cropped a little misses it. Here every generated input gets a 64-bit dHash
+# (computed on the ≤512px model input, not the upload), indexed per prompt
+# with multi-index hashing: the hash is split into NEAR_DUP_CHUNKS chunks,
+# and any hash within Hamming distance r must match at least one chunk within
+# r // chunks bits. A lookup probes a few buckets instead of scanning, so it
+# stays fast into the millions of entries.
+
+NEAR_DUP_CACHE = os.getenv("NEAR_DUP_CACHE", "true").lower() in ("1", "true", "yes")
+# Max differing bits (of 64) to count as the same photo; 0 = exact hash only
+NEAR_DUP_THRESHOLD = int(os.getenv("NEAR_DUP_THRESHOLD", "6"))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "1000000"))
+NEAR_DUP_CHUNKS = 4
+
+HASH_BITS = 64
+# Flat or smooth images hash to (almost) all zeros or ones and would match
+# each other; hashes with fewer set/unset bits than this are never indexed
+MIN_HASH_BITS = 8
+
+
+# Difference hash: shrink to 9x8 grayscale, one bit per "left brighter than
+# right" comparison. Robust to re-encoding, scaling and small crops/tone shifts.
+def dhash(image: Image.Image, size: int = 8) -> int:
+    if image.format == "JPEG":
+        image.draft("L", (size * 8, size * 8))  # decode at 1/8 scale where possible
+    gray = image.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = gray.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def dhash_bytes(data: bytes) -> int:
+    with Image.open(BytesIO(data)) as image:
+        return dhash(image)
+
+
+# XOR masks for every value within `radius` bits of a chunk
+@lru_cache(maxsize=None)
+def _flip_masks(bits: int, radius: int) -> tuple[int, ...]:
+    masks = [0]
+    for flips in range(1, radius + 1):
+        for positions in itertools.combinations(range(bits), flips):
+            masks.append(sum(1 << p for p in positions))
+    return tuple(masks)
+
+
+class MultiIndexHash:
+    def __init__(self, chunks: int = NEAR_DUP_CHUNKS, bits: int = HASH_BITS):
+        self.chunks = chunks
+        self.chunk_bits = bits // chunks
+        self.mask = (1 << self.chunk_bits) - 1
+        self.tables: list[dict[int, set[int]]] = [{} for _ in range(chunks)]
+        self.entries: dict[int, tuple[int, object]] = {}
+
+    def _split(self, h: int) -> list[int]:
+        return [(h >> (i * self.chunk_bits)) & self.mask for i in range(self.chunks)]
+
+    def add(self, entry_id: int, h: int, value) -> None:
+        self.entries[entry_id] = (h, value)
+        for table, chunk in zip(self.tables, self._split(h)):
+            table.setdefault(chunk, set()).add(entry_id)
+
+    def remove(self, entry_id: int) -> None:
+        h, _ = self.entries.pop(entry_id)
+        for table, chunk in zip(self.tables, self._split(h)):
+            bucket = table[chunk]
+            bucket.discard(entry_id)
+            if not bucket:
+                del table[chunk]
+
+    # Closest entry within `radius` bits, as (distance, value), or None
+    def nearest(self, h: int, radius: int):
+        masks = _flip_masks(self.chunk_bits, radius // self.chunks)
+        candidates = set()
+        for table, chunk in zip(self.tables, self._split(h)):
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        best = None
+        for entry_id in candidates:
+            stored, value = self.entries[entry_id]
+            distance = (stored ^ h).bit_count()
+            if distance <= radius and (best is None or distance < best[0]):
+                best = (distance, value)
+        return best
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def informative(h: int) -> bool:
+    return MIN_HASH_BITS <= h.bit_count() <= HASH_BITS - MIN_HASH_BITS
+
+
+# One multi-index table per namespace (prompt + output variant). The oldest
+# entries go first once NEAR_DUP_MAX_ENTRIES is reached.
+class NearDuplicateIndex:
+    def __init__(self, threshold: int = NEAR_DUP_THRESHOLD, max_entries: int = NEAR_DUP_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._tables: dict[str, MultiIndexHash] = {}
+        self._order: OrderedDict[int, str] = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, namespace: str, h: int, value: dict) -> None:
+        if not informative(h):
+            return
+        with self._lock:
+            entry_id = next(self._ids)
+            self._tables.setdefault(namespace, MultiIndexHash()).add(entry_id, h, value)
+            self._order[entry_id] = namespace
+            while len(self._order) > self.max_entries:
+                old_id, old_namespace = self._order.popitem(last=False)
+                table = self._tables[old_namespace]
+                table.remove(old_id)
+                if not len(table):
+                    del self._tables[old_namespace]
+
+    def lookup(self, namespace: str, h: int, threshold: int | None = None):
+        threshold = self.threshold if threshold is None else threshold
+        if not informative(h):
+            return None
+        with self._lock:
+            table = self._tables.get(namespace)
+            match = table.nearest(h, threshold) if table is not None else None
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return match
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+            self._order.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses, "threshold": self.threshold}
+
+
+near_duplicates = NearDuplicateIndex()
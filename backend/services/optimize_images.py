@@ -1,75 +1,162 @@
 from PIL import Image
 import io
 from io import BytesIO
+import os
 import time
-def optimize_input_image(image_bytes, max_size=512, quality=85):
+from .metrics import log_event
+
+# Decompression-bomb guard, checked from the header before any pixels are
+# decoded. 50MP covers every phone camera; a small file claiming more is
+# rejected instead of being inflated into gigabytes of RAM.
+MAX_INPUT_PIXELS = int(os.getenv("MAX_INPUT_PIXELS", str(50_000_000)))
+# Uploads already this small (and JPEG, RGB, within max_size) go to the model untouched
+PASSTHROUGH_MAX_BYTES = int(os.getenv("PASSTHROUGH_MAX_BYTES", str(300_000)))
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def check_pixel_budget(img: Image.Image, max_pixels: int | None = None) -> None:
+    max_pixels = max_pixels or MAX_INPUT_PIXELS
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(
+            f"Image is {width}x{height} ({width * height / 1e6:.0f}MP), limit is {max_pixels / 1e6:.0f}MP"
+        )
+
+
+def optimize_input_image(image, max_size=512, quality=85, original_size=None, source_bytes=None):
     """
     Optimize image for faster OpenAI processing
+    - Accepts raw bytes or an already-opened PIL image (see ImagePipeline)
+    - Passes small RGB JPEGs through untouched (source_bytes needed for images)
+    - Decodes JPEGs at reduced scale (draft mode) when shrinking
     - Resize to max_size if larger
     - Convert to RGB
     - Compress with specified quality
     """
-    compression_start = time.time()
-    
+    compression_start = time.perf_counter()
+
     try:
-        original_size = len(image_bytes)
-        
-        with Image.open(BytesIO(image_bytes)) as img:
-            print(f"📐 Original dimensions: {img.size}")
-            print(f"📊 Original file size: {original_size:,} bytes ({original_size/1024:.1f} KB)")
-            
-            # Resize if too large
-            resize_start = time.time()
-            if max(img.size) > max_size:
-                img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                print(f"📏 Resized to: {img.size}")
-            resize_time = time.time() - resize_start
-            
-            # Convert to RGB if needed
-            convert_start = time.time()
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-                print(f"🎨 Converted to RGB")
-            convert_time = time.time() - convert_start
-            
-            # Compress and save to buffer
-            compress_start = time.time()
-            buffer = BytesIO()
-            img.save(buffer, format='JPEG', quality=quality, optimize=True)
-            buffer.seek(0)
-            compress_time = time.time() - compress_start
-            
-            compressed_size = len(buffer.getvalue())
-            compression_ratio = (1 - compressed_size/original_size) * 100
-            
-            total_compression_time = time.time() - compression_start
-            
-            print(f"📦 Compressed size: {compressed_size:,} bytes ({compressed_size/1024:.1f} KB)")
-            print(f"📉 Compression ratio: {compression_ratio:.1f}% reduction")
-            print(f"⏱️ Compression breakdown:")
-            print(f"   - Resize: {resize_time:.3f}s")
-            print(f"   - Convert: {convert_time:.3f}s") 
-            print(f"   - Compress: {compress_time:.3f}s")
-            print(f"   - Total compression: {total_compression_time:.3f}s")
-            
-            return buffer, {
-                'original_size': original_size,
-                'compressed_size': compressed_size,
-                'compression_ratio': compression_ratio,
-                'compression_time': total_compression_time,
-                'resize_time': resize_time,
-                'convert_time': convert_time,
-                'compress_time': compress_time
-            }
-            
+        if isinstance(image, Image.Image):
+            return _optimize_opened_image(
+                image, original_size or 0, max_size, quality, compression_start, source_bytes
+            )
+
+        with Image.open(BytesIO(image)) as img:
+            check_pixel_budget(img)
+            return _optimize_opened_image(
+                img, len(image), max_size, quality, compression_start, image
+            )
+
     except Exception as e:
         print(f"❌ Image optimization error: {e}")
-        compression_time = time.time() - compression_start
+        if isinstance(image, Image.Image) or isinstance(e, ImageTooLarge):
+            raise
+        compression_time = time.perf_counter() - compression_start
         # Fallback to original image
-        return BytesIO(image_bytes), {
-            'original_size': len(image_bytes),
-            'compressed_size': len(image_bytes), 
+        return BytesIO(image), {
+            'original_size': len(image),
+            'compressed_size': len(image),
             'compression_ratio': 0,
             'compression_time': compression_time,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+
+# Bytes Pillow allocates for a decoded frame: one per pixel for 1-band modes,
+# two for 16-bit, otherwise padded to four (RGB is stored as RGBX)
+def pixel_bytes(size: tuple[int, int], mode: str) -> int:
+    width, height = size
+    per_pixel = 1 if mode in ("1", "L", "P") else 2 if mode.startswith("I;16") else 4
+    return width * height * per_pixel
+
+
+# Already what the model wants: re-encoding would only cost time and quality.
+# Files carrying EXIF are re-encoded anyway so camera/GPS metadata is dropped.
+def _can_pass_through(img: Image.Image, source_bytes, max_size: int) -> bool:
+    return (
+        source_bytes is not None
+        and img.format == "JPEG"
+        and img.mode == "RGB"
+        and max(img.size) <= max_size
+        and len(source_bytes) <= PASSTHROUGH_MAX_BYTES
+        and "exif" not in img.info
+    )
+
+
+def _optimize_opened_image(img, original_size, max_size, quality, compression_start, source_bytes=None):
+    source_dimensions = img.size
+
+    if _can_pass_through(img, source_bytes, max_size):
+        compression_time = time.perf_counter() - compression_start
+        log_event("optimize", passthrough=True, original_size=original_size, dimensions=img.size)
+        return BytesIO(source_bytes), {
+            'original_size': original_size,
+            'compressed_size': len(source_bytes),
+            'compression_ratio': 0,
+            'compression_time': compression_time,
+            'pixel_bytes': 0,  # never decoded
+            'passthrough': True
+        }
+
+    # Resize if too large. For a JPEG that hasn't been decoded yet, draft()
+    # makes libjpeg scale by 1/2, 1/4 or 1/8 in DCT space while decoding, so
+    # a 12MP photo never exists at full size in memory; LANCZOS does the rest.
+    resize_start = time.perf_counter()
+    resized = max(img.size) > max_size
+    if resized and img.format == "JPEG":
+        img.draft("RGB", (max_size, max_size))
+    decoded = pixel_bytes(img.size, img.mode)  # after draft(): the frame libjpeg actually decodes
+    if resized:
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    resize_time = time.perf_counter() - resize_start
+
+    # Convert to RGB if needed
+    convert_start = time.perf_counter()
+    frame = pixel_bytes(img.size, img.mode) if resized else decoded
+    converted = 0
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+        converted = pixel_bytes(img.size, "RGB")
+    convert_time = time.perf_counter() - convert_start
+    # Most pixel memory held at once: decoded frame + thumbnail, then thumbnail + RGB copy
+    peak_pixels = max(decoded + (frame if resized else 0), frame + converted)
+
+    # Compress and save to buffer
+    compress_start = time.perf_counter()
+    buffer = BytesIO()
+    # No optimize=True: the extra Huffman pass costs more time than the few KB it saves
+    img.save(buffer, format='JPEG', quality=quality)
+    compressed_size = buffer.tell()  # no getvalue() copy just to measure
+    buffer.seek(0)
+    compress_time = time.perf_counter() - compress_start
+
+    compression_ratio = (1 - compressed_size/original_size) * 100 if original_size else 0
+
+    total_compression_time = time.perf_counter() - compression_start
+
+    log_event(
+        "optimize",
+        original_size=original_size,
+        compressed_size=compressed_size,
+        source_dimensions=source_dimensions,
+        dimensions=img.size,
+        resize_time=round(resize_time, 4),
+        convert_time=round(convert_time, 4),
+        compress_time=round(compress_time, 4),
+        compression_time=round(total_compression_time, 4),
+    )
+
+    return buffer, {
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'compression_ratio': compression_ratio,
+        'compression_time': total_compression_time,
+        'resize_time': resize_time,
+        'convert_time': convert_time,
+        'compress_time': compress_time,
+        'pixel_bytes': peak_pixels,
+        'passthrough': False
+    }
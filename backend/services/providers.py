@@ -0,0 +1,378 @@
+# backend/services/providers.py
+import asyncio
+import base64
+import math
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from io import BytesIO
+from contextlib import asynccontextmanager
+import httpx
+from PIL import Image
+from .clients import clients
+from .resilience import upstream, CircuitBreaker
+
+# One interface for every image-to-image backend (OpenAI, Vertex Imagen,
+# Flux via AIML API, and fakes for offline tests). Every provider takes the
+# optimized input bytes and a prompt, and returns the generated images as
+# raw encoded bytes.
+
+IMAGE_PROVIDERS = [name.strip() for name in os.getenv("IMAGE_PROVIDERS", "openai").split(",") if name.strip()]
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+# Hedge delay before a provider has enough samples for a p95
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "15"))
+# Send Flux its input as a base64 data URL instead of a temporary public object
+FLUX_INLINE_INPUT = os.getenv("FLUX_INLINE_INPUT", "true").lower() in ("1", "true", "yes")
+
+
+class ProviderError(Exception):
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class ProviderResult:
+    images: list[bytes]
+    provider: str
+    latency: float
+    hedged: bool = False
+    failover: bool = False
+
+
+class ImageProvider(ABC):
+    name = "base"
+
+    @abstractmethod
+    async def edit(self, image: bytes, prompt: str, n: int = 1, **options) -> list[bytes]:
+        ...
+
+
+class OpenAIProvider(ImageProvider):
+    name = "openai"
+
+    def __init__(self, client, model: str = "gpt-image-1"):
+        self.client = client
+        self.model = model
+
+    async def edit(self, image: bytes, prompt: str, n: int = 1, size: str = "1024x1024",
+                   quality: str = "low", output_format: str = "jpeg", output_compression: int = 80,
+                   **options) -> list[bytes]:
+        upload = BytesIO(image)
+        upload.name = "dog.jpg"  # optimized input is always JPEG
+        response = await self.client.images.edit(
+            model=self.model,
+            image=upload,
+            prompt=prompt,
+            n=n,
+            size=size,
+            quality=quality,
+            output_format=output_format,
+            output_compression=output_compression
+        )
+        return [base64.b64decode(item.b64_json) for item in response.data]
+
+
+class ImagenProvider(ImageProvider):
+    name = "imagen"
+
+    def __init__(self, project_id: str | None = None, location: str = "us-central1",
+                 model: str = "imagen-3.0-generate-002"):
+        self.project_id = project_id or os.getenv("VERTEX_PROJECT_ID")
+        self.location = location
+        self.model = model
+
+    # Built once per process; the SDK is only imported when Imagen is used
+    def prediction_client(self):
+        def build():
+            from google.cloud import aiplatform_v1
+            return aiplatform_v1.PredictionServiceClient()
+        return clients.get("imagen", build)
+
+    async def edit(self, image: bytes, prompt: str, n: int = 1, **options) -> list[bytes]:
+        endpoint = (
+            f"projects/{self.project_id}/locations/{self.location}/publishers/google/models/{self.model}"
+        )
+        instances = [{
+            "prompt": prompt,
+            "image": {"bytesBase64Encoded": base64.b64encode(image).decode("utf-8")}
+        }]
+        parameters = {"sampleCount": n, "aspectRatio": "1:1", "guidanceScale": 12, "seed": 42}
+
+        # Vertex SDK is blocking, keep it off the event loop
+        response = await asyncio.to_thread(
+            self.prediction_client().predict,
+            endpoint=endpoint,
+            instances=instances,
+            parameters=parameters,
+        )
+        return [base64.b64decode(p["bytesBase64Encoded"]) for p in response.predictions]
+
+
+# Flux via AIML API. The input goes inline as a data URL when the API takes
+# it (FLUX_INLINE_INPUT), otherwise as a temporary Supabase object that is
+# cleaned up in batches. generate() returns the result URL so callers can
+# stream it onward with stream(); edit() downloads it for the router.
+class FluxProvider(ImageProvider):
+    name = "flux"
+    API_URL = "https://api.aimlapi.com/v1/images/generations"
+
+    def __init__(self, api_key: str | None = None, model: str = "flux/kontext-max/image-to-image",
+                 http: httpx.AsyncClient | None = None, inline_input: bool = FLUX_INLINE_INPUT,
+                 temp_objects=None):
+        self.api_key = api_key or os.getenv("FLUX_API_KEY")
+        self.model = model
+        self._http = http
+        self.inline_input = inline_input
+        self._temp_objects = temp_objects
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http or clients.http("flux")
+
+    @property
+    def temp_objects(self):
+        if self._temp_objects is None:
+            from .supabase_uploader import temp_objects
+            self._temp_objects = temp_objects
+        return self._temp_objects
+
+    async def _post(self, image_url: str, prompt: str) -> httpx.Response:
+        return await self.http.post(
+            self.API_URL,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={"image_url": image_url, "prompt": prompt, "model": self.model},
+        )
+
+    async def generate(self, image: bytes, prompt: str, n: int = 1) -> list[str]:
+        response = None
+        if self.inline_input:
+            data_url = "data:image/jpeg;base64," + base64.b64encode(image).decode("ascii")
+            response = await self._post(data_url, prompt)
+            if response.status_code in (400, 413, 415, 422):
+                # API refused the inline input; use a public URL from now on
+                print(f"⚠️ Flux rejected inline input ({response.status_code}), falling back to temp upload")
+                self.inline_input = False
+                response = None
+        if response is None:
+            temp_image_url = await self.temp_objects.upload(image, extension="jpeg")
+            response = await self._post(temp_image_url, prompt)
+
+        if response.is_error:
+            raise ProviderError(f"Flux error {response.status_code}: {response.text}", response.status_code)
+
+        data = response.json()
+        if "data" not in data or not data["data"]:
+            raise ProviderError("Flux returned no image.")
+        return [item["url"] for item in data["data"][:n]]
+
+    # Yields the response so the body can be consumed with aiter_bytes()
+    @asynccontextmanager
+    async def stream(self, url: str):
+        async with self.http.stream("GET", url) as response:
+            response.raise_for_status()
+            yield response
+
+    async def edit(self, image: bytes, prompt: str, n: int = 1, **options) -> list[bytes]:
+        images = []
+        for url in await self.generate(image, prompt, n=n):
+            response = await self.http.get(url)
+            response.raise_for_status()
+            images.append(response.content)
+        return images
+
+
+_FAKE_IMAGE: bytes | None = None
+
+
+def fake_image_bytes() -> bytes:
+    global _FAKE_IMAGE
+    if _FAKE_IMAGE is None:
+        buffer = BytesIO()
+        Image.new("RGB", (1024, 1024), (90, 140, 90)).save(buffer, format="JPEG", quality=80)
+        _FAKE_IMAGE = buffer.getvalue()
+    return _FAKE_IMAGE
+
+
+# Offline stand-in with a log-normal latency distribution around `median`
+# (sigma=0 gives a constant latency) and a configurable error rate. Injected
+# errors carry error_status (e.g. 503 for a transient, retryable failure).
+class FakeProvider(ImageProvider):
+    def __init__(self, name: str = "fake", median: float = 0.5, sigma: float = 0.0,
+                 error_rate: float = 0.0, image: bytes | None = None, seed: int | None = None,
+                 error_status: int | None = None):
+        self.name = name
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.image = image
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def sample_latency(self) -> float:
+        return self.median * math.exp(self.sigma * self.rng.gauss(0, 1))
+
+    async def edit(self, image: bytes, prompt: str, n: int = 1, **options) -> list[bytes]:
+        self.calls += 1
+        await asyncio.sleep(self.sample_latency())
+        if self.rng.random() < self.error_rate:
+            raise ProviderError(f"{self.name}: injected failure", self.error_status)
+        return [self.image or fake_image_bytes()] * n
+
+
+# Rolling window of latencies (successes only) and outcomes for one provider
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.outcomes: deque[bool] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool) -> None:
+        if ok:
+            self.latencies.append(latency)
+        self.outcomes.append(ok)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> float | None:
+        return self.percentile(0.50)
+
+    @property
+    def p95(self) -> float | None:
+        return self.percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    @property
+    def samples(self) -> int:
+        return len(self.outcomes)
+
+
+# Routes each call to the best provider by rolling latency/error rate.
+# Config order is the preference until a provider has min_samples; unhealthy
+# providers (error rate above max_error_rate, or an open circuit) drop to the
+# back. Each call goes through the provider's Upstream (retries + breaker). With hedging
+# on, if the primary hasn't answered by its p95 a second request goes to the
+# next provider and whichever finishes first wins.
+class ProviderRouter:
+    def __init__(self, providers: list[ImageProvider], hedge: bool = HEDGE_REQUESTS,
+                 min_samples: int = 10, max_error_rate: float = 0.5,
+                 default_hedge_delay: float = HEDGE_DELAY, window: int = 200):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.default_hedge_delay = default_hedge_delay
+        self.trackers = {p.name: LatencyTracker(window) for p in self.providers}
+
+    def ranked(self) -> list[ImageProvider]:
+        def score(item):
+            index, provider = item
+            tracker = self.trackers[provider.name]
+            known = tracker.samples >= self.min_samples
+            unhealthy = (known and tracker.error_rate > self.max_error_rate) or \
+                upstream(provider.name).breaker.state == CircuitBreaker.OPEN
+            return (unhealthy, tracker.p50 if known and tracker.p50 is not None else math.inf, index)
+        return [provider for _, provider in sorted(enumerate(self.providers), key=score)]
+
+    def hedge_delay(self, provider: ImageProvider) -> float:
+        tracker = self.trackers[provider.name]
+        if tracker.samples >= self.min_samples and tracker.p95 is not None:
+            return tracker.p95
+        return self.default_hedge_delay
+
+    async def _call(self, provider: ImageProvider, image: bytes, prompt: str, n: int, options: dict) -> ProviderResult:
+        start = time.perf_counter()
+        try:
+            images = await upstream(provider.name).call(provider.edit, image, prompt, n=n, **options)
+        except asyncio.CancelledError:
+            raise  # lost a hedge race, not a provider failure
+        except Exception:
+            self.trackers[provider.name].record(time.perf_counter() - start, ok=False)
+            raise
+        latency = time.perf_counter() - start
+        self.trackers[provider.name].record(latency, ok=True)
+        return ProviderResult(images, provider.name, latency)
+
+    async def edit(self, image: bytes, prompt: str, n: int = 1, **options) -> ProviderResult:
+        ranked = self.ranked()
+        primary = ranked[0]
+        backup = ranked[1] if len(ranked) > 1 else None
+
+        if not (self.hedge and backup):
+            try:
+                return await self._call(primary, image, prompt, n, options)
+            except Exception as e:
+                if backup is None:
+                    raise
+                print(f"⚠️ {primary.name} failed ({e}), failing over to {backup.name}")
+                result = await self._call(backup, image, prompt, n, options)
+                result.failover = True
+                return result
+
+        # One try from the first task on: a caller cancelled during the hedge
+        # delay (disconnect, deadline) must not leave a model call running
+        tasks = [asyncio.create_task(self._call(primary, image, prompt, n, options))]
+        try:
+            first = tasks[0]
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_delay(primary))
+            if first in done and first.exception() is None:
+                return first.result()
+
+            print(f"🏁 Hedging {primary.name} with {backup.name}")
+            tasks.append(asyncio.create_task(self._call(backup, image, prompt, n, options)))
+            pending = {task for task in tasks if not task.done()}
+            error = first.exception() if first in done else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        result = task.result()
+                        result.hedged = True
+                        return result
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "p50": round(t.p50, 3) if t.p50 is not None else None,
+                "p95": round(t.p95, 3) if t.p95 is not None else None,
+                "error_rate": round(t.error_rate, 3),
+                "samples": t.samples
+            }
+            for name, t in self.trackers.items()
+        }
+
+
+def build_provider(name: str, openai_client=None) -> ImageProvider:
+    if name == "openai":
+        return OpenAIProvider(openai_client)
+    if name == "imagen":
+        return ImagenProvider()
+    if name == "flux":
+        return FluxProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown image provider '{name}'")
+
+
+def build_router(openai_client=None, names: list[str] = IMAGE_PROVIDERS) -> ProviderRouter:
+    return ProviderRouter([build_provider(name, openai_client) for name in names])
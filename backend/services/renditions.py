@@ -0,0 +1,53 @@
+# backend/services/renditions.py
+import asyncio
+import os
+from PIL import Image
+from .executor import run_in_executor
+from .image_encoder import EncodedImage, encode_image, OUTPUT_MAX_BYTES
+from .supabase_uploader import upload_image_to_supabase_async
+
+# Widths of the responsive set. The largest one that fits the image is the
+# full-size result; mobile previews pull the 256/512 variants instead.
+RENDITION_WIDTHS = tuple(
+    int(width) for width in os.getenv("RENDITION_WIDTHS", "256,512,1024").split(",")
+)
+
+
+def rendition_widths(image_width: int, widths=RENDITION_WIDTHS) -> list[int]:
+    # Never upscale: widths past the source collapse into the source width
+    return sorted({min(width, image_width) for width in widths})
+
+
+def encode_rendition(image: Image.Image, width: int, fmt: str,
+                     max_bytes: int | None = OUTPUT_MAX_BYTES, quality: int | None = None) -> EncodedImage:
+    if width < image.width:
+        scale = width / image.width
+        image = image.resize((width, round(image.height * scale)), Image.LANCZOS, reducing_gap=2.0)
+        # Byte budget scales with pixel area
+        if max_bytes:
+            max_bytes = int(max_bytes * scale * scale)
+    return encode_image(image, fmt, quality=quality, max_bytes=max_bytes)
+
+
+# Resize + encode every width concurrently on the image executor
+async def encode_renditions(image: Image.Image, fmt: str, widths=RENDITION_WIDTHS,
+                            max_bytes: int | None = OUTPUT_MAX_BYTES, quality: int | None = None) -> dict[int, EncodedImage]:
+    targets = rendition_widths(image.width, widths)
+    encoded = await asyncio.gather(*[
+        run_in_executor(encode_rendition, image, width, fmt, max_bytes, quality) for width in targets
+    ])
+    return dict(zip(targets, encoded))
+
+
+# Upload every rendition in parallel; returns {width: public_url}
+async def upload_renditions(renditions: dict[int, EncodedImage],
+                            upload=upload_image_to_supabase_async) -> dict[int, str]:
+    urls = await asyncio.gather(*[
+        upload(encoded.data, extension=encoded.extension)
+        for encoded in renditions.values()
+    ])
+    return dict(zip(renditions.keys(), urls))
+
+
+def build_srcset(urls: dict[int, str]) -> str:
+    return ", ".join(f"{url} {width}w" for width, url in sorted(urls.items()))
@@ -0,0 +1,279 @@
+# backend/services/resilience.py
+import asyncio
+import math
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import httpx
+from .metrics import registry
+
+# Resilience around upstream calls (image providers, Supabase Storage).
+#  - Deadline: a per-request time budget, set once by the route and carried
+#    through every stage in a context variable. Admission waits and upstream
+#    attempts are capped at whatever remains, so a request fails at its
+#    deadline instead of after every upstream's own timeout.
+#  - Retries: transient failures (connection errors, timeouts, 408/429/5xx)
+#    are retried with capped exponential backoff and full jitter, but only
+#    while the remaining budget covers the wait.
+#  - Circuit breaker, one per upstream: after BREAKER_FAILURES consecutive
+#    transient failures calls fail fast with a 503 for BREAKER_RESET seconds,
+#    then a single probe decides whether to close it again.
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "90"))  # 0 = no deadline
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+RETRIES = registry.counter("gnb_upstream_retries_total", "Upstream calls retried", labels=("upstream",))
+CIRCUIT_STATE = registry.gauge(
+    "gnb_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", labels=("upstream",)
+)
+CIRCUIT_REJECTED = registry.counter(
+    "gnb_circuit_rejected_total", "Calls failed fast by an open circuit", labels=("upstream",)
+)
+
+
+class UpstreamUnavailable(Exception):
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> dict:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class CircuitOpen(UpstreamUnavailable):
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is unavailable (circuit open), retry in {math.ceil(retry_after)}s", retry_after)
+        self.upstream = upstream
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    status_code = 504
+
+    def __init__(self, stage: str, budget: float):
+        super().__init__(f"Request deadline of {budget:g}s exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.retries = 0
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str) -> None:
+        if self.expired:
+            raise DeadlineExceeded(stage, self.budget)
+
+    def stats(self) -> dict:
+        return {"budget": self.budget, "remaining": round(self.remaining(), 3), "retries": self.retries}
+
+
+_deadline: ContextVar[Deadline | None] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Deadline | None:
+    return _deadline.get()
+
+
+# Everything awaited inside (including tasks created from here) sees this deadline
+@contextmanager
+def deadline_scope(budget: float | None = REQUEST_DEADLINE):
+    deadline = Deadline(budget) if budget else None
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+# Smallest of the given limits and the current deadline's remaining time
+def time_left(*limits: float | None) -> float | None:
+    deadline = current_deadline()
+    candidates = [limit for limit in limits if limit is not None]
+    if deadline is not None:
+        candidates.append(deadline.remaining())
+    return min(candidates, default=None)
+
+
+def status_of(e: Exception) -> int | None:
+    for source in (e, getattr(e, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+# Transient: worth another attempt, and a sign the upstream itself is unwell
+def is_transient(e: Exception) -> bool:
+    if isinstance(e, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = status_of(e)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # OpenAI SDK connection/timeout errors, matched by name so the SDK stays lazily imported
+    return type(e).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(e: Exception) -> float | None:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            print(f"⚡ Circuit {self.name}: {self.state} → {state}")
+        self.state = state
+        CIRCUIT_STATE.set(self.name, value=(self.CLOSED, self.HALF_OPEN, self.OPEN).index(state))
+
+    # Raises CircuitOpen instead of letting the call through; True when this
+    # call is the half-open probe
+    def before_call(self) -> bool:
+        if self.state == self.OPEN:
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                CIRCUIT_REJECTED.inc(self.name)
+                raise CircuitOpen(self.name, self.reset_timeout - waited)
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                CIRCUIT_REJECTED.inc(self.name)
+                raise CircuitOpen(self.name, 1.0)
+            self._probing = True
+            return True
+        return False
+
+    # Probe ended without an outcome (cancelled): neither success nor failure,
+    # the next call becomes the probe instead
+    def release_probe(self) -> None:
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._probing = False
+        self.failures = 0
+        self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+# One upstream dependency: its breaker plus the retry policy for calls to it
+class Upstream:
+    def __init__(self, name: str, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, attempt_timeout: float | None = None,
+                 breaker: CircuitBreaker | None = None, transient=is_transient, rng: random.Random | None = None):
+        self.name = name
+        self.attempts = max(1, attempts)  # total tries, including the first
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.breaker = breaker or CircuitBreaker(name)
+        self.transient = transient
+        self.rng = rng or random.Random()
+
+    # Full jitter: uniform over [0, capped exponential], never below a Retry-After
+    def backoff(self, attempt: int, error: Exception) -> float:
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, _retry_after(error) or 0.0)
+
+    async def call(self, fn, *args, **kwargs):
+        deadline = current_deadline()
+        for attempt in range(self.attempts):
+            if deadline is not None:
+                deadline.check(self.name)
+            probe = self.breaker.before_call()
+            try:
+                result = await asyncio.wait_for(fn(*args, **kwargs), timeout=time_left(self.attempt_timeout))
+            except Exception as e:
+                # Cut off by our own request deadline (e.g. after a long
+                # queue), not by attempt_timeout: says nothing about the upstream
+                if isinstance(e, asyncio.TimeoutError) and deadline is not None and deadline.expired:
+                    raise DeadlineExceeded(self.name, deadline.budget) from e
+                if not self.transient(e):
+                    self.breaker.record_success()  # it answered; the request was the problem
+                    raise
+                # Rate limited means busy, not broken: retry, but don't trip the breaker
+                if status_of(e) == 429:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                error = e
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # Also on CancelledError (a lost hedge, a client disconnect),
+                # or a half-open breaker would wait forever on this probe
+                if probe:
+                    self.breaker.release_probe()
+
+            delay = self.backoff(attempt, error)
+            budget_left = deadline is None or deadline.remaining() > delay
+            if attempt + 1 >= self.attempts or not budget_left or self.breaker.state == CircuitBreaker.OPEN:
+                raise error
+            RETRIES.inc(self.name)
+            if deadline is not None:
+                deadline.retries += 1
+            print(f"🔁 {self.name} attempt {attempt + 1} failed ({error or type(error).__name__}), "
+                  f"retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {**self.breaker.stats(), "retries": RETRIES.value(self.name)}
+
+
+_upstreams: dict[str, Upstream] = {}
+
+
+# Shared per-name instance, so every caller of one upstream trips the same breaker
+def upstream(name: str) -> Upstream:
+    if name not in _upstreams:
+        _upstreams[name] = Upstream(name)
+    return _upstreams[name]
+
+
+def upstream_stats() -> dict:
+    return {name: u.stats() for name, u in _upstreams.items()}
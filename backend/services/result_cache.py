@@ -0,0 +1,183 @@
+# backend/services/result_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+# Cache of finished generations, keyed on what actually goes to the model:
+# the optimized input bytes plus the final prompt. A hit skips the OpenAI
+# edit and the Supabase upload and just returns the stored image_url.
+
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB")  # e.g. /tmp/gnb-result-cache.db
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+# Content address for a generation: sha256(optimized bytes, prompt, variant).
+# variant covers output settings that change the stored file (e.g. format).
+def make_cache_key(optimized_bytes: bytes, prompt: str, variant: str = "") -> str:
+    digest = hashlib.sha256(optimized_bytes)
+    digest.update(b"\x00")
+    digest.update(normalize_prompt(prompt).encode("utf-8"))
+    if variant:
+        digest.update(b"\x00")
+        digest.update(variant.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: dict, ttl: int | None = None) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+# In-process LRU with per-entry expiry
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: int = RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, ttl: int | None = None) -> None:
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# SQLite tier so results survive a restart (point it at /tmp on Vercel)
+class SQLiteCacheBackend(CacheBackend):
+    def __init__(self, path: str, ttl: int = RESULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return json.loads(row[0])
+
+    def set(self, key: str, value: dict, ttl: int | None = None) -> None:
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache")
+            self._conn.commit()
+
+
+# Memory in front of disk; disk hits are promoted into memory
+class TieredCacheBackend(CacheBackend):
+    def __init__(self, *tiers: CacheBackend):
+        self.tiers = tiers
+
+    def get(self, key: str) -> dict | None:
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for upper in self.tiers[:i]:
+                    upper.set(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: dict, ttl: int | None = None) -> None:
+        for tier in self.tiers:
+            tier.set(key, value, ttl)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+
+class ResultCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> dict | None:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: dict, ttl: int | None = None) -> None:
+        self.backend.set(key, value, ttl)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def build_default_backend() -> CacheBackend:
+    memory = MemoryCacheBackend()
+    if RESULT_CACHE_DB:
+        return TieredCacheBackend(memory, SQLiteCacheBackend(RESULT_CACHE_DB))
+    return memory
+
+
+result_cache = ResultCache(build_default_backend())
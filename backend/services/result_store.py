@@ -0,0 +1,152 @@
+# backend/services/result_store.py
+import asyncio
+import base64
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from uuid import uuid4
+from .image_encoder import EncodedImage
+from .metrics import registry
+from .renditions import build_srcset
+from .supabase_uploader import upload_image_to_supabase_async
+
+# Deferred delivery: the encoded renditions are served from memory right away
+# (inline or from a short-lived local URL) while the durable upload runs in
+# the background with retries. GET /api/results/{id} reports the permanent
+# URLs once they exist. Entries whose upload is still pending are never
+# evicted; finished ones go after RESULT_STORE_TTL or when the store holds
+# more than RESULT_STORE_MAX_BYTES.
+
+RESULT_STORE_TTL = int(os.getenv("RESULT_STORE_TTL", "300"))
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_UPLOAD_ATTEMPTS = int(os.getenv("RESULT_UPLOAD_ATTEMPTS", "4"))
+RESULT_UPLOAD_BACKOFF = float(os.getenv("RESULT_UPLOAD_BACKOFF", "0.5"))
+
+DELIVERY_MODES = ("url", "inline", "local")
+
+DEFERRED_UPLOADS = registry.counter(
+    "gnb_deferred_uploads_total", "Background result uploads by outcome", labels=("outcome",)
+)
+
+
+@dataclass
+class StoredResult:
+    id: str
+    renditions: dict[int, EncodedImage]
+    cache_key: str | None = None
+    status: str = "pending"  # pending → uploading → uploaded | failed
+    urls: dict[int, str] = field(default_factory=dict)
+    error: str | None = None
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    # Extra bookkeeping for on_uploaded callbacks
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return sum(encoded.size for encoded in self.renditions.values())
+
+    @property
+    def full_width(self) -> int:
+        return max(self.renditions)
+
+    def local_urls(self) -> dict[int, str]:
+        return {width: f"/api/results/{self.id}/image/{width}" for width in self.renditions}
+
+    def data_url(self, width: int | None = None) -> str:
+        encoded = self.renditions[width or self.full_width]
+        return f"data:{encoded.content_type};base64,{base64.b64encode(encoded.data).decode()}"
+
+    def to_dict(self) -> dict:
+        body = {"id": self.id, "status": self.status, "attempts": self.attempts, "error": self.error}
+        if self.status == "uploaded":
+            body.update({
+                "image_url": self.urls[max(self.urls)],
+                "renditions": {str(width): url for width, url in self.urls.items()},
+                "srcset": build_srcset(self.urls),
+            })
+        return body
+
+
+class ResultStore:
+    def __init__(self, ttl: int = RESULT_STORE_TTL, max_bytes: int = RESULT_STORE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._results: OrderedDict[str, StoredResult] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, renditions: dict[int, EncodedImage], cache_key: str | None = None) -> StoredResult:
+        result = StoredResult(uuid4().hex, renditions, cache_key)
+        with self._lock:
+            self._results[result.id] = result
+            self._evict()
+        return result
+
+    def get(self, result_id: str) -> StoredResult | None:
+        with self._lock:
+            self._evict()
+            return self._results.get(result_id)
+
+    def _evict(self) -> None:
+        now = time.time()
+        finished = [r for r in self._results.values() if r.finished_at is not None]
+        total = sum(r.size for r in self._results.values())
+        for result in finished:
+            if now - result.finished_at < self.ttl and total <= self.max_bytes:
+                break
+            del self._results[result.id]
+            total -= result.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    # Durable upload with exponential backoff. Safe to schedule more than once
+    # for the same id (e.g. from coalesced requests): only the first run uploads.
+    async def deliver(self, result_id: str, upload=upload_image_to_supabase_async, on_uploaded=None) -> None:
+        result = self.get(result_id)
+        if result is None or result.status != "pending":
+            return
+        result.status = "uploading"
+        for attempt in range(RESULT_UPLOAD_ATTEMPTS):
+            result.attempts = attempt + 1
+            # Retries only re-send the renditions that haven't made it yet
+            missing = [width for width in result.renditions if width not in result.urls]
+            outcomes = await asyncio.gather(*[
+                upload(result.renditions[width].data, extension=result.renditions[width].extension)
+                for width in missing
+            ], return_exceptions=True)
+            errors = []
+            for width, outcome in zip(missing, outcomes):
+                if isinstance(outcome, Exception):
+                    errors.append(outcome)
+                else:
+                    result.urls[width] = outcome
+            if errors:
+                result.error = str(errors[0])
+                print(f"⚠️ Background upload {result_id} attempt {attempt + 1} failed:", errors[0])
+                if attempt + 1 < RESULT_UPLOAD_ATTEMPTS:
+                    await asyncio.sleep(RESULT_UPLOAD_BACKOFF * 2 ** attempt)
+                continue
+            result.urls = dict(sorted(result.urls.items()))
+            result.status = "uploaded"
+            result.error = None
+            result.finished_at = time.time()
+            DEFERRED_UPLOADS.inc("ok")
+            print(f"✅ Background upload {result_id} done:", result.urls[result.full_width])
+            if on_uploaded is not None:
+                on_uploaded(result)
+            return
+        result.status = "failed"
+        result.finished_at = time.time()
+        DEFERRED_UPLOADS.inc("failed")
+        print(f"❌ Background upload {result_id} gave up after {result.attempts} attempts")
+
+
+result_store = ResultStore()
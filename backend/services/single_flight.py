@@ -0,0 +1,62 @@
+# backend/services/single_flight.py
+import asyncio
+import os
+from .result_cache import MemoryCacheBackend
+
+# How long a completed response can be replayed for the same Idempotency-Key
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "600"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+
+# One shared execution and how many callers are still waiting on it
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+# Coalesces concurrent calls with the same key into one upstream call.
+# The first caller starts the work in its own task; everyone, the first
+# caller included, awaits it through a shield and gets the same result (or
+# the same exception). A cancelled caller only stops waiting: the work is
+# cancelled only once nobody is waiting for it any more.
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict[str, _Flight] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def _release(self, key: str, task: asyncio.Task) -> None:
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        # Mark retrieved so asyncio doesn't warn when nobody else was waiting
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn) -> tuple[object, bool]:
+        """Run ``await fn()`` once per key; returns ``(result, shared)``."""
+        flight = self._inflight.get(key)
+        shared = flight is not None
+        if not shared:
+            # Its own task (with the caller's context, so deadlines carry over)
+            flight = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda task: self._release(key, task))
+            self._inflight[key] = flight
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+
+generation_flight = SingleFlight()
+
+# Completed responses by Idempotency-Key header
+idempotency_store = MemoryCacheBackend(max_entries=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL)
@@ -5,16 +5,75 @@ from pathlib import Path
 load_dotenv(dotenv_path=Path(__file__).resolve().parents[1] / ".env")  # ✅ handles path properly
 
 import os
-from supabase import create_client, Client
+import time
+import httpx
+from contextlib import asynccontextmanager
 from uuid import uuid4
+from .clients import clients
+from .resilience import upstream
+from .image_encoder import CONTENT_TYPES, FORMAT_ALIASES
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY")
+BUCKET = "dog-ai-images"
+# Temporary inputs (e.g. for providers that need a public URL) live under this
+# prefix and are removed in batches of TEMP_CLEANUP_BATCH or every TEMP_CLEANUP_INTERVAL seconds
+TEMP_PREFIX = "tmp/"
+TEMP_CLEANUP_BATCH = int(os.getenv("TEMP_CLEANUP_BATCH", "20"))
+TEMP_CLEANUP_INTERVAL = float(os.getenv("TEMP_CLEANUP_INTERVAL", "60"))
 
-if not SUPABASE_URL or not SUPABASE_API_KEY:
-    raise RuntimeError("❌ Missing SUPABASE_URL or SUPABASE_API_KEY in environment.")
+def _require_config():
+    if not SUPABASE_URL or not SUPABASE_API_KEY:
+        raise RuntimeError("❌ Missing SUPABASE_URL or SUPABASE_API_KEY in environment.")
+
+
+# Clients live in the shared registry and are built on first use, so importing
+# this module needs neither credentials, network nor the supabase SDK itself
+def get_supabase():
+    _require_config()
+
+    def build():
+        from supabase import create_client
+        return create_client(SUPABASE_URL, SUPABASE_API_KEY)
+    return clients.get("supabase", build)
+
+
+async def get_async_supabase():
+    _require_config()
+
+    async def build():
+        from supabase import acreate_client, AsyncClientOptions
+        return await acreate_client(
+            SUPABASE_URL, SUPABASE_API_KEY,
+            options=AsyncClientOptions(httpx_client=clients.http("supabase"))
+        )
+    return await clients.aget("supabase_async", build)
+
+
+# Pooled client for the raw Storage REST API, used for streamed uploads the SDK can't do
+def get_storage_http() -> httpx.AsyncClient:
+    _require_config()
+    return clients.http(
+        "storage",
+        base_url=f"{SUPABASE_URL}/storage/v1",
+        headers={"Authorization": f"Bearer {SUPABASE_API_KEY}", "apikey": SUPABASE_API_KEY},
+    )
+
+
+def _check_upload_response(response):
+    print(f"📨 Upload response: {response}")
+    if hasattr(response, "error") and response.error is not None:
+        raise Exception(f"❌ Upload failed: {response.error}")
+
+
+def _content_type(extension: str) -> str:
+    extension = extension.lower()
+    return CONTENT_TYPES.get(FORMAT_ALIASES.get(extension, extension), f"image/{extension}")
+
+
+def _public_url(filename: str) -> str:
+    return f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET}/{filename}"
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_API_KEY)
 
 # Function to upload image bytes to Supabase storage
 def upload_image_to_supabase(image_bytes: bytes, extension="png") -> str:
@@ -23,18 +82,130 @@ def upload_image_to_supabase(image_bytes: bytes, extension="png") -> str:
     print(f"📦 Uploading image to Supabase: {filepath}")
 
     # Upload the image bytes to Supabase storage
-    response = supabase.storage.from_("dog-ai-images").upload(
+    response = get_supabase().storage.from_(BUCKET).upload(
         path=filepath,
         file=image_bytes,
-        file_options={"content-type": f"image/{extension}"}
+        file_options={"content-type": _content_type(extension)}
     )
 
-    print(f"📨 Upload response: {response}")
-
     # Check for errors in the response
-    if hasattr(response, "error") and response.error is not None:
-        raise Exception(f"❌ Upload failed: {response.error}")
+    _check_upload_response(response)
 
-    public_url = f"{SUPABASE_URL}/storage/v1/object/public/dog-ai-images/{filename}"
+    public_url = _public_url(filename)
     print(f"✅ Image uploaded successfully: {public_url}")
     return public_url
+
+
+# Non-blocking variant used by the async routes; transient failures are
+# retried (each attempt under a fresh name) within the request deadline
+async def upload_image_to_supabase_async(image_bytes: bytes, extension="png", prefix: str = "") -> str:
+    return await upstream("storage").call(_upload_async, image_bytes, extension, prefix)
+
+
+async def _upload_async(image_bytes: bytes, extension: str, prefix: str) -> str:
+    filename = f"{prefix}{uuid4().hex}.{extension}"
+    print(f"📦 Uploading image to Supabase (async): {filename}")
+
+    client = await get_async_supabase()
+    response = await client.storage.from_(BUCKET).upload(
+        path=filename,
+        file=image_bytes,
+        file_options={"content-type": _content_type(extension)}
+    )
+
+    _check_upload_response(response)
+
+    public_url = _public_url(filename)
+    print(f"✅ Image uploaded successfully: {public_url}")
+    return public_url
+
+
+# Upload from an async byte iterator (e.g. a streamed HTTP download) without
+# holding the whole file in memory; sent with chunked transfer encoding
+async def upload_stream_to_supabase(chunks, extension="png", content_type: str | None = None) -> str:
+    filename = f"{uuid4().hex}.{extension}"
+    print(f"📦 Streaming upload to Supabase: {filename}")
+
+    response = await get_storage_http().post(
+        f"/object/{BUCKET}/{filename}",
+        content=chunks,
+        headers={"Content-Type": content_type or _content_type(extension), "x-upsert": "false"},
+    )
+    if response.is_error:
+        raise Exception(f"❌ Upload failed: {response.status_code} {response.text}")
+
+    public_url = _public_url(filename)
+    print(f"✅ Image uploaded successfully: {public_url}")
+    return public_url
+
+
+# Signed upload URL for one object: the client PUTs the file straight to
+# storage with it, so the bytes never pass through this API. Supabase keeps
+# these valid for two hours; the key is new per call and never overwritten.
+async def create_signed_upload_url(path: str) -> dict:
+    async def sign():
+        response = await get_storage_http().post(f"/object/upload/sign/{BUCKET}/{path}")
+        response.raise_for_status()
+        return response
+    try:
+        response = await upstream("storage").call(sign)
+    except httpx.HTTPStatusError as e:
+        raise Exception(f"❌ Could not sign upload: {e.response.status_code} {e.response.text}")
+    signed_path = response.json()["url"]
+    return {
+        "upload_url": f"{SUPABASE_URL}/storage/v1{signed_path}",
+        "token": httpx.URL(signed_path).params.get("token"),
+    }
+
+
+# Read an object back as a stream (authenticated, so private uploads work too)
+@asynccontextmanager
+async def stream_object(path: str):
+    async with get_storage_http().stream("GET", f"/object/{BUCKET}/{path}") as response:
+        if response.status_code in (400, 404):
+            raise FileNotFoundError(f"No uploaded object at {path}")
+        if response.is_error:
+            await response.aread()
+            raise Exception(f"❌ Download failed: {response.status_code} {response.text}")
+        yield response
+
+
+# Collects temporary object paths and deletes them with one remove() call per batch
+class TempObjectBatch:
+    def __init__(self, batch_size: int = TEMP_CLEANUP_BATCH, interval: float = TEMP_CLEANUP_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending: list[str] = []
+        self.last_flush = time.monotonic()
+
+    async def upload(self, image_bytes: bytes, extension="jpeg") -> str:
+        url = await upload_image_to_supabase_async(image_bytes, extension=extension, prefix=TEMP_PREFIX)
+        self.pending.append(url.rsplit(f"/{BUCKET}/", 1)[1])
+        return url
+
+    def due(self) -> bool:
+        return bool(self.pending) and (
+            len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.interval
+        )
+
+    async def flush(self) -> int:
+        paths, self.pending = self.pending, []
+        self.last_flush = time.monotonic()
+        if not paths:
+            return 0
+        try:
+            client = await get_async_supabase()
+            await client.storage.from_(BUCKET).remove(paths)
+            print(f"🧹 Removed {len(paths)} temp objects")
+        except Exception as e:
+            # Keep them for the next flush rather than leaking them
+            print("⚠️ Temp cleanup failed:", e)
+            self.pending.extend(paths)
+            return 0
+        return len(paths)
+
+    async def flush_if_due(self) -> int:
+        return await self.flush() if self.due() else 0
+
+
+temp_objects = TempObjectBatch()
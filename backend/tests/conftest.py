@@ -0,0 +1,38 @@
+# tests/conftest.py
+import base64
+from io import BytesIO
+import pytest
+from PIL import Image
+from ..services.result_cache import result_cache
+from ..services.result_store import result_store
+from ..services.single_flight import idempotency_store
+
+
+def make_image_bytes(format="JPEG", size=(64, 64), color="orange"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color=color).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+# What the mocked model returns: a small real JPEG, base64-encoded
+AI_IMAGE_B64 = base64.b64encode(make_image_bytes(size=(256, 256), color="green")).decode()
+
+
+# The route tests patch attributes of the lazily built AsyncOpenAI client,
+# which reads its key from the environment: a dummy one lets the suite run
+# without credentials
+@pytest.fixture(autouse=True)
+def openai_api_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+
+# Each test starts with an empty result cache, idempotency store and result store
+@pytest.fixture(autouse=True)
+def clear_stores():
+    result_cache.clear()
+    idempotency_store.clear()
+    result_store.clear()
+    yield
+    result_cache.clear()
+    idempotency_store.clear()
+    result_store.clear()
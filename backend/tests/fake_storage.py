@@ -0,0 +1,45 @@
+# Local stand-in for the Supabase Storage REST API: signed uploads, object
+# reads and plain uploads, kept in memory. Mount it behind an httpx client
+# with httpx.ASGITransport(app=storage.app), or serve it with uvicorn.
+from secrets import token_hex
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+
+class FakeStorage:
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.tokens: dict[str, str] = {}
+        self.reads: list[str] = []
+        self.app = self._build()
+
+    def _build(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/storage/v1/object/upload/sign/{bucket}/{path:path}")
+        async def sign(bucket: str, path: str):
+            token = token_hex(8)
+            self.tokens[token] = f"{bucket}/{path}"
+            return {"url": f"/object/upload/sign/{bucket}/{path}?token={token}"}
+
+        @app.put("/storage/v1/object/upload/sign/{bucket}/{path:path}")
+        async def signed_upload(bucket: str, path: str, token: str, request: Request):
+            if self.tokens.pop(token, None) != f"{bucket}/{path}":
+                return JSONResponse({"error": "invalid signature"}, status_code=400)
+            self.objects[f"{bucket}/{path}"] = await request.body()
+            return {"Key": f"{bucket}/{path}"}
+
+        @app.post("/storage/v1/object/{bucket}/{path:path}")
+        async def upload(bucket: str, path: str, request: Request):
+            self.objects[f"{bucket}/{path}"] = await request.body()
+            return {"Key": f"{bucket}/{path}"}
+
+        @app.get("/storage/v1/object/{bucket}/{path:path}")
+        async def read(bucket: str, path: str):
+            self.reads.append(path)
+            data = self.objects.get(f"{bucket}/{path}")
+            if data is None:
+                return JSONResponse({"error": "not_found"}, status_code=400)
+            return Response(data, media_type="application/octet-stream")
+
+        return app
@@ -0,0 +1,153 @@
+import asyncio
+import time
+import pytest
+from ..services.admission import AdmissionController, AdmissionRejected, TokenBucket, estimate_tokens
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# Test the bucket starts full and reports the wait for a deficit
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(rate_per_minute=60)  # 1 token/s, capacity 60
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert bucket.wait_time(2) == pytest.approx(2, abs=0.05)
+
+
+# Test no more than `concurrency` calls hold a slot at once
+def test_concurrency_is_capped():
+    controller = AdmissionController(concurrency=2, queue_size=10, queue_timeout=5)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with controller.slot():
+            peak = max(peak, controller.in_flight)
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    run(scenario())
+    assert peak == 2
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+
+# Test a full queue fails fast with 503 and a Retry-After hint
+def test_queue_full_rejects_immediately():
+    controller = AdmissionController(concurrency=1, queue_size=1, queue_timeout=5)
+
+    async def call():
+        async with controller.slot():
+            await asyncio.sleep(0.1)
+
+    async def scenario():
+        running = [asyncio.create_task(call()) for _ in range(2)]
+        await asyncio.sleep(0.01)  # one running, one queued
+        start = time.perf_counter()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await call()
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*running)
+        return rejected.value, elapsed
+
+    rejected, elapsed = run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.reason == "queue_full"
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert elapsed < 0.05
+
+
+# Test a queued call gives up once its deadline passes
+def test_queue_deadline():
+    controller = AdmissionController(concurrency=1, queue_size=5, queue_timeout=0.05)
+
+    async def hold():
+        async with controller.slot():
+            await asyncio.sleep(0.3)
+
+    async def scenario():
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.slot():
+                pass
+        await holder
+        return rejected.value
+
+    rejected = run(scenario())
+    assert rejected.reason == "queue_timeout"
+    assert rejected.status_code == 503
+
+
+# Test requests beyond the RPM budget get 429 when the wait exceeds the deadline
+def test_rate_limit_rejects_with_429():
+    controller = AdmissionController(concurrency=4, queue_size=4, queue_timeout=1, rpm=2)
+
+    async def scenario():
+        for _ in range(2):
+            async with controller.slot(images=1):
+                pass
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.slot(images=1):
+                pass
+        return rejected.value
+
+    rejected = run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after == pytest.approx(30, abs=1)
+
+
+# Test the per-call token estimate: prompt, input tiles and output images
+def test_estimate_tokens():
+    prompt = "x" * 400  # 100 tokens
+    assert estimate_tokens(prompt, 512) == 100 + (65 + 129) + 272
+    assert estimate_tokens(prompt, 1024, quality="medium") == 100 + (65 + 4 * 129) + 1056
+    assert estimate_tokens(prompt, 512, n=3) == 100 + (65 + 129) + 3 * 272
+
+
+# Test the TPM budget delays a call that fits the deadline and rejects one that doesn't
+def test_token_budget_delays_then_rejects():
+    controller = AdmissionController(concurrency=4, queue_size=4, queue_timeout=1, tpm=6000)  # 100 tokens/s
+
+    async def scenario():
+        async with controller.slot(images=1, tokens=6000):
+            pass
+        start = time.perf_counter()
+        async with controller.slot(images=1, tokens=30):
+            waited = time.perf_counter() - start
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.slot(images=1, tokens=600):
+                pass
+        return waited, rejected.value
+
+    waited, rejected = run(scenario())
+    assert waited == pytest.approx(0.3, abs=0.1)
+    assert rejected.status_code == 429 and rejected.reason == "rate_limited"
+
+
+# Test latency of admitted calls stays bounded under 10x overload
+def test_overload_keeps_latency_bounded():
+    controller = AdmissionController(concurrency=4, queue_size=8, queue_timeout=0.3)
+    service_time = 0.05
+    latencies, rejected = [], []
+
+    async def call():
+        start = time.perf_counter()
+        try:
+            async with controller.slot():
+                await asyncio.sleep(service_time)
+            latencies.append(time.perf_counter() - start)
+        except AdmissionRejected:
+            rejected.append(time.perf_counter() - start)
+
+    async def scenario():
+        await asyncio.gather(*[call() for _ in range(120)])
+
+    run(scenario())
+    assert rejected, "overload should shed load"
+    assert latencies, "some calls should still be served"
+    assert max(latencies) < controller.queue_timeout + service_time + 0.1
+    assert max(rejected) < controller.queue_timeout + 0.1
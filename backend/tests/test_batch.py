@@ -0,0 +1,109 @@
+import asyncio
+import base64
+import json
+from io import BytesIO
+from itertools import count
+from unittest.mock import patch, MagicMock, AsyncMock
+import pytest
+from PIL import Image
+from ..batch import main, open_manifest
+
+AI_IMAGE = BytesIO()
+Image.new("RGB", (256, 256), "green").save(AI_IMAGE, format="JPEG")
+AI_IMAGE_B64 = base64.b64encode(AI_IMAGE.getvalue()).decode()
+
+
+@pytest.fixture
+def photos(tmp_path):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    for name, color in (("rex.jpg", "orange"), ("bella.png", "blue")):
+        Image.new("RGB", (900, 700), color).save(folder / name)
+    (folder / "notes.jpg").write_text("not a photo")
+    return folder
+
+
+@pytest.fixture
+def fake_upstreams():
+    urls = count()
+
+    async def upload(data, extension="png", prefix=""):
+        return f"https://cdn.test/{next(urls)}.{extension}"
+
+    with patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock) as edit, \
+            patch("backend.batch.upload_image_to_supabase_async", side_effect=upload) as uploader:
+        edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+        yield edit, uploader
+
+
+def manifest_lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+# Test every photo × combination is generated once and recorded in the manifest
+def test_batch_runs_all_combinations(photos, tmp_path, fake_upstreams):
+    edit, _ = fake_upstreams
+    manifest = tmp_path / "manifest.jsonl"
+
+    code = main([str(photos), "--scenarios", "Lemon Fresh Morning,Grapefruit Getaway",
+                 "--clothing", "Hoodie,Scarf", "--manifest", str(manifest), "--concurrency", "3"])
+
+    assert code == 0
+    entries = manifest_lines(manifest)
+    assert len(entries) == 2 * 2 * 2  # unreadable notes.jpg is skipped up front
+    assert edit.call_count == 8
+    assert all(entry["status"] == "done" and entry["image_url"].startswith("https://cdn.test/") for entry in entries)
+    assert {entry["clothing"] for entry in entries} == {"Hoodie", "Scarf"}
+
+
+# Test a re-run after partial failure only redoes the failed jobs
+@pytest.mark.parametrize("manifest_name", ["manifest.jsonl", "manifest.db"])
+def test_batch_resumes_from_manifest(photos, tmp_path, fake_upstreams, manifest_name):
+    edit, _ = fake_upstreams
+    manifest = tmp_path / manifest_name
+    ok = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+    edit.side_effect = [ok, Exception("provider down"), ok, Exception("provider down")]
+    args = [str(photos), "--scenarios", "Lemon Fresh Morning", "--clothing", "Hoodie,Scarf",
+            "--manifest", str(manifest), "--concurrency", "1"]
+
+    assert main(args) == 1
+    manifest_store = open_manifest(str(manifest))
+    assert len(manifest_store.completed()) == 2
+    manifest_store.close()
+
+    edit.side_effect = None
+    edit.reset_mock()
+    assert main(args) == 0
+    assert edit.call_count == 2  # only the two that failed
+    manifest_store = open_manifest(str(manifest))
+    assert len(manifest_store.completed()) == 4
+    manifest_store.close()
+
+
+# Test model calls never exceed --concurrency
+def test_batch_bounds_concurrency(photos, tmp_path, fake_upstreams):
+    edit, _ = fake_upstreams
+    in_flight = peak = 0
+
+    async def slow_edit(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+
+    edit.side_effect = slow_edit
+    main([str(photos), "--clothing", "Hoodie", "--manifest", str(tmp_path / "m.jsonl"), "--concurrency", "2"])
+
+    assert edit.call_count == 2 * 5
+    assert peak == 2
+
+
+# Test a dry run lists the pending jobs without calling the model
+def test_batch_dry_run(photos, tmp_path, fake_upstreams, capsys):
+    edit, _ = fake_upstreams
+    main([str(photos), "--manifest", str(tmp_path / "m.jsonl"), "--dry-run"])
+
+    assert "60 pending, 0 already done" in capsys.readouterr().out  # 2 photos × 5 × 6
+    edit.assert_not_called()
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from ..services.clients import ClientRegistry, build_http_client, clients
+from ..services import supabase_uploader
+
+
+class Closable:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+# Test a client is built once on first use and then reused
+def test_registry_builds_lazily_once():
+    registry = ClientRegistry()
+    built = []
+
+    def factory():
+        built.append(1)
+        return object()
+
+    assert registry.names() == []
+    first = registry.get("sdk", factory)
+    assert registry.get("sdk", factory) is first
+    assert len(built) == 1
+    assert "sdk" in registry.init_times
+
+
+# Test concurrent first use of an async SDK constructor only builds it once
+def test_registry_async_get_builds_once_under_concurrency():
+    registry = ClientRegistry()
+    built = []
+
+    async def factory():
+        built.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def scenario():
+        return await asyncio.gather(*[registry.aget("sdk", factory) for _ in range(5)])
+
+    results = asyncio.run(scenario())
+    assert len(built) == 1
+    assert all(result is results[0] for result in results)
+
+
+# Test the lazy proxy delegates attribute access to the registry-held client
+def test_lazy_client_delegates():
+    registry = ClientRegistry()
+    proxy = registry.lazy("thing", lambda: type("Thing", (), {"value": 42})())
+
+    assert registry.names() == []
+    assert proxy.value == 42
+    assert registry.names() == ["thing"]
+
+
+# Test aclose closes httpx pools and sync SDK clients, then forgets them
+def test_registry_aclose_closes_everything():
+    registry = ClientRegistry()
+    sdk = registry.get("sdk", Closable)
+
+    async def scenario():
+        http = registry.http("upstream")
+        await registry.aclose()
+        return http
+
+    http = asyncio.run(scenario())
+    assert http.is_closed
+    assert sdk.closed
+    assert registry.names() == []
+
+
+# Test pool limits are applied and HTTP/2 degrades gracefully without h2
+def test_build_http_client_pool_settings():
+    with patch("backend.services.clients.http2_available", return_value=False):
+        http = build_http_client(http2=True, max_connections=7, max_keepalive=3, timeout=9)
+    pool = http._transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._http2 is False
+    assert http.timeout.read == 9
+    asyncio.run(http.aclose())
+
+
+# Test missing Supabase settings fail on first use instead of at import
+def test_supabase_config_checked_lazily():
+    with patch.object(supabase_uploader, "SUPABASE_URL", None):
+        with pytest.raises(RuntimeError):
+            supabase_uploader.get_supabase()
+
+
+# Test the app lifespan closes the shared registry on shutdown
+def test_lifespan_closes_registry():
+    from backend.main import app
+
+    with TestClient(app):
+        clients.get("probe", Closable)
+        probe = clients.get("probe", Closable)
+    assert probe.closed
+    assert "probe" not in clients.names()
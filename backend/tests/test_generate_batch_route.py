@@ -0,0 +1,144 @@
+# tests/test_generate_batch_route.py
+import asyncio
+import base64
+import json
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.testclient import TestClient
+from PIL import Image
+from backend.main import app
+from backend.services.resilience import current_deadline
+from .conftest import make_image_bytes
+
+client = TestClient(app)
+
+
+def b64_image(size=(64, 64)):
+    return base64.b64encode(make_image_bytes(size=size)).decode()
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+# Test n variations from a single images.edit call, streamed as they finish
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_batch_variations_single_call(mock_edit, mock_upload):
+    # Variation 0 is much bigger, so its upload finishes last
+    mock_edit.return_value = MagicMock(data=[
+        MagicMock(b64_json=b64_image((1024, 1024))),
+        MagicMock(b64_json=b64_image()),
+        MagicMock(b64_json=b64_image()),
+    ])
+
+    async def upload(data, extension):
+        await asyncio.sleep(0.2 if len(data) > 5000 else 0.01)
+        return f"https://cdn.supabase.io/{len(data)}.{extension}"
+    mock_upload.side_effect = upload
+
+    response = client.post(
+        "/api/generate/batch",
+        files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")},
+        data={"scenario": "Lemon Fresh Morning", "clothing": "Hoodie", "n": "3"}
+    )
+
+    lines = read_lines(response)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [line["type"] for line in lines] == ["started", "result", "result", "result", "done"]
+    results = [line for line in lines if line["type"] == "result"]
+    assert results[-1]["index"] == 0
+    assert mock_edit.await_count == 1
+    assert mock_edit.call_args.kwargs["n"] == 3
+    assert lines[-1]["succeeded"] == 3
+
+
+# Test fan-out over scenario × clothing with the concurrency cap
+@patch("backend.routes.generate.BATCH_CONCURRENCY", 1)
+@patch("backend.routes.generate.upload_image_to_supabase_async", new_callable=AsyncMock)
+def test_batch_fan_out_respects_cap(mock_upload):
+    active = 0
+    peak = 0
+
+    async def edit(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        return MagicMock(data=[MagicMock(b64_json=b64_image())])
+
+    mock_upload.return_value = "https://cdn.supabase.io/x.webp"
+
+    with patch("backend.routes.generate.client.images.edit", new=edit):
+        response = client.post(
+            "/api/generate/batch?stream=sse",
+            files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")},
+            data={"scenarios": ["Lemon Fresh Morning", "Grapefruit Getaway"], "clothings": ["Hoodie", "Scarf"]}
+        )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("event: result") == 4
+    assert peak == 1
+
+
+# Test request validation
+def test_batch_rejects_too_many_variations():
+    response = client.post(
+        "/api/generate/batch",
+        files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")},
+        data={"n": "50"}
+    )
+    assert response.status_code == 422
+
+
+# Test the latency budget picks the input size, model quality and renditions for the batch
+@patch("backend.routes.generate.upload_image_to_supabase_async", new_callable=AsyncMock)
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_batch_applies_latency_budget(mock_edit, mock_upload):
+    mock_edit.return_value = MagicMock(data=[MagicMock(b64_json=b64_image((1024, 1024)))] * 2)
+    mock_upload.return_value = "https://cdn.supabase.io/x.webp"
+
+    response = client.post(
+        "/api/generate/batch",
+        files={"file": ("dog.jpg", make_image_bytes(size=(1600, 1200)), "image/jpeg")},
+        data={"n": "2", "latency_budget": "fast"}
+    )
+
+    lines = read_lines(response)
+    report = lines[0]["latency_budget"]
+    assert report["mode"] == "fast" and report["level"] == 3
+    assert max(Image.open(mock_edit.call_args.kwargs["image"]).size) == report["input_max_size"] == 384
+    assert mock_edit.call_args.kwargs["quality"] == report["model_quality"]
+    results = [line for line in lines if line["type"] == "result"]
+    assert all(sorted(int(w) for w in r["renditions"]) == report["output_widths"] for r in results)
+
+
+# Test an unknown latency budget is rejected up front
+def test_batch_rejects_unknown_latency_budget():
+    response = client.post(
+        "/api/generate/batch",
+        files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")},
+        data={"latency_budget": "instant"}
+    )
+    assert response.status_code == 422
+
+
+# Test every fan-out model call runs under the request deadline
+@patch("backend.routes.generate.upload_image_to_supabase_async", new_callable=AsyncMock)
+def test_batch_model_calls_have_a_deadline(mock_upload):
+    deadlines = []
+
+    async def edit(**kwargs):
+        deadlines.append(current_deadline())
+        return MagicMock(data=[MagicMock(b64_json=b64_image())])
+
+    mock_upload.return_value = "https://cdn.supabase.io/x.webp"
+    with patch("backend.routes.generate.client.images.edit", new=edit):
+        response = client.post(
+            "/api/generate/batch",
+            files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")},
+            data={"scenarios": ["Lemon Fresh Morning", "Grapefruit Getaway"]}
+        )
+
+    assert read_lines(response)[-1]["succeeded"] == 2
+    assert len(deadlines) == 2 and all(d is not None for d in deadlines)
@@ -0,0 +1,119 @@
+import base64
+import json
+import httpx
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from io import BytesIO
+from PIL import Image
+from backend.main import app
+from backend.services.providers import FluxProvider
+from .conftest import make_image_bytes
+
+client = TestClient(app)
+
+
+FLUX_RESULT = make_image_bytes(size=(256, 256), color="green")
+
+
+# Fake AIML API + result CDN + Supabase Storage on one mock transport
+class FakeUpstreams:
+    def __init__(self, reject_inline=False):
+        self.reject_inline = reject_inline
+        self.flux_inputs = []
+        self.uploads = {}
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/images/generations":
+            image_url = json.loads(request.content)["image_url"]
+            self.flux_inputs.append(image_url)
+            if self.reject_inline and image_url.startswith("data:"):
+                return httpx.Response(422, json={"error": "image_url must be http(s)"})
+            return httpx.Response(200, json={"data": [{"url": "https://cdn.flux.test/result.jpg"}]})
+        if request.url.host == "cdn.flux.test":
+            return httpx.Response(200, content=FLUX_RESULT, headers={"content-type": "image/jpeg"})
+        if request.method == "POST" and "/storage/v1/object/" in request.url.path:
+            self.uploads[request.url.path] = request.read()
+            return httpx.Response(200, json={"Key": request.url.path})
+        return httpx.Response(404)
+
+
+def patched_upstreams(fake, **provider_kwargs):
+    transport = httpx.MockTransport(fake.handler)
+    provider = FluxProvider(api_key="k", http=httpx.AsyncClient(transport=transport), **provider_kwargs)
+    storage = httpx.AsyncClient(transport=transport, base_url="http://x/storage/v1")
+    return (
+        patch("backend.routes.generate.flux_provider", provider),
+        patch.multiple("backend.services.supabase_uploader",
+                       get_storage_http=lambda: storage, SUPABASE_URL="http://x"),
+    )
+
+
+# Test the optimized input goes inline and the result is streamed into storage
+def test_generate_flux_inline_and_streamed():
+    fake = FakeUpstreams()
+    raw = make_image_bytes(size=(1600, 1200))
+    flux_patch, storage_patch = patched_upstreams(fake)
+
+    with flux_patch, storage_patch:
+        response = client.post(
+            "/api/generate-flux",
+            files={"file": ("dog.jpg", BytesIO(raw), "image/jpeg")},
+            data={"scenario": "Orange Grove Adventure", "clothing": "Hoodie"}
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["image_url"].startswith("http://x/storage/v1/object/public/dog-ai-images/")
+    assert body["performance"]["inline_input"] is True
+
+    # One Flux call with an optimized (≤512px) JPEG data URL, no temp object
+    assert len(fake.flux_inputs) == 1
+    sent = base64.b64decode(fake.flux_inputs[0].split(",", 1)[1])
+    assert max(Image.open(BytesIO(sent)).size) <= 512
+    assert list(fake.uploads.values()) == [FLUX_RESULT]
+
+
+# Test a rejected data URL falls back to a temp upload that is queued for cleanup
+def test_generate_flux_falls_back_to_temp_upload():
+    fake = FakeUpstreams(reject_inline=True)
+    flux_patch, storage_patch = patched_upstreams(fake)
+
+    class TempObjects:
+        pending = []
+
+        async def upload(self, image_bytes, extension="jpeg"):
+            self.pending.append(f"tmp/input.{extension}")
+            return "http://x/storage/v1/object/public/dog-ai-images/tmp/input.jpeg"
+
+        async def flush_if_due(self):
+            return 0
+
+    temp_objects = TempObjects()
+    with flux_patch, storage_patch, \
+            patch("backend.routes.generate.flux_provider._temp_objects", temp_objects), \
+            patch("backend.routes.generate.temp_objects", temp_objects):
+        response = client.post(
+            "/api/generate-flux",
+            files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["performance"]["inline_input"] is False
+    assert fake.flux_inputs[1].endswith("/tmp/input.jpeg")
+    assert temp_objects.pending == ["tmp/input.jpeg"]
+
+
+# Test a Flux API error surfaces as a 500
+def test_generate_flux_api_error():
+    def handler(request):
+        return httpx.Response(500, text="upstream down")
+
+    provider = FluxProvider(api_key="k", http=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    with patch("backend.routes.generate.flux_provider", provider):
+        response = client.post(
+            "/api/generate-flux",
+            files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")}
+        )
+
+    assert response.status_code == 500
+    assert "Flux error 500" in response.json()["detail"]
@@ -1,16 +1,24 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from io import BytesIO
 import base64
+from PIL import Image
 from backend.main import app
+from backend.services.result_cache import result_cache
+from .conftest import AI_IMAGE_B64, make_image_bytes
 
 client = TestClient(app)
 
+
+def openai_response(b64=AI_IMAGE_B64):
+    return MagicMock(data=[MagicMock(b64_json=b64)])
+
+
 # Fixtures for test files
 @pytest.fixture
 def dummy_file():
-    return ("dog.jpg", BytesIO(b"fake-image-bytes"), "image/jpeg")
+    return ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")
 
 # Fixtures for different file types
 @pytest.fixture
@@ -20,48 +28,28 @@ def non_image_file():
 # Fixtures for WebP file
 @pytest.fixture
 def webp_file():
-    return ("dog.webp", BytesIO(b"webp-bytes"), "image/webp")
+    return ("dog.webp", BytesIO(make_image_bytes(format="WEBP")), "image/webp")
 
 
 # Tests for the /generate endpoint
-@patch("backend.routes.generate.upload_image_to_supabase")
-@patch("backend.routes.generate.overlay_gnb_logo")
-@patch("backend.routes.generate.client.images.edit")
-@patch("backend.routes.generate.optimize_input_image")
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
 @patch("backend.routes.generate.build_prompt")
 # Test successful image generation
 def test_generate_success(
     mock_build_prompt,
-    mock_optimize_input,
     mock_openai_edit,
-    mock_overlay,
     mock_upload,
     dummy_file
 ):
     mock_build_prompt.return_value = "Mock prompt"
-    optimized_img = BytesIO(b"optimized")
-    optimized_img.name = "dog.jpg"
-    mock_optimize_input.return_value = (
-        optimized_img,
-        {
-            "compression_time": 0.05,
-            "compression_ratio": 50.0,
-            "original_size": 1000000,
-            "compressed_size": 500000
-        }
-    )
-    mock_openai_edit.return_value = MagicMock(
-        data=[MagicMock(b64_json=base64.b64encode(b"ai-image").decode())]
-    )
-
-    mock_overlay.return_value = BytesIO(b"final-image")
-    mock_overlay.return_value.getvalue = lambda: b"final-image"
+    mock_openai_edit.return_value = openai_response()
     mock_upload.return_value = "https://cdn.supabase.io/image.jpg"
 
     response = client.post(
         "/api/generate",
         files={"file": dummy_file},
-        data={"scenario": "Lavender Chill", "clothing": "Poncho"}
+        data={"scenario": "Lavender Chill Evening", "clothing": "Poncho"}
     )
 
     assert response.status_code == 200
@@ -70,29 +58,68 @@ def test_generate_success(
     assert json_data["image_url"].startswith("https://")
     assert "performance" in json_data
     assert "openai_time" in json_data["performance"]
+    assert json_data["performance"]["pixel_memory_mb"] > 0
+    assert "wall_time" in json_data["performance"]["pipeline"]
+
+    # The model gets the downscaled JPEG, the upload gets the single final encode
+    sent = mock_openai_edit.call_args.kwargs["image"]
+    assert sent.name == "dog.jpg"
+    uploaded = mock_upload.call_args.args[0]
+    assert mock_upload.call_args.kwargs["extension"] == "webp"
+    with Image.open(BytesIO(uploaded)) as final:
+        assert final.format == "WEBP"
+        assert final.size == (256, 256)
+    assert json_data["performance"]["output"]["encoded_size"] == len(uploaded)
+
+
+# Test that a full-size result is returned as a responsive rendition set
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_returns_rendition_set(mock_openai_edit, mock_upload, dummy_file):
+    full_b64 = base64.b64encode(make_image_bytes(size=(1024, 1024))).decode()
+    mock_openai_edit.return_value = openai_response(full_b64)
+    mock_upload.side_effect = lambda data, extension: f"https://cdn.supabase.io/{len(data)}.{extension}"
+
+    json_data = client.post("/api/generate", files={"file": dummy_file}).json()
+
+    assert mock_upload.call_count == 3
+    assert set(json_data["renditions"]) == {"256", "512", "1024"}
+    assert json_data["image_url"] == json_data["renditions"]["1024"]
+    assert json_data["srcset"].endswith(f"{json_data['image_url']} 1024w")
+
+# Test that the output format can be chosen per request
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_output_format_jpeg(mock_openai_edit, mock_upload, dummy_file):
+    mock_openai_edit.return_value = openai_response()
+    mock_upload.return_value = "https://cdn.supabase.io/image.jpeg"
+
+    response = client.post("/api/generate", files={"file": dummy_file}, data={"output_format": "jpg"})
+
+    assert response.json()["performance"]["output"]["format"] == "jpeg"
+    assert mock_upload.call_args.kwargs["extension"] == "jpeg"
+    assert mock_upload.call_args.args[0][:2] == b"\xff\xd8"
+
+# Test that an unknown output format is rejected up front
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_rejects_unknown_output_format(mock_openai_edit, dummy_file):
+    response = client.post("/api/generate", files={"file": dummy_file}, data={"output_format": "bmp"})
+
+    assert response.status_code == 422
+    assert not mock_openai_edit.called
 
 
 # Test handling of non-image file
-@patch("backend.routes.generate.client.images.edit", side_effect=Exception("OpenAI failed"))
-@patch("backend.routes.generate.upload_image_to_supabase")
-@patch("backend.routes.generate.overlay_gnb_logo")
-@patch("backend.routes.generate.optimize_input_image")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock, side_effect=Exception("OpenAI failed"))
+@patch("backend.routes.generate.upload_image_to_supabase_async")
 @patch("backend.routes.generate.build_prompt")
 def test_generate_openai_failure(
     mock_build_prompt,
-    mock_optimize_input,
-    mock_overlay,
     mock_upload,
     mock_openai_edit,
     dummy_file
 ):
     mock_build_prompt.return_value = "Fail prompt"
-    mock_optimize_input.return_value = (BytesIO(b"optimized"), {
-        "compression_time": 0.02,
-        "compression_ratio": 40.0,
-        "original_size": 800000,
-        "compressed_size": 480000
-    })
 
     response = client.post(
         "/api/generate",
@@ -104,39 +131,23 @@ def test_generate_openai_failure(
     json_data = response.json()
     assert "error" in json_data
     assert json_data["error"] == "OpenAI failed"
+    assert not mock_upload.called
 
-# Test that PNG conversion is triggered for WebP files
+# Test that WebP uploads are decoded directly, without a PNG conversion round-trip
 @patch("backend.routes.generate.convert_to_png")
-@patch("backend.routes.generate.client.images.edit")
-@patch("backend.routes.generate.optimize_input_image")
-@patch("backend.routes.generate.upload_image_to_supabase")
-@patch("backend.routes.generate.overlay_gnb_logo")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+@patch("backend.routes.generate.upload_image_to_supabase_async")
 @patch("backend.routes.generate.build_prompt")
-def test_generate_triggers_png_conversion(
+def test_generate_decodes_webp_without_png_conversion(
     mock_build_prompt,
-    mock_overlay,
     mock_upload,
-    mock_optimize_input,
     mock_openai_edit,
     mock_convert,
     webp_file
 ):
-    mock_build_prompt.return_value = "PNG convert prompt"
-    mock_convert.return_value = b"converted-png"
-    optimized = BytesIO(b"optimized")
-    optimized.name = "dog.jpg"
-    mock_optimize_input.return_value = (optimized, {
-        "compression_time": 0.03,
-        "compression_ratio": 45.0,
-        "original_size": 900000,
-        "compressed_size": 500000
-    })
-    mock_openai_edit.return_value = MagicMock(data=[{
-        "b64_json": base64.b64encode(b"ai-image").decode()
-    }])
-    mock_overlay.return_value = BytesIO(b"final")
-    mock_overlay.return_value.getvalue = lambda: b"final"
-    mock_upload.return_value = "https://cdn.supabase.io/converted.jpg"
+    mock_build_prompt.return_value = "WebP prompt"
+    mock_openai_edit.return_value = openai_response()
+    mock_upload.return_value = "https://cdn.supabase.io/converted.png"
 
     response = client.post(
         "/api/generate",
@@ -145,41 +156,49 @@ def test_generate_triggers_png_conversion(
     )
 
     assert response.status_code == 200
-    assert mock_convert.called
+    assert response.json()["image_url"] == "https://cdn.supabase.io/converted.png"
+    assert not mock_convert.called
+
+# Test that a non-image upload fails before any upstream call
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_rejects_non_image(mock_edit, non_image_file):
+    response = client.post("/api/generate", files={"file": non_image_file})
+
+    assert "error" in response.json()
+    assert not mock_edit.called
+
+# Test an unknown scenario/clothing is a 422 before anything goes upstream
+@pytest.mark.parametrize("form, bad", [
+    ({"scenario": "Lavender Chill", "clothing": "Poncho"}, "scenario 'Lavender Chill'"),
+    ({"scenario": "Grapefruit Getaway", "clothing": "hoodie"}, "clothing 'hoodie'"),
+])
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_rejects_unknown_prompt_keys(mock_edit, mock_upload, dummy_file, form, bad):
+    response = client.post("/api/generate", files={"file": dummy_file}, data=form)
+
+    assert response.status_code == 422
+    assert bad in response.json()["detail"]
+    assert not mock_edit.called
+    assert not mock_upload.called
 
 # Test handling of missing file
 def test_generate_missing_file():
     response = client.post("/api/generate", data={"scenario": "Any", "clothing": "Any"})
     assert response.status_code == 422  # FastAPI validation
 
-# Test handling of non-image file
-@patch("backend.routes.generate.client.images.edit")
-@patch("backend.routes.generate.optimize_input_image")
-@patch("backend.routes.generate.upload_image_to_supabase", side_effect=Exception("Supabase down"))
-@patch("backend.routes.generate.overlay_gnb_logo")
+# Test handling of upload failure
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+@patch("backend.routes.generate.upload_image_to_supabase_async", side_effect=Exception("Supabase down"))
 @patch("backend.routes.generate.build_prompt")
 def test_generate_upload_failure(
     mock_prompt,
-    mock_overlay,
     mock_upload,
-    mock_optimize,
     mock_edit,
     dummy_file
 ):
     mock_prompt.return_value = "Prompt"
-    mock_edit.return_value = MagicMock(
-        data=[MagicMock(b64_json=base64.b64encode(b"ai-image").decode())]
-    )
-
-    mock_optimize.return_value = (BytesIO(b"opt"), {
-        "compression_time": 0.02,
-        "compression_ratio": 70.0,
-        "original_size": 1000000,
-        "compressed_size": 300000
-    })
-    overlay_img = BytesIO(b"overlay")
-    overlay_img.getvalue = lambda: b"overlay"
-    mock_overlay.return_value = overlay_img
+    mock_edit.return_value = openai_response()
 
     response = client.post(
         "/api/generate",
@@ -196,26 +215,377 @@ def test_generate_upload_failure(
 def test_generate_with_missing_optional_fields(mock_prompt, dummy_file):
     mock_prompt.return_value = "Default prompt"
 
-    with patch("backend.routes.generate.optimize_input_image") as mock_optimize, \
-         patch("backend.routes.generate.client.images.edit") as mock_edit, \
-         patch("backend.routes.generate.overlay_gnb_logo") as mock_overlay, \
-         patch("backend.routes.generate.upload_image_to_supabase") as mock_upload:
-
-        optimized = BytesIO(b"opt")
-        optimized.name = "dog.jpg"
-        mock_optimize.return_value = (optimized, {
-            "compression_time": 0.01,
-            "compression_ratio": 60,
-            "original_size": 500000,
-            "compressed_size": 200000
-        })
-        mock_edit.return_value = MagicMock(data=[{
-            "b64_json": base64.b64encode(b"ai-image").decode()
-        }])
-        mock_overlay.return_value = BytesIO(b"final")
-        mock_overlay.return_value.getvalue = lambda: b"final"
+    with patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock) as mock_edit, \
+         patch("backend.routes.generate.upload_image_to_supabase_async") as mock_upload:
+
+        mock_edit.return_value = openai_response()
         mock_upload.return_value = "https://cdn.supabase.io/image.jpg"
 
         response = client.post("/api/generate", files={"file": dummy_file})
         assert response.status_code == 200
         mock_prompt.assert_called_with(None, None)
+
+
+# Test that parallel requests overlap instead of queueing behind each other
+def test_generate_parallel_requests_do_not_block():
+    import asyncio
+    import time
+    import httpx
+
+    upstream_delay = 0.3
+
+    async def slow_edit(**kwargs):
+        await asyncio.sleep(upstream_delay)
+        return openai_response()
+
+    async def slow_upload(image_bytes, extension="png"):
+        await asyncio.sleep(0.1)
+        return "https://cdn.supabase.io/image.png"
+
+    async def fire(n):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            start = time.perf_counter()
+            # Distinct photos so neither the cache nor single-flight kicks in
+            responses = await asyncio.gather(*[
+                ac.post("/api/generate", files={
+                    "file": ("dog.jpg", make_image_bytes(color=(i * 40, 10, 10)), "image/jpeg")
+                })
+                for i in range(n)
+            ])
+            return time.perf_counter() - start, responses
+
+    with patch("backend.routes.generate.client.images.edit", new=slow_edit), \
+         patch("backend.routes.generate.upload_image_to_supabase_async", side_effect=slow_upload):
+        single_time, _ = asyncio.run(fire(1))
+        result_cache.clear()
+        parallel_time, responses = asyncio.run(fire(4))
+
+    assert all(r.json()["image_url"].startswith("https://") for r in responses)
+    # Serialized, 4 requests would take ~4x a single one
+    assert parallel_time < single_time * 2
+
+
+# Test that a repeated identical request is served from the result cache
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_repeat_request_hits_cache(
+    mock_openai_edit,
+    mock_upload,
+    dummy_file
+):
+    mock_openai_edit.return_value = openai_response()
+    mock_upload.return_value = "https://cdn.supabase.io/cached.png"
+
+    form = {"scenario": "Grapefruit Getaway", "clothing": "Poncho"}
+    first = client.post("/api/generate", files={"file": dummy_file}, data=form).json()
+    second = client.post(
+        "/api/generate", files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")}, data=form
+    ).json()
+
+    assert first["performance"]["cache"] == {"hit": False, "hits": 0, "misses": 1}
+    assert second["performance"]["cache"] == {"hit": True, "hits": 1, "misses": 1}
+    assert second["image_url"] == first["image_url"]
+    assert mock_openai_edit.await_count == 1
+    assert mock_upload.await_count == 1
+
+
+# Test that concurrent identical requests share a single upstream call
+def test_generate_concurrent_identical_requests_coalesce():
+    import asyncio
+    import httpx
+
+    edit_calls = []
+
+    async def slow_edit(**kwargs):
+        edit_calls.append(kwargs)
+        await asyncio.sleep(0.2)
+        return openai_response()
+
+    async def fire(n):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await asyncio.gather(*[
+                ac.post(
+                    "/api/generate",
+                    files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")},
+                    data={"scenario": "Lemon Fresh Morning", "clothing": "Hoodie"}
+                )
+                for _ in range(n)
+            ])
+
+    with patch("backend.routes.generate.client.images.edit", new=slow_edit), \
+         patch("backend.routes.generate.upload_image_to_supabase_async",
+               new_callable=AsyncMock, return_value="https://cdn.supabase.io/one.png") as mock_upload:
+        responses = asyncio.run(fire(3))
+
+    bodies = [r.json() for r in responses]
+    assert len(edit_calls) == 1
+    assert mock_upload.await_count == 1
+    assert {b["image_url"] for b in bodies} == {"https://cdn.supabase.io/one.png"}
+    assert sorted(b["performance"]["shared_inflight"] for b in bodies) == [False, True, True]
+
+
+# Test that a retried request with the same Idempotency-Key replays the first response
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_idempotency_key_replays_response(
+    mock_openai_edit,
+    mock_upload,
+    dummy_file
+):
+    mock_openai_edit.return_value = openai_response()
+    mock_upload.return_value = "https://cdn.supabase.io/idem.png"
+
+    headers = {"Idempotency-Key": "retry-123"}
+    first = client.post("/api/generate", files={"file": dummy_file}, headers=headers)
+    second = client.post(
+        "/api/generate",
+        files={"file": ("dog.jpg", BytesIO(make_image_bytes(color="blue")), "image/jpeg")},
+        headers=headers
+    )
+
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert mock_openai_edit.await_count == 1
+
+
+# Test /generate feeds the per-stage histograms exposed at /api/metrics
+@patch("backend.routes.generate.upload_image_to_supabase_async", new_callable=AsyncMock)
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_records_stage_metrics(mock_openai_edit, mock_upload, dummy_file):
+    mock_openai_edit.return_value = openai_response()
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+
+    client.post("/api/generate", files={"file": dummy_file})
+    response = client.get("/api/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for stage in ("read", "convert", "compress", "prompt", "model", "decode", "overlay", "encode", "upload"):
+        assert f'gnb_stage_duration_seconds_count{{stage="{stage}"}}' in response.text
+    assert 'gnb_request_duration_seconds_count{route="generate",outcome="ok"}' in response.text
+    assert 'gnb_provider_latency_seconds{provider="openai",quantile="50"}' in response.text
+
+
+# Test an overloaded worker answers 503 with Retry-After instead of queueing forever
+def test_generate_admission_rejects_with_retry_after():
+    import asyncio
+    import httpx
+    from backend.services.admission import AdmissionController
+
+    async def slow_edit(**kwargs):
+        await asyncio.sleep(0.2)
+        return openai_response()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*[
+                http.post("/api/generate", files={"file": ("dog.jpg", make_image_bytes(color=color), "image/jpeg")})
+                for color in ("red", "blue")
+            ])
+
+    with patch("backend.routes.generate.client.images.edit", new=AsyncMock(side_effect=slow_edit)), \
+            patch("backend.routes.generate.upload_image_to_supabase_async",
+                  new=AsyncMock(return_value="https://fake.supabase.co/image.webp")), \
+            patch("backend.routes.generate.model_admission", AdmissionController(concurrency=1, queue_size=0)):
+        responses = asyncio.run(scenario())
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200, 503]
+    rejected = next(r for r in responses if r.status_code == 503)
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert "capacity" in rejected.json()["error"]
+
+
+# Test /generate charges its estimated tokens against the TPM budget
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_rejects_over_token_budget(mock_openai_edit, dummy_file):
+    from backend.services.admission import AdmissionController
+
+    with patch("backend.routes.generate.model_admission", AdmissionController(tpm=100)):
+        response = client.post("/api/generate", files={"file": dummy_file})
+
+    assert response.status_code == 429
+    assert "rate_limited" in response.json()["error"]
+    mock_openai_edit.assert_not_awaited()
+
+
+# Test uploads over the pixel budget are refused with 413 before any model call
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_rejects_decompression_bomb(mock_openai_edit, dummy_file):
+    with patch("backend.services.optimize_images.MAX_INPUT_PIXELS", 1000):
+        response = client.post("/api/generate", files={"file": dummy_file})
+
+    assert response.status_code == 413
+    assert "limit" in response.json()["error"]
+    mock_openai_edit.assert_not_called()
+
+
+# Test a PNG uploaded as dog.jpg is read by content, not by its name
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_accepts_mislabeled_png(mock_openai_edit, mock_upload):
+    mock_openai_edit.return_value = openai_response()
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+    mislabeled = ("dog.jpg", BytesIO(make_image_bytes(format="PNG")), "image/jpeg")
+
+    response = client.post("/api/generate", files={"file": mislabeled})
+
+    assert response.status_code == 200
+    assert response.json()["image_url"] == "https://fake.supabase.co/image.webp"
+
+
+# Test text named like a photo is refused with 415 before any model call
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_rejects_mislabeled_text_with_415(mock_openai_edit):
+    mislabeled = ("dog.jpg", BytesIO(b"plain text, not a photo"), "image/jpeg")
+
+    response = client.post("/api/generate", files={"file": mislabeled})
+
+    assert response.status_code == 415
+    assert "Unsupported" in response.json()["error"]
+    mock_openai_edit.assert_not_called()
+
+
+# Test uploads over MAX_UPLOAD_BYTES are refused with 413 before any model call
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_rejects_oversized_upload(mock_openai_edit, dummy_file):
+    with patch("backend.services.ingest.MAX_UPLOAD_BYTES", 100):
+        response = client.post("/api/generate", files={"file": dummy_file})
+
+    assert response.status_code == 413
+    assert "larger than" in response.json()["error"]
+    mock_openai_edit.assert_not_called()
+
+
+# Test a re-compressed copy of an earlier photo reuses its result for the same prompt
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_near_duplicate_reuses_result(mock_openai_edit, mock_upload):
+    from PIL import ImageDraw, ImageFilter
+    from backend.services.near_duplicates import near_duplicates
+    near_duplicates.clear()
+    mock_openai_edit.return_value = openai_response()
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+
+    photo = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(photo)
+    for i in range(12):
+        draw.ellipse([i * 60, (i * 97) % 500, i * 60 + 180, (i * 97) % 500 + 140], fill=(i * 20, 90, 255 - i * 20))
+    photo = photo.filter(ImageFilter.GaussianBlur(3))
+    original, recompressed = BytesIO(), BytesIO()
+    photo.save(original, format="JPEG", quality=95)
+    photo.save(recompressed, format="JPEG", quality=35)
+
+    first = client.post("/api/generate", files={"file": ("dog.jpg", BytesIO(original.getvalue()), "image/jpeg")})
+    second = client.post("/api/generate", files={"file": ("dog.jpg", BytesIO(recompressed.getvalue()), "image/jpeg")})
+
+    assert first.json()["performance"]["cache"]["hit"] is False
+    cache = second.json()["performance"]["cache"]
+    assert cache["hit"] is True and cache["near_duplicate"] is True
+    assert second.json()["image_url"] == "https://fake.supabase.co/image.webp"
+    assert mock_openai_edit.call_count == 1
+    near_duplicates.clear()
+
+
+class UpstreamStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"Upstream returned {status_code}")
+        self.status_code = status_code
+
+
+def fast_openai_upstream(**breaker):
+    import random
+    from backend.services import resilience
+    upstream = resilience.Upstream(
+        "openai", base_delay=0.01, max_delay=0.02, rng=random.Random(0),
+        breaker=resilience.CircuitBreaker("openai", **breaker)
+    )
+    return patch.dict(resilience._upstreams, {"openai": upstream}), upstream
+
+
+# Test a transient provider 5xx is retried inside the request instead of surfacing
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_retries_transient_provider_error(mock_edit, mock_upload, dummy_file):
+    mock_edit.side_effect = [UpstreamStatusError(500), openai_response()]
+    mock_upload.return_value = "https://cdn.supabase.io/image.jpg"
+    upstreams, _ = fast_openai_upstream()
+
+    with upstreams:
+        response = client.post("/api/generate", files={"file": dummy_file},
+                               data={"scenario": "Grapefruit Getaway", "clothing": "Scarf"})
+
+    assert response.status_code == 200
+    assert mock_edit.await_count == 2
+    deadline = response.json()["performance"]["deadline"]
+    assert deadline["retries"] == 1 and deadline["remaining"] < deadline["budget"]
+
+
+# Test a request that outlives its deadline gets a 504 at the deadline, not after the upstream
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_deadline_exceeded(mock_edit, dummy_file):
+    import asyncio
+    import time
+
+    async def hang(**kwargs):
+        await asyncio.sleep(5)
+    mock_edit.side_effect = hang
+    upstreams, _ = fast_openai_upstream()
+
+    start = time.perf_counter()
+    with upstreams, patch("backend.routes.generate.REQUEST_DEADLINE", 0.3):
+        response = client.post("/api/generate", files={"file": dummy_file})
+
+    assert response.status_code == 504
+    assert "deadline" in response.json()["error"]
+    assert time.perf_counter() - start < 2
+
+
+# Test an open provider circuit fails fast with 503 + Retry-After, without calling the model
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_fails_fast_when_circuit_open(mock_edit, dummy_file):
+    upstreams, upstream = fast_openai_upstream(failure_threshold=1, reset_timeout=30)
+    upstream.breaker.record_failure()
+
+    with upstreams:
+        response = client.post("/api/generate", files={"file": dummy_file})
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) > 1
+    assert "circuit open" in response.json()["error"]
+    mock_edit.assert_not_called()
+
+
+# Test the latency budget picks the input size, model quality and renditions, and reports them
+@pytest.mark.parametrize("budget, input_size, model_quality, widths", [
+    (None, 512, "low", [256, 512, 1024]),
+    ("fast", 384, "low", [512, 1024]),
+    ("best", 1024, "medium", [256, 512, 1024]),
+])
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_latency_budget_settings(mock_edit, mock_upload, budget, input_size, model_quality, widths):
+    mock_edit.return_value = openai_response(base64.b64encode(make_image_bytes(size=(1024, 1024))).decode())
+    mock_upload.return_value = "https://cdn.supabase.io/image.webp"
+    photo = ("dog.png", BytesIO(make_image_bytes(format="PNG", size=(1600, 1200))), "image/png")
+    form = {"latency_budget": budget} if budget else {}
+
+    response = client.post("/api/generate", files={"file": photo}, data=form)
+
+    assert response.status_code == 200
+    report = response.json()["performance"]["latency_budget"]
+    assert report["mode"] == (budget or "balanced")
+    assert report["input_max_size"] == input_size and report["output_widths"] == widths
+    assert sorted(int(w) for w in response.json()["renditions"]) == widths
+    sent = Image.open(mock_edit.call_args.kwargs["image"])
+    assert max(sent.size) == input_size
+    assert mock_edit.call_args.kwargs["quality"] == model_quality
+
+
+# Test an unknown latency budget is rejected up front
+def test_generate_rejects_unknown_latency_budget(dummy_file):
+    response = client.post("/api/generate", files={"file": dummy_file}, data={"latency_budget": "instant"})
+    assert response.status_code == 422
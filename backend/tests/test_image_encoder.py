@@ -0,0 +1,44 @@
+# tests/test_image_encoder.py
+import os
+from io import BytesIO
+import pytest
+from PIL import Image
+from ..services.image_encoder import encode_image, normalize_format, CONTENT_TYPES
+
+
+def noisy_image(size=(512, 512)):
+    # Random pixels compress badly, so quality actually matters
+    return Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+
+# Test that lossy formats search down to a quality that fits the byte budget
+@pytest.mark.parametrize("fmt", ["jpeg", "webp"])
+def test_encode_fits_byte_budget(fmt):
+    image = noisy_image()
+    budget = encode_image(image, fmt, quality=60, max_bytes=None).size
+
+    encoded = encode_image(image, fmt, quality=90, max_bytes=budget)
+
+    assert encoded.size <= budget
+    assert 60 <= encoded.quality < 90
+    assert encoded.attempts > 1
+    assert encoded.content_type == CONTENT_TYPES[fmt]
+    with Image.open(BytesIO(encoded.data)) as decoded:
+        assert decoded.size == (512, 512)
+
+# Test that a budget that can't be met still returns the minimum-quality image
+def test_encode_unreachable_budget_returns_smallest():
+    encoded = encode_image(noisy_image(), "jpeg", quality=90, max_bytes=100)
+    assert encoded.quality == 40
+
+# Test that PNG ignores quality and JPEG drops alpha
+def test_encode_png_and_rgba_jpeg():
+    rgba = Image.new("RGBA", (64, 64), (10, 20, 30, 128))
+    assert encode_image(rgba, "png").quality is None
+    assert encode_image(rgba, "jpeg").data[:2] == b"\xff\xd8"
+
+# Test format normalization and validation
+def test_normalize_format():
+    assert normalize_format("JPG") == "jpeg"
+    assert normalize_format("avif") in ("avif", "webp")
+    with pytest.raises(ValueError):
+        normalize_format("bmp")
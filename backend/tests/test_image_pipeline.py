@@ -0,0 +1,41 @@
+# tests/test_image_pipeline.py
+import base64
+from io import BytesIO
+from PIL import Image
+from ..services.image_pipeline import ImagePipeline
+
+
+def make_jpeg(size=(1600, 1200), color="brown"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color=color).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+# Test the input side: one decode, downscaled JPEG for the model
+def test_pipeline_model_input_downscales():
+    pipeline = ImagePipeline.from_bytes(make_jpeg())
+
+    buffer, stats = pipeline.model_input(max_size=512, quality=85)
+
+    with Image.open(buffer) as sent:
+        assert sent.format == "JPEG"
+        assert max(sent.size) == 512
+    assert stats["original_size"] == pipeline.source_size
+    assert stats["compressed_size"] < stats["original_size"]
+    # draft() decodes at 1/2 scale (800x600) instead of the full 1600x1200, plus the 512x384 thumbnail
+    assert pipeline.peak_pixel_bytes == (800 * 600 + 512 * 384) * 4 < 1600 * 1200 * 4
+
+# Test the output side: decode, overlay in place, encode exactly once
+def test_pipeline_overlay_and_single_encode():
+    b64 = base64.b64encode(make_jpeg(size=(1024, 1024), color="black")).decode()
+    pipeline = ImagePipeline.from_base64(b64).overlay_logo()
+
+    encoded = pipeline.encode("png")
+
+    assert pipeline.encoded_size == encoded.size
+    with Image.open(BytesIO(encoded.data)) as final:
+        assert final.format == "PNG"
+        assert final.size == (1024, 1024)
+    stats = pipeline.stats()
+    assert {"decode_time", "overlay_time", "encode_time", "wall_time"} <= set(stats)
+    # Decoded RGB result plus its RGBA copy for compositing, 4 bytes a pixel each
+    assert stats["pixel_memory_mb"] == 8.0
@@ -0,0 +1,144 @@
+import asyncio
+from io import BytesIO
+import pytest
+from PIL import Image
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+from ..services.ingest import (
+    ingest_upload, ingest_bytes, ingest_stream, sniff_format, UploadLimitMiddleware,
+    UploadTooLarge, UnsupportedUpload
+)
+from ..services.image_pipeline import ImagePipeline
+from .conftest import make_image_bytes
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_upload(data: bytes, filename="dog.jpg", size=True) -> UploadFile:
+    return UploadFile(BytesIO(data), filename=filename, size=len(data) if size else None)
+
+
+# Test magic-byte sniffing for the formats we accept
+@pytest.mark.parametrize("format, expected", [
+    ("JPEG", "jpeg"), ("PNG", "png"), ("WEBP", "webp"), ("GIF", "gif"), ("BMP", "bmp"), ("TIFF", "tiff")
+])
+def test_sniff_format(format, expected):
+    assert sniff_format(make_image_bytes(format)[:64]) == expected
+
+
+# Test ISO-BMFF brands map to AVIF/HEIC and junk maps to nothing
+def test_sniff_format_ftyp_and_unknown():
+    assert sniff_format(b"\x00\x00\x00\x1cftypavif\x00\x00\x00\x00") == "avif"
+    assert sniff_format(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00") == "heic"
+    assert sniff_format(b"not-an-image") is None
+
+
+# Test the real format wins over the filename (a PNG named .jpg)
+def test_ingest_uses_magic_bytes_not_filename():
+    upload = run(ingest_upload(make_upload(make_image_bytes("PNG"), filename="dog.jpg")))
+
+    assert upload.format == "png"
+    assert upload.content_type == "image/png"
+    assert upload.read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+
+
+# Test text dressed up as a JPEG is refused on the first chunk
+def test_ingest_rejects_mislabeled_text():
+    with pytest.raises(UnsupportedUpload):
+        run(ingest_upload(make_upload(b"hello, definitely a jpeg", filename="dog.jpg")))
+
+
+# Test the declared size is checked before anything is read
+def test_ingest_rejects_declared_oversize():
+    upload = make_upload(make_image_bytes())
+    upload.size = 10_000_000
+
+    with pytest.raises(UploadTooLarge):
+        run(ingest_upload(upload, max_bytes=1000))
+    assert upload.file.tell() == 0
+
+
+# Test an upload without a declared size is cut off while streaming
+@pytest.mark.parametrize("copy", [False, True])
+def test_ingest_rejects_oversize_while_streaming(copy):
+    data = make_image_bytes() + b"\x00" * 300_000
+    with pytest.raises(UploadTooLarge):
+        run(ingest_upload(make_upload(data, size=False), max_bytes=200_000, copy=copy))
+
+
+# Test copies stay in memory under the spool threshold and roll to disk above it
+def test_ingest_copy_spools_to_disk_above_threshold(monkeypatch):
+    monkeypatch.setattr("backend.services.ingest.SPOOL_MAX_MEMORY", 100_000)
+    small = run(ingest_upload(make_upload(make_image_bytes()), copy=True))
+    large = run(ingest_upload(make_upload(make_image_bytes() + b"\x00" * 200_000), copy=True))
+
+    assert not small.file._rolled
+    assert large.file._rolled
+    assert large.size == len(make_image_bytes()) + 200_000
+    small.close()
+    large.close()
+
+
+# Test the pipeline opens large uploads from the spool without copying them to bytes
+def test_pipeline_reads_from_spooled_upload(monkeypatch):
+    monkeypatch.setattr("backend.services.image_pipeline.PASSTHROUGH_MAX_BYTES", 0)
+    upload = ingest_bytes(make_image_bytes(size=(800, 600)))
+    pipeline = ImagePipeline.from_upload(upload)
+    buffer, stats = pipeline.model_input(max_size=512)
+
+    assert pipeline.source is None
+    assert Image.open(buffer).size == (512, 384)
+    assert stats["passthrough"] is False
+
+
+def _limited_app(max_bytes: int) -> TestClient:
+    app = FastAPI()
+
+    @app.post("/api/generate")
+    async def echo(request: Request):
+        return {"received": len(await request.body())}
+
+    app.add_middleware(UploadLimitMiddleware, max_bytes=max_bytes)
+    return TestClient(app)
+
+
+# Test the middleware refuses a declared Content-Length over the limit
+def test_middleware_rejects_large_content_length():
+    client = _limited_app(max_bytes=1000)
+
+    assert client.post("/api/generate", content=b"x" * 500).json() == {"received": 500}
+    response = client.post("/api/generate", content=b"x" * 5000)
+    assert response.status_code == 413
+
+
+# Test a chunked body with no Content-Length is cut off once it crosses the limit
+def test_middleware_rejects_large_chunked_body():
+    client = _limited_app(max_bytes=1000)
+
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 500
+
+    response = client.post("/api/generate", content=chunks())
+    assert response.status_code == 413
+    assert response.json()["error"] == "Upload too large"
+
+
+# Test a stream of tiny chunks is sniffed once enough of the header arrived
+def test_ingest_stream_sniffs_across_chunks():
+    data = make_image_bytes("PNG")
+
+    async def chunks():
+        for i in range(0, len(data), 5):
+            yield data[i:i + 5]
+
+    upload = run(ingest_stream(chunks()))
+    assert upload.format == "png"
+    assert upload.size == len(data)
+    assert upload.read_bytes() == data
+
+    with pytest.raises(UploadTooLarge):
+        run(ingest_stream(chunks(), max_bytes=100))
@@ -0,0 +1,64 @@
+# tests/test_job_store.py
+import pytest
+from ..services.job_store import JobStore, InMemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+# Test the queued → running → succeeded transitions in both stores
+def test_job_store_transitions(store):
+    job = store.create()
+    assert store.get(job.id).status == "queued"
+
+    store.add_event(job.id, "optimized", {"compression_time": 0.01})
+    running = store.get(job.id)
+    assert running.status == "running"
+    assert running.stage == "optimized"
+    assert running.events[0]["compression_time"] == 0.01
+
+    store.finish(job.id, {"image_url": "https://x/y.webp"})
+    done = store.get(job.id)
+    assert done.done
+    assert done.result == {"image_url": "https://x/y.webp"}
+    assert [e["stage"] for e in done.events] == ["optimized", "succeeded"]
+
+# Test an event recorded before the worker starts keeps the job queued
+def test_job_store_event_while_queued(store):
+    job = store.create()
+    store.add_event(job.id, "received", {"bytes": 10}, status="queued")
+
+    queued = store.get(job.id)
+    assert queued.status == "queued"
+    assert queued.stage == "received"
+    assert queued.events[0]["bytes"] == 10
+
+# Test failures and unknown ids
+def test_job_store_failure(store):
+    job = store.create()
+    store.fail(job.id, "boom")
+
+    assert store.get(job.id).status == "failed"
+    assert store.get(job.id).error == "boom"
+    assert store.get("missing") is None
+
+# Test that the SQLite store is readable from a fresh connection
+def test_sqlite_job_store_persists(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job = SQLiteJobStore(path).create()
+    assert SQLiteJobStore(path).get(job.id).status == "queued"
+
+# Test a store missing part of the interface fails when created, not on first use
+def test_incomplete_store_fails_at_creation():
+    class ReadOnly(JobStore):
+        def create(self):
+            raise RuntimeError
+
+        def get(self, job_id):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnly()
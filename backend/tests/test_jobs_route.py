@@ -0,0 +1,79 @@
+# tests/test_jobs_route.py
+import base64
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.services.job_store import job_store
+from .conftest import make_image_bytes
+
+client = TestClient(app)
+
+
+# Test that a job runs in the background and records every stage
+@patch("backend.routes.generate.upload_image_to_supabase_async", new_callable=AsyncMock)
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_job_lifecycle_and_events(mock_edit, mock_upload):
+    mock_edit.return_value = MagicMock(data=[MagicMock(b64_json=base64.b64encode(make_image_bytes()).decode())])
+    mock_upload.return_value = "https://cdn.supabase.io/job.webp"
+
+    created = client.post(
+        "/api/jobs",
+        files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")},
+        data={"scenario": "Lemon Fresh Morning", "clothing": "Hoodie"}
+    )
+    assert created.status_code == 202
+    job_id = created.json()["job_id"]
+
+    job = client.get(f"/api/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["image_url"] == "https://cdn.supabase.io/job.webp"
+    stages = [event["stage"] for event in job["events"]]
+    assert stages == ["received", "optimized", "prompt_built", "model_running", "overlay", "uploaded", "succeeded"]
+
+    stream = client.get(f"/api/jobs/{job_id}/events")
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    assert stream.text.count("event: ") == len(stages)
+    assert "event: succeeded" in stream.text
+
+    # Reconnecting with Last-Event-ID only replays what came after it
+    resumed = client.get(f"/api/jobs/{job_id}/events", headers={"Last-Event-ID": "4"})
+    assert resumed.text.count("event: ") == 2
+
+
+# Test that a failing generation marks the job failed with the error
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock, side_effect=Exception("OpenAI failed"))
+def test_job_failure_is_recorded(mock_edit):
+    created = client.post("/api/jobs", files={"file": ("dog.jpg", make_image_bytes(color="red"), "image/jpeg")})
+
+    job = client.get(f"/api/jobs/{created.json()['job_id']}").json()
+    assert job["status"] == "failed"
+    assert job["error"] == "OpenAI failed"
+
+
+# Test a job stays queued until the background worker picks it up
+@patch("backend.routes.jobs._run_job", new_callable=AsyncMock)
+def test_received_job_is_queued(mock_run_job):
+    created = client.post("/api/jobs", files={"file": ("dog.jpg", make_image_bytes(), "image/jpeg")})
+
+    job = client.get(f"/api/jobs/{created.json()['job_id']}").json()
+    assert job["status"] == "queued"
+    assert [event["stage"] for event in job["events"]] == ["received"]
+
+
+# Test the event stream ends when its job is evicted from the store mid-stream
+def test_event_stream_ends_when_job_is_evicted(monkeypatch):
+    job = job_store.create()
+    job_store.add_event(job.id, "received", status="queued")
+    monkeypatch.setattr("backend.routes.jobs.EVENT_POLL_INTERVAL", 0.01)
+
+    with patch("backend.routes.jobs.job_store.get", side_effect=[job, job, None]):
+        stream = client.get(f"/api/jobs/{job.id}/events")
+
+    assert stream.status_code == 200
+    assert stream.text.count("event: received") == 1
+
+
+# Test unknown job ids
+def test_unknown_job_returns_404():
+    assert client.get("/api/jobs/missing").status_code == 404
+    assert client.get("/api/jobs/missing/events").status_code == 404
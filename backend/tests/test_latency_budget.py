@@ -0,0 +1,113 @@
+from statistics import mean
+from ..services.latency_budget import LatencyBudgetController, LEVELS, MODE_LEVELS, P95_TARGETS
+from ..benchmarks.sim_latency_budget import simulate, summarize
+from ..benchmarks.load_admission import percentile
+
+SPIKE = ((600, 0.2), (900, 0.45), (1500, 0.2))
+
+
+def controller(**kwargs) -> LatencyBudgetController:
+    return LatencyBudgetController(targets={"fast": 10, "balanced": 20, "best": 60}, window=20, min_samples=5, **kwargs)
+
+
+# Test each mode starts at its preferred level
+def test_modes_start_at_preferred_level():
+    budget = controller()
+    for mode, (preferred, _) in MODE_LEVELS.items():
+        settings, reason = budget.choose(mode)
+        assert settings.level == preferred and reason == "preferred"
+    assert budget.choose("balanced")[0] == LEVELS[2]  # the settings /generate always used
+    assert LEVELS[0].input_max_size > LEVELS[2].input_max_size > LEVELS[4].input_max_size
+
+
+# Test a slow p95 steps down one level at a time, never past the mode's floor
+def test_degrades_on_slow_p95_within_mode_range():
+    budget = controller()
+    for _ in range(30):
+        budget.observe("balanced", 30.0, 25.0)
+    assert budget.choose("balanced")[0].level == MODE_LEVELS["balanced"][1]
+    assert "p95" in budget.choose("balanced")[1]
+    assert budget.choose("best")[0].level == 0  # modes are independent
+
+
+# Test it steps back up only after a full window with headroom
+def test_recovers_after_full_window_of_headroom():
+    budget = controller()
+    for _ in range(5):
+        budget.observe("balanced", 30.0, 25.0)
+    assert budget.choose("balanced")[0].level == 3
+
+    for _ in range(19):
+        budget.observe("balanced", 5.0, 4.0)
+    assert budget.choose("balanced")[0].level == 3
+    budget.observe("balanced", 5.0, 4.0)
+    assert budget.choose("balanced")[0].level == 2
+    assert budget.choose("balanced")[1] == "recovered"
+
+
+# Test a deep admission queue degrades immediately, before the p95 reacts
+def test_queue_depth_degrades_before_p95_does():
+    budget = controller()
+    for _ in range(4):
+        budget.observe("balanced", 8.0, 6.0)
+    assert budget.choose("balanced", queue_depth=0, concurrency=4)[0].level == 2
+
+    settings, reason = budget.choose("balanced", queue_depth=12, concurrency=4)  # ~3 model calls of wait
+    assert settings.level == 3 and reason == "queue"
+    assert budget.choose("balanced", queue_depth=40, concurrency=4)[0].level == 4
+
+
+# Test recovery waits until the better level would fit the current request rate,
+# however fast the degraded level looks
+def test_recovery_waits_for_model_capacity():
+    now = 0.0
+    budget = controller(clock=lambda: now)
+    budget.choose("balanced", concurrency=4)
+    for _ in range(5):
+        now += 1
+        budget.observe("balanced", 30.0, 10.0, level=2)
+    assert budget.choose("balanced")[0].level == 3
+
+    for _ in range(20):  # one completion a second: level 2 would need 2.5x the slots
+        now += 1
+        budget.observe("balanced", 5.0, 8.0, level=3)
+    assert budget.choose("balanced")[0].level == 3
+    assert budget.utilization("balanced", 2) > 1
+
+    for _ in range(20):
+        now += 10
+        budget.observe("balanced", 5.0, 8.0, level=3)
+    assert budget.choose("balanced") == (LEVELS[2], "recovered")
+
+
+# Test requests still finishing at the old level don't count against the new one
+def test_ignores_latencies_from_a_better_level():
+    budget = controller()
+    for _ in range(5):
+        budget.observe("balanced", 30.0, 10.0, level=2)
+    for _ in range(10):
+        budget.observe("balanced", 30.0, 10.0, level=2)  # queued before the step
+    assert budget.choose("balanced")[0].level == 3
+
+
+# Test the controller holds the p95 target through a traffic spike that a fixed
+# level can't survive, and returns to the preferred level once it is over. Over
+# many seeds, not one: some spikes are too bursty for even the cheapest level.
+def test_simulation_holds_p95_target():
+    target = P95_TARGETS["balanced"]
+    seeds = range(1, 61)
+    adaptive = {seed: simulate("balanced", SPIKE, concurrency=4, seed=seed,
+                               controller=LatencyBudgetController(targets=P95_TARGETS)) for seed in seeds}
+    fixed = [latency for seed in seeds
+             for _, latency, _ in simulate("balanced", SPIKE, concurrency=4, seed=seed, fixed_level=2)]
+
+    pooled = [latency for results in adaptive.values() for _, latency, _ in results]
+    assert percentile(pooled, 0.95) <= target
+    held = sum(summarize(results, SPIKE)["p95"] <= target for results in adaptive.values())
+    assert held >= 0.9 * len(seeds)
+    assert percentile(fixed, 0.95) > 2 * target
+
+    peak = [mean(lv for arrival, _, lv in results if 1000 <= arrival < 1500) for results in adaptive.values()]
+    tail = [mean(lv for arrival, _, lv in results if arrival >= 2400) for results in adaptive.values()]
+    assert mean(peak) > 3  # degraded under load...
+    assert mean(tail) < 2.1 and max(tail) < 2.5  # ...and back to the preferred level afterwards
@@ -0,0 +1,67 @@
+import time
+from fastapi.testclient import TestClient
+from ..benchmarks.fake_upstreams import FaultProfile, build_fake_openai, build_fake_storage
+from ..benchmarks.load_e2e import parse_stage_histograms, stage_breakdown, summarize, compare
+from ..services.metrics import MetricsRegistry
+
+
+# Test the fake model answers like images.edit and injects failures at the set rate
+def test_fake_openai_latency_and_failures():
+    client = TestClient(build_fake_openai(FaultProfile(latency=0.05, sigma=0, failure_rate=0.3, seed=1)))
+
+    start = time.perf_counter()
+    statuses = [
+        client.post("/v1/images/edits", data={"n": "2"}, files={"image": ("d.jpg", b"x", "image/jpeg")}).status_code
+        for _ in range(20)
+    ]
+    assert (time.perf_counter() - start) / 20 >= 0.05
+    assert 2 <= statuses.count(500) <= 12
+    ok = client.post("/v1/images/edits", data={"n": "2"}, files={"image": ("d.jpg", b"x", "image/jpeg")})
+    while ok.status_code != 200:
+        ok = client.post("/v1/images/edits", data={"n": "2"}, files={"image": ("d.jpg", b"x", "image/jpeg")})
+    assert len(ok.json()["data"]) == 2
+
+
+# Test the fake storage accepts uploads on the Storage REST path and can fail with 503
+def test_fake_storage_upload_and_failure():
+    client = TestClient(build_fake_storage(FaultProfile(failure_rate=0.0)))
+    response = client.post("/storage/v1/object/dog-ai-images/a.webp", content=b"abc")
+    assert response.json()["Key"] == "dog-ai-images/a.webp"
+
+    failing = TestClient(build_fake_storage(FaultProfile(failure_rate=1.0, failure_status=503)))
+    assert failing.post("/storage/v1/object/dog-ai-images/a.webp", content=b"abc").status_code == 503
+
+
+# Test the stage breakdown only counts samples taken between the two scrapes
+def test_stage_breakdown_from_metrics_delta():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("gnb_stage_duration_seconds", "x", labels=("stage",))
+    histogram.observe(5.0, "model")
+    before = parse_stage_histograms(registry.render())
+    for seconds in (0.2, 0.3, 0.4, 2.0):
+        histogram.observe(seconds, "model")
+    histogram.observe(0.01, "decode")
+    after = parse_stage_histograms(registry.render())
+
+    breakdown = stage_breakdown(before, after)
+    assert breakdown["model"]["count"] == 4
+    assert breakdown["model"]["mean"] == 0.725
+    assert breakdown["model"]["p95_le"] == 2.5
+    assert breakdown["decode"]["count"] == 1
+
+
+# Test percentiles, error buckets and the baseline regression check
+def test_summary_and_baseline_compare():
+    samples = [(0.1 * i, 200, None) for i in range(1, 101)] + [(0.5, 503, "capacity"), (1.0, 0, "ReadTimeout")]
+    result = summarize(samples, elapsed=10.0, stages={}, config={})
+
+    assert result["ok"] == 100
+    assert result["errors"] == {"503": 1, "ReadTimeout": 1}
+    assert result["rps"] == 10.0
+    assert result["latency"]["p50"] == 5.1
+
+    slower = {**result, "latency": {**result["latency"], "p95": result["latency"]["p95"] * 1.2}}
+    changes, regressed = compare(slower, result, tolerance=0.1)
+    assert changes["latency.p95"] == 0.2 and regressed
+    assert compare(result, result, tolerance=0.1) == ({"latency.p50": 0.0, "latency.p95": 0.0,
+                                                        "latency.p99": 0.0, "rps": 0.0}, False)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+from ..services import metrics
+from ..services.metrics import Histogram, MetricsRegistry, STAGE_SECONDS, STAGE_ERRORS, span
+
+
+# Test histogram buckets are cumulative in the Prometheus text output
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("t_seconds", "test", labels=("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, "model")
+
+    lines = histogram.render()
+    assert 't_seconds_bucket{stage="model",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="model",le="1"} 3' in lines
+    assert 't_seconds_bucket{stage="model",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="model"} 4' in lines
+    assert histogram.sum("model") == pytest.approx(4.05)
+
+
+# Test the registry emits HELP/TYPE headers and dedupes by name
+def test_registry_render():
+    registry = MetricsRegistry()
+    counter = registry.counter("t_total", "things", labels=("kind",))
+    assert registry.counter("t_total", "things", labels=("kind",)) is counter
+    counter.inc("a")
+    counter.inc("a", amount=2)
+
+    text = registry.render()
+    assert "# HELP t_total things\n# TYPE t_total counter\n" in text
+    assert 't_total{kind="a"} 3' in text
+
+
+# Test a span records its duration and counts errors without swallowing them
+def test_span_records_duration_and_errors():
+    before = STAGE_SECONDS.count("unit-test")
+    with span("unit-test") as s:
+        pass
+    assert s.elapsed >= 0
+    assert STAGE_SECONDS.count("unit-test") == before + 1
+
+    errors = STAGE_ERRORS.value("unit-test")
+    with pytest.raises(ValueError):
+        with span("unit-test"):
+            raise ValueError("boom")
+    assert STAGE_ERRORS.value("unit-test") == errors + 1
+
+
+# Test span works as a decorator on sync and async functions
+def test_span_decorator():
+    @span("unit-sync")
+    def add(a, b):
+        return a + b
+
+    @span("unit-async")
+    async def double(a):
+        await asyncio.sleep(0)
+        return a * 2
+
+    assert add(1, 2) == 3
+    assert asyncio.run(double(4)) == 8
+    assert STAGE_SECONDS.count("unit-sync") >= 1
+    assert STAGE_SECONDS.count("unit-async") >= 1
+
+
+# Test JSON logs are one parseable line per span when enabled
+def test_span_json_logs(capsys):
+    with patch.object(metrics, "METRICS_JSON_LOGS", True):
+        with span("unit-log", route="generate"):
+            pass
+    record = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert record["event"] == "span"
+    assert record["stage"] == "unit-log"
+    assert record["route"] == "generate"
+    assert record["error"] is None
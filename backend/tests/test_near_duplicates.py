@@ -0,0 +1,103 @@
+import random
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFilter
+from ..services.near_duplicates import MultiIndexHash, NearDuplicateIndex, dhash_bytes, informative
+
+
+# Blurry blobs: enough structure for a meaningful hash, deterministic per seed
+def make_photo(seed: int, size=(800, 600)) -> Image.Image:
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (rng.randrange(256),) * 3)
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse([x, y, x + rng.randrange(40, 300), y + rng.randrange(40, 300)],
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    return image.filter(ImageFilter.GaussianBlur(3))
+
+
+def jpeg(image: Image.Image, quality=90) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+# Same downscale the model input gets
+def model_input_hash(image: Image.Image) -> int:
+    image = image.copy()
+    image.thumbnail((512, 512))
+    return dhash_bytes(jpeg(image, 85))
+
+
+# Test re-compressed, resized and slightly cropped copies stay within the threshold
+def test_dhash_survives_recompression_and_small_crops():
+    photo = make_photo(1)
+    original = model_input_hash(photo)
+    copies = [
+        Image.open(BytesIO(jpeg(photo, quality=30))),  # messaging-app recompression
+        photo.resize((640, 480)),
+        photo.crop((12, 9, 788, 591)),                  # ~1.5% crop
+    ]
+
+    for copy in copies:
+        assert (original ^ model_input_hash(copy)).bit_count() <= 6
+    assert (original ^ model_input_hash(make_photo(2))).bit_count() > 16
+
+
+# Test multi-index lookup agrees with a brute-force scan
+def test_multi_index_matches_linear_scan():
+    rng = random.Random(7)
+    table = MultiIndexHash()
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    for i, h in enumerate(hashes):
+        table.add(i, h, i)
+
+    for _ in range(200):
+        base = rng.choice(hashes)
+        query = base
+        for bit in rng.sample(range(64), rng.randrange(0, 10)):
+            query ^= 1 << bit
+        for radius in (0, 3, 6, 9):
+            expected = min(((h ^ query).bit_count(), i) for i, h in enumerate(hashes))
+            match = table.nearest(query, radius)
+            if expected[0] <= radius:
+                assert match is not None and match[0] == expected[0]
+            else:
+                assert match is None
+
+
+# Test lookups are scoped to the prompt namespace and honour the threshold
+def test_index_namespace_and_threshold():
+    index = NearDuplicateIndex(threshold=4)
+    h = model_input_hash(make_photo(3))
+    index.add("beach\x00webp", h, {"image_url": "https://cdn/beach.webp"})
+
+    near = h ^ 0b111  # 3 bits off
+    assert index.lookup("beach\x00webp", near) == (3, {"image_url": "https://cdn/beach.webp"})
+    assert index.lookup("park\x00webp", near) is None
+    assert index.lookup("beach\x00webp", h ^ 0b11111) is None
+    assert index.lookup("beach\x00webp", h ^ 0b11111, threshold=5) is not None
+
+
+# Test featureless hashes (flat images) are neither stored nor matched
+def test_flat_images_are_ignored():
+    index = NearDuplicateIndex()
+    flat = dhash_bytes(jpeg(Image.new("RGB", (64, 64), "orange")))
+
+    assert not informative(flat)
+    index.add("p", flat, {"image_url": "x"})
+    assert len(index) == 0
+    assert index.lookup("p", flat) is None
+
+
+# Test the oldest entries are evicted past max_entries
+def test_index_evicts_oldest():
+    rng = random.Random(3)
+    index = NearDuplicateIndex(threshold=0, max_entries=2)
+    hashes = [h for h in (rng.getrandbits(64) for _ in range(20)) if informative(h)][:3]
+    for i, h in enumerate(hashes):
+        index.add("p", h, {"n": i})
+
+    assert len(index) == 2
+    assert index.lookup("p", hashes[0]) is None
+    assert index.lookup("p", hashes[2]) == (0, {"n": 2})
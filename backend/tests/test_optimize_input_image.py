@@ -17,3 +17,65 @@ def test_optimize_image_compression():
     assert stats["compressed_size"] < stats["original_size"]
     assert "compression_ratio" in stats
     assert "compression_time" in stats
+
+
+def jpeg_bytes(size, exif=None, quality=90):
+    buffer = BytesIO()
+    img = Image.effect_noise(size, 40).convert("RGB")
+    if exif is not None:
+        img.save(buffer, format="JPEG", quality=quality, exif=exif)
+    else:
+        img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+# Test a small RGB JPEG goes to the model byte-for-byte
+def test_small_jpeg_passes_through():
+    original = jpeg_bytes((400, 300), quality=70)
+
+    optimized_buffer, stats = optimize_input_image(original)
+
+    assert stats["passthrough"] is True
+    assert optimized_buffer.getvalue() == original
+
+
+# Test EXIF-bearing uploads are re-encoded so camera/GPS metadata is dropped
+def test_jpeg_with_exif_is_reencoded():
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    original = jpeg_bytes((400, 300), exif=exif.tobytes(), quality=70)
+
+    optimized_buffer, stats = optimize_input_image(original)
+
+    assert stats["passthrough"] is False
+    assert "exif" not in Image.open(optimized_buffer).info
+
+
+# Test large JPEGs are decoded at reduced scale before the LANCZOS resize
+def test_large_jpeg_uses_draft_mode():
+    from unittest.mock import patch
+    from PIL import JpegImagePlugin
+
+    original = jpeg_bytes((2400, 1800))
+    draft = JpegImagePlugin.JpegImageFile.draft
+
+    with patch.object(JpegImagePlugin.JpegImageFile, "draft", autospec=True, side_effect=draft) as spy:
+        optimized_buffer, stats = optimize_input_image(original)
+
+    spy.assert_called()
+    assert spy.call_args_list[0].args[1:] == ("RGB", (512, 512))
+    assert Image.open(optimized_buffer).size == (512, 384)
+    assert stats["passthrough"] is False
+
+
+# Test the pixel guard rejects images over the budget before decoding them
+def test_pixel_budget_guard():
+    from unittest.mock import patch
+    import pytest
+    from ..services import optimize_images
+    from ..services.optimize_images import ImageTooLarge
+
+    original = jpeg_bytes((200, 200))
+    with patch.object(optimize_images, "MAX_INPUT_PIXELS", 10_000):
+        with pytest.raises(ImageTooLarge):
+            optimize_input_image(original)
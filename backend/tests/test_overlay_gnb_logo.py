@@ -18,3 +18,25 @@ def test_overlay_gnb_logo_adds_logo():
     result_img = Image.open(result)
     assert result_img.size == (500, 500)
     assert result_img.format == "PNG"
+
+# Test that the engine loads/resizes each logo once per base width
+def test_logo_engine_caches_resized_logo():
+    from ..services.logo_overlay import LogoOverlayEngine
+    engine = LogoOverlayEngine()
+
+    first = engine.apply(Image.new("RGBA", (1024, 1024), (0, 0, 0, 255)), logo="green")
+    engine.apply(Image.new("RGBA", (1024, 1024), (0, 0, 0, 255)), logo="green")
+    engine.apply(Image.new("RGBA", (512, 512), (0, 0, 0, 255)), logo="white")
+
+    info = engine.resized_logo.cache_info()
+    assert info.hits == 1 and info.misses == 2
+    # The bottom-right corner now carries logo pixels, the top-left doesn't
+    assert first.crop((690, 860, 1010, 990)).convert("L").getextrema()[1] > 0
+    assert first.crop((0, 0, 300, 300)).convert("L").getextrema() == (0, 0)
+
+# Test that unknown logo names are rejected
+def test_logo_engine_rejects_unknown_logo():
+    import pytest
+    from ..services.logo_overlay import logo_engine
+    with pytest.raises(ValueError):
+        logo_engine.apply(Image.new("RGBA", (100, 100)), logo="purple")
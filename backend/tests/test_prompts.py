@@ -0,0 +1,77 @@
+import json
+import os
+import pytest
+from ..utils.prompts import PromptCatalog, UnknownPromptKey, prompt_fingerprint, build_prompt
+
+PROMPTS = {
+    "clothing": {"Hoodie": "wearing a green hoodie", "Scarf": "wearing a scarf"},
+    "scenario": {"Beach": "on a sunny beach", "Park": "in a leafy park"},
+}
+
+
+@pytest.fixture
+def prompts_file(tmp_path):
+    path = tmp_path / "prompts.json"
+    path.write_text(json.dumps(PROMPTS))
+    return path
+
+
+def rewrite(path, data, bump: int = 1):
+    path.write_text(data if isinstance(data, str) else json.dumps(data))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 10**9))  # coarse-mtime filesystems
+
+
+# Test every combination (either side optional) is compiled up front
+def test_catalog_precompiles_all_combinations(prompts_file):
+    catalog = PromptCatalog(str(prompts_file))
+
+    assert len(catalog) == 3 * 3
+    compiled = catalog.get("Beach", "Hoodie")
+    assert compiled.text == "Same dog wearing a green hoodie clothes are on a sunny beach"
+    assert compiled.fingerprint == prompt_fingerprint(compiled.text)
+    assert catalog.get().text == "Same dog"
+    assert catalog.get(clothing="Scarf").text == "Same dog wearing a scarf"
+
+
+# Test unknown keys raise instead of falling back to the bare base prompt
+def test_catalog_rejects_unknown_keys(prompts_file):
+    catalog = PromptCatalog(str(prompts_file))
+
+    with pytest.raises(UnknownPromptKey, match="Unknown scenario 'beach'.*Beach, Park"):
+        catalog.get("beach", "Hoodie")
+    with pytest.raises(UnknownPromptKey, match="Unknown clothing 'Poncho'"):
+        catalog.get("Park", "Poncho")
+
+
+# Test the catalog picks up prompts.json edits, and keeps the old one on a broken edit
+def test_catalog_hot_reloads_on_mtime_change(prompts_file):
+    catalog = PromptCatalog(str(prompts_file), reload_interval=0)
+    before = catalog.get("Beach", "Hoodie")
+    version = catalog.version
+
+    rewrite(prompts_file, {**PROMPTS, "scenario": {**PROMPTS["scenario"], "Beach": "on a windy beach"}})
+    after = catalog.get("Beach", "Hoodie")
+    assert after.text.endswith("on a windy beach")
+    assert after.fingerprint != before.fingerprint
+    assert catalog.version != version
+    assert catalog.reloads == 1
+
+    rewrite(prompts_file, "{not json", bump=2)
+    assert catalog.get("Beach", "Hoodie") == after
+
+
+# Test the reload check is throttled to reload_interval
+def test_catalog_reload_interval(prompts_file):
+    catalog = PromptCatalog(str(prompts_file), reload_interval=3600)
+    catalog.get("Beach", "Hoodie")
+
+    rewrite(prompts_file, {**PROMPTS, "clothing": {"Hoodie": "in a red hoodie"}})
+    assert catalog.get("Beach", "Hoodie").text.startswith("Same dog wearing a green hoodie")
+
+
+# Test fingerprints ignore whitespace and the shipped catalog covers the UI's options
+def test_prompt_fingerprint_and_shipped_catalog():
+    assert prompt_fingerprint("Same dog  in a\nhoodie") == prompt_fingerprint("Same dog in a hoodie")
+    assert prompt_fingerprint("Same dog in a hoodie") != prompt_fingerprint("Same dog in a scarf")
+    assert "GNB" in build_prompt("Lemon Fresh Morning", "Hoodie")
@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from ..services.providers import (
+    FakeProvider, ImageProvider, LatencyTracker, ProviderError, ProviderRouter, build_provider
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# Test that the tracker reports percentiles over successes and error rate over all calls
+def test_latency_tracker_stats():
+    tracker = LatencyTracker(window=100)
+    for latency in range(1, 101):
+        tracker.record(latency / 100, ok=True)
+    tracker.record(5.0, ok=False)
+
+    assert tracker.p50 == pytest.approx(0.51)
+    assert tracker.p95 == pytest.approx(0.96)
+    assert tracker.samples == 100  # window keeps the last 100 outcomes
+    assert tracker.error_rate == pytest.approx(0.01)
+
+
+# Test that config order wins until there are enough samples, then p50 does
+def test_router_ranks_by_p50_once_warmed_up():
+    slow = FakeProvider("slow", median=0.02)
+    fast = FakeProvider("fast", median=0.001)
+    router = ProviderRouter([slow, fast], min_samples=3)
+
+    assert [p.name for p in router.ranked()] == ["slow", "fast"]
+    for _ in range(3):
+        router.trackers["slow"].record(0.02, ok=True)
+        router.trackers["fast"].record(0.001, ok=True)
+    assert [p.name for p in router.ranked()] == ["fast", "slow"]
+
+
+# Test that a provider over the error threshold drops behind healthy ones
+def test_router_demotes_unhealthy_provider():
+    flaky = FakeProvider("flaky")
+    steady = FakeProvider("steady")
+    router = ProviderRouter([flaky, steady], min_samples=4, max_error_rate=0.5)
+    for ok in (True, False, False, False):
+        router.trackers["flaky"].record(0.001, ok=ok)
+    for _ in range(4):
+        router.trackers["steady"].record(0.5, ok=True)
+
+    assert router.ranked()[0].name == "steady"
+
+
+# Test that a failing primary fails over to the backup
+def test_router_fails_over():
+    broken = FakeProvider("broken", median=0.001, error_rate=1.0)
+    backup = FakeProvider("backup", median=0.001, image=b"img")
+    router = ProviderRouter([broken, backup])
+
+    result = run(router.edit(b"input", "prompt", n=2))
+
+    assert result.provider == "backup"
+    assert result.failover is True
+    assert result.images == [b"img", b"img"]
+    assert router.stats()["broken"]["error_rate"] == 1.0
+
+
+# Test that the error surfaces when every provider fails
+def test_router_raises_when_all_fail():
+    router = ProviderRouter([
+        FakeProvider("a", median=0.001, error_rate=1.0),
+        FakeProvider("b", median=0.001, error_rate=1.0),
+    ])
+    with pytest.raises(ProviderError):
+        run(router.edit(b"input", "prompt"))
+
+
+# Test that a primary stuck past its p95 is hedged and the faster backup wins
+def test_router_hedges_slow_primary():
+    primary = FakeProvider("primary", median=0.5, image=b"primary")
+    backup = FakeProvider("backup", median=0.01, image=b"backup")
+    router = ProviderRouter([primary, backup], hedge=True, min_samples=5)
+    for _ in range(5):
+        router.trackers["primary"].record(0.02, ok=True)  # p95 = 20 ms
+
+    result = run(router.edit(b"input", "prompt"))
+
+    assert result.provider == "backup"
+    assert result.hedged is True
+    assert result.images == [b"backup"]
+    assert primary.calls == 1 and backup.calls == 1
+    # The cancelled primary is neither a sample nor an error
+    assert router.trackers["primary"].samples == 5
+
+
+# Test that cancelling the caller mid-hedge cancels every provider call it started
+def test_router_cancelled_during_hedge_leaves_no_tasks():
+    primary = FakeProvider("primary", median=0.5)
+    backup = FakeProvider("backup", median=0.5)
+    router = ProviderRouter([primary, backup], hedge=True, default_hedge_delay=0.2)
+
+    async def scenario():
+        for wait in (0.05, 0.3):  # inside the hedge delay, then after the backup started
+            caller = asyncio.create_task(router.edit(b"input", "prompt"))
+            await asyncio.sleep(wait)
+            caller.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+            await asyncio.sleep(0)
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    run(scenario())
+    assert primary.calls == 2 and backup.calls == 1
+    assert router.trackers["primary"].samples == 0
+    assert router.trackers["backup"].samples == 0
+
+
+# Test that a primary answering inside its p95 never triggers the hedge
+def test_router_skips_hedge_when_primary_is_fast():
+    primary = FakeProvider("primary", median=0.001)
+    backup = FakeProvider("backup", median=0.001)
+    router = ProviderRouter([primary, backup], hedge=True, default_hedge_delay=1.0)
+
+    result = run(router.edit(b"input", "prompt"))
+
+    assert result.provider == "primary"
+    assert result.hedged is False
+    assert backup.calls == 0
+
+
+# Test that unknown provider names are rejected at startup
+def test_build_provider_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        build_provider("dalle-9")
+
+
+# Test a provider without edit() fails when created, not on its first request
+def test_provider_without_edit_fails_at_creation():
+    class Nameless(ImageProvider):
+        name = "nameless"
+
+    with pytest.raises(TypeError):
+        Nameless()
@@ -0,0 +1,36 @@
+# tests/test_renditions.py
+import asyncio
+from io import BytesIO
+from unittest.mock import AsyncMock
+from PIL import Image
+from ..services.renditions import (
+    rendition_widths,
+    encode_renditions,
+    upload_renditions,
+    build_srcset,
+)
+
+# Test that widths never upscale past the source image
+def test_rendition_widths_clamp_to_source():
+    assert rendition_widths(1024) == [256, 512, 1024]
+    assert rendition_widths(600) == [256, 512, 600]
+    assert rendition_widths(200) == [200]
+
+# Test that every rendition is encoded at its width and uploaded in parallel
+def test_encode_and_upload_renditions():
+    image = Image.new("RGBA", (1024, 1024), (30, 120, 60, 255))
+    upload = AsyncMock(side_effect=lambda data, extension: f"https://cdn/{len(data)}.{extension}")
+
+    async def run():
+        renditions = await encode_renditions(image, "webp")
+        return renditions, await upload_renditions(renditions, upload=upload)
+
+    renditions, urls = asyncio.run(run())
+
+    assert sorted(renditions) == [256, 512, 1024]
+    for width, encoded in renditions.items():
+        with Image.open(BytesIO(encoded.data)) as decoded:
+            assert decoded.size == (width, width)
+    assert upload.await_count == 3
+    assert build_srcset(urls).endswith(f"{urls[1024]} 1024w")
+    assert build_srcset(urls).startswith(f"{urls[256]} 256w, ")
@@ -0,0 +1,265 @@
+import asyncio
+import random
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+import httpx
+import pytest
+from ..services import resilience
+from ..services.resilience import (
+    CircuitBreaker, CircuitOpen, DeadlineExceeded, Upstream, current_deadline, deadline_scope, is_transient
+)
+from ..services.providers import FakeProvider, ProviderError, ProviderRouter
+from ..services.supabase_uploader import upload_image_to_supabase_async
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+# Fault-injecting fake upstream: plays back a script of outcomes, one per call.
+# An exception is raised, a float sleeps that long first, anything else is returned.
+class ScriptedUpstream:
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        outcome = self.script.pop(0) if self.script else "ok"
+        if isinstance(outcome, float):
+            await asyncio.sleep(outcome)
+            return "slow"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def fast_upstream(name="test", **kwargs) -> Upstream:
+    return Upstream(name, base_delay=0.01, max_delay=0.05, rng=random.Random(1), **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# Test which failures count as transient
+def test_transient_classification():
+    assert is_transient(StatusError(503))
+    assert is_transient(StatusError(429))
+    assert is_transient(httpx.ConnectError("refused"))
+    assert is_transient(asyncio.TimeoutError())
+    assert not is_transient(StatusError(400))
+    assert not is_transient(ValueError("bad input"))
+
+
+# Test transient failures are retried until one succeeds
+def test_retries_transient_failures():
+    fake = ScriptedUpstream(StatusError(502), httpx.ReadError("reset"), "ok")
+    assert run(fast_upstream(attempts=3).call(fake)) == "ok"
+    assert fake.calls == 3
+
+
+# Test client errors are raised at once and leave the breaker alone
+def test_does_not_retry_client_errors():
+    upstream = fast_upstream(breaker=CircuitBreaker("test", failure_threshold=1))
+    fake = ScriptedUpstream(StatusError(400))
+    with pytest.raises(StatusError):
+        run(upstream.call(fake))
+    assert fake.calls == 1
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+# Test backoff grows exponentially, stays under the cap, and is jittered
+def test_backoff_is_capped_exponential_with_jitter():
+    upstream = Upstream("test", base_delay=0.5, max_delay=4, rng=random.Random(3))
+    error = StatusError(503)
+    samples = {attempt: [upstream.backoff(attempt, error) for _ in range(200)] for attempt in range(6)}
+
+    assert all(0 <= d <= 0.5 for d in samples[0])
+    assert all(0 <= d <= 4 for d in samples[5])
+    assert max(samples[3]) > 2 > max(samples[0])
+    assert len(set(samples[2])) > 100  # jittered, not synchronized
+
+
+# Test a Retry-After header is a floor for the next delay
+def test_backoff_honours_retry_after():
+    error = httpx.HTTPStatusError(
+        "429", request=httpx.Request("POST", "http://x"),
+        response=httpx.Response(429, headers={"retry-after": "2"})
+    )
+    assert fast_upstream().backoff(0, error) == 2.0
+
+
+# Test no retry is attempted when the backoff wouldn't fit in the remaining budget
+def test_retries_stop_when_budget_is_spent():
+    upstream = Upstream("test", attempts=5, base_delay=1.0, max_delay=1.0, rng=random.Random(2))
+    upstream.backoff = lambda attempt, error: 0.5
+    fake = ScriptedUpstream(*[StatusError(503)] * 5)
+
+    async def scenario():
+        with deadline_scope(0.8) as deadline:
+            with pytest.raises(StatusError):
+                await upstream.call(fake)
+            return deadline.retries
+
+    start = time.perf_counter()
+    retries = run(scenario())
+    assert fake.calls == 2 and retries == 1  # second backoff would overrun the deadline
+    assert time.perf_counter() - start < 0.8
+
+
+# Test a hung upstream is cut off at the deadline with a 504
+def test_deadline_cuts_off_slow_attempt():
+    fake = ScriptedUpstream(5.0)
+
+    async def scenario():
+        with deadline_scope(0.1):
+            await fast_upstream().call(fake)
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded) as info:
+        run(scenario())
+    assert info.value.status_code == 504
+    assert time.perf_counter() - start < 1
+
+
+# Test a timeout caused by the request deadline doesn't count against the upstream's breaker
+def test_deadline_timeout_does_not_trip_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    upstream = fast_upstream(attempt_timeout=5, breaker=breaker)
+
+    async def scenario():
+        with deadline_scope(0.05):
+            await upstream.call(ScriptedUpstream(1.0))
+
+    with pytest.raises(DeadlineExceeded):
+        run(scenario())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # ...while a timeout from attempt_timeout still does
+    upstream = fast_upstream(attempts=1, attempt_timeout=0.05, breaker=breaker)
+    with pytest.raises(asyncio.TimeoutError):
+        run(upstream.call(ScriptedUpstream(1.0)))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+# Test the deadline is visible in tasks spawned inside the scope
+def test_deadline_propagates_to_tasks():
+    async def scenario():
+        with deadline_scope(30) as deadline:
+            seen = await asyncio.create_task(asyncio.sleep(0, result=current_deadline()))
+        return seen is deadline, current_deadline()
+
+    assert run(scenario()) == (True, None)
+
+
+# Test the breaker opens after consecutive failures, fails fast, then recovers via one probe
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.05)
+    upstream = fast_upstream(attempts=1, breaker=breaker)
+    fake = ScriptedUpstream(*[StatusError(503)] * 3)
+
+    for _ in range(3):
+        with pytest.raises(StatusError):
+            run(upstream.call(fake))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpen) as info:
+        run(upstream.call(fake))
+    assert fake.calls == 3  # failed fast, upstream not called
+    assert info.value.headers["Retry-After"] == "1"
+
+    time.sleep(0.06)
+    assert run(upstream.call(fake)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+# Test a failed half-open probe re-opens the circuit straight away
+def test_circuit_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+# Test a cancelled half-open probe frees the probe slot without deciding the state
+def test_cancelled_probe_does_not_wedge_half_open_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    upstream = fast_upstream(attempts=1, breaker=breaker)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    async def scenario():
+        probe = asyncio.create_task(upstream.call(ScriptedUpstream(5.0)))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert breaker.state == CircuitBreaker.HALF_OPEN  # neither a success nor a failure
+        return [await upstream.call(ScriptedUpstream()) for _ in range(3)]
+
+    assert run(scenario()) == ["ok"] * 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+# Test rate limiting is retried but never trips the breaker
+def test_rate_limits_do_not_open_circuit():
+    upstream = fast_upstream(attempts=4, breaker=CircuitBreaker("test", failure_threshold=2))
+    fake = ScriptedUpstream(StatusError(429), StatusError(429), StatusError(429), "ok")
+    assert run(upstream.call(fake)) == "ok"
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+# Test the router retries a transient provider error, and fails over once its circuit is open
+def test_router_retries_then_routes_around_open_circuit():
+    flaky = FakeProvider("flaky", median=0.001, error_rate=1.0, error_status=503, seed=1)
+    backup = FakeProvider("backup", median=0.001)
+    upstreams = {
+        "flaky": fast_upstream("flaky", breaker=CircuitBreaker("flaky", failure_threshold=3, reset_timeout=60)),
+        "backup": fast_upstream("backup"),
+    }
+    router = ProviderRouter([flaky, backup])
+
+    with patch.dict(resilience._upstreams, upstreams):
+        first = run(router.edit(b"img", "prompt"))
+        assert first.failover and flaky.calls == 3
+        second = run(router.edit(b"img", "prompt"))
+
+    assert second.provider == "backup" and not second.failover
+    assert flaky.calls == 3  # open circuit: ranked last, not called again
+
+
+# Test Supabase uploads retry a transient storage error
+@patch("backend.services.supabase_uploader.get_async_supabase", new_callable=AsyncMock)
+def test_storage_upload_retries(mock_get_client):
+    bucket = MagicMock()
+    bucket.upload = AsyncMock(side_effect=[httpx.ConnectError("refused"), MagicMock(error=None)])
+    client = MagicMock()
+    client.storage.from_.return_value = bucket
+    mock_get_client.return_value = client
+
+    with patch.dict(resilience._upstreams, {"storage": fast_upstream("storage")}):
+        url = run(upload_image_to_supabase_async(b"img", extension="webp"))
+
+    assert url.endswith(".webp")
+    assert bucket.upload.await_count == 2
+    # Each attempt writes a fresh object name
+    names = [call.kwargs["path"] for call in bucket.upload.await_args_list]
+    assert names[0] != names[1]
+
+
+# Test non-transient provider errors still surface unchanged
+def test_provider_error_without_status_is_not_retried():
+    broken = FakeProvider("broken", median=0.001, error_rate=1.0)
+    with patch.dict(resilience._upstreams, {"broken": fast_upstream("broken")}):
+        with pytest.raises(ProviderError):
+            run(ProviderRouter([broken]).edit(b"img", "prompt"))
+    assert broken.calls == 1
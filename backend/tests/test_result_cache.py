@@ -0,0 +1,61 @@
+# tests/test_result_cache.py
+import time
+import pytest
+from ..services.result_cache import (
+    CacheBackend,
+    MemoryCacheBackend,
+    SQLiteCacheBackend,
+    TieredCacheBackend,
+    ResultCache,
+    make_cache_key,
+)
+
+# Test that the key ignores prompt whitespace but not image bytes
+def test_make_cache_key_normalizes_prompt():
+    key = make_cache_key(b"img", "Same dog  wearing a scarf")
+    assert key == make_cache_key(b"img", " Same dog wearing a scarf ")
+    assert key != make_cache_key(b"img2", "Same dog wearing a scarf")
+    assert key != make_cache_key(b"img", "Same dog wearing a hoodie")
+
+# Test LRU eviction and TTL expiry in the memory backend
+def test_memory_backend_evicts_and_expires():
+    backend = MemoryCacheBackend(max_entries=2, ttl=60)
+    backend.set("a", {"image_url": "a"})
+    backend.set("b", {"image_url": "b"})
+    backend.get("a")  # "a" is now most recently used
+    backend.set("c", {"image_url": "c"})
+
+    assert backend.get("b") is None
+    assert backend.get("a") == {"image_url": "a"}
+
+    backend.set("short", {"image_url": "x"}, ttl=0)
+    time.sleep(0.01)
+    assert backend.get("short") is None
+
+# Test that the SQLite tier survives a new backend instance (i.e. a restart)
+def test_sqlite_backend_persists(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteCacheBackend(path).set("k", {"image_url": "https://x/k.png"})
+
+    assert SQLiteCacheBackend(path).get("k") == {"image_url": "https://x/k.png"}
+
+# Test that disk hits are promoted to memory and counted
+def test_tiered_cache_promotes_and_counts(tmp_path):
+    memory = MemoryCacheBackend()
+    disk = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+    disk.set("k", {"image_url": "u"})
+    cache = ResultCache(TieredCacheBackend(memory, disk))
+
+    assert cache.get("missing") is None
+    assert cache.get("k") == {"image_url": "u"}
+    assert memory.get("k") == {"image_url": "u"}
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+# Test a backend missing part of the interface fails when created, not on first use
+def test_incomplete_backend_fails_at_creation():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
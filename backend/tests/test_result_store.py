@@ -0,0 +1,94 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock
+from ..services.image_encoder import EncodedImage
+from ..services.result_store import ResultStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def renditions(size=1000):
+    return {
+        256: EncodedImage(b"a" * (size // 4), "webp", 80, 1, 0.0),
+        1024: EncodedImage(b"b" * size, "webp", 80, 1, 0.0),
+    }
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr("backend.services.result_store.RESULT_UPLOAD_BACKOFF", 0.001)
+
+
+# Test a stored result exposes local and inline URLs before any upload
+def test_put_serves_local_and_data_urls():
+    stored = ResultStore().put(renditions())
+
+    assert stored.status == "pending"
+    assert stored.local_urls()[1024] == f"/api/results/{stored.id}/image/1024"
+    assert stored.data_url().startswith("data:image/webp;base64,")
+    assert stored.to_dict() == {"id": stored.id, "status": "pending", "attempts": 0, "error": None}
+
+
+# Test a flaky upload is retried with backoff and the permanent URLs recorded
+def test_deliver_retries_then_succeeds():
+    store = ResultStore()
+    stored = store.put(renditions(), cache_key="k")
+    # 256 fails once, 1024 goes through first time and isn't re-sent
+    upload = AsyncMock(side_effect=[Exception("503"), "https://cdn/1024.webp", "https://cdn/256.webp"])
+    delivered = []
+
+    run(store.deliver(stored.id, upload=upload, on_uploaded=delivered.append))
+
+    body = store.get(stored.id).to_dict()
+    assert body["status"] == "uploaded"
+    assert body["attempts"] == 2
+    assert body["image_url"] == "https://cdn/1024.webp"
+    assert body["srcset"] == "https://cdn/256.webp 256w, https://cdn/1024.webp 1024w"
+    assert upload.call_count == 3
+    assert delivered == [stored]
+
+
+# Test the upload gives up after the configured attempts and says so
+def test_deliver_gives_up(monkeypatch):
+    monkeypatch.setattr("backend.services.result_store.RESULT_UPLOAD_ATTEMPTS", 3)
+    store = ResultStore()
+    stored = store.put(renditions())
+    upload = AsyncMock(side_effect=Exception("storage down"))
+
+    run(store.deliver(stored.id, upload=upload))
+
+    assert stored.status == "failed"
+    assert stored.attempts == 3
+    assert "storage down" in stored.error
+
+
+# Test scheduling the same delivery twice uploads once
+def test_deliver_is_idempotent():
+    store = ResultStore()
+    stored = store.put(renditions())
+    upload = AsyncMock(return_value="https://cdn/x.webp")
+
+    async def scenario():
+        await asyncio.gather(store.deliver(stored.id, upload=upload), store.deliver(stored.id, upload=upload))
+
+    run(scenario())
+    assert upload.call_count == 2  # one call per rendition, not per delivery
+
+
+# Test finished results expire or are evicted over the byte budget; pending ones stay
+def test_eviction_keeps_pending_results():
+    store = ResultStore(ttl=60, max_bytes=3000)
+    pending = store.put(renditions())
+    done = store.put(renditions())
+    done.status, done.finished_at = "uploaded", time.time()
+    store.put(renditions())  # 3 × 1250 bytes > 3000
+
+    assert store.get(done.id) is None
+    assert store.get(pending.id) is pending
+
+    expired = store.put(renditions(10))
+    expired.status, expired.finished_at = "uploaded", time.time() - 120
+    assert store.get(expired.id) is None
@@ -0,0 +1,168 @@
+import base64
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+from io import BytesIO
+from PIL import Image
+from backend.main import app
+from backend.services.result_store import result_store
+from backend.services.single_flight import idempotency_store
+from .conftest import AI_IMAGE_B64, make_image_bytes
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr("backend.services.result_store.RESULT_UPLOAD_BACKOFF", 0.001)
+
+
+def post_generate(**data):
+    return client.post(
+        "/api/generate",
+        files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")},
+        data=data
+    )
+
+
+# Test local delivery answers with an in-memory URL, then uploads in the background
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_local_delivery_then_permanent_url(mock_openai_edit, mock_upload):
+    mock_openai_edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+
+    response = post_generate(delivery="local")
+
+    assert response.status_code == 200
+    body = response.json()
+    result_id = body["result_id"]
+    assert body["image_url"] == f"/api/results/{result_id}/image/256"
+    assert body["performance"]["upload_time"] == 0.0
+    assert body["performance"]["delivery"] == "local"
+
+    # The image is served from memory
+    image = client.get(body["image_url"])
+    assert image.status_code == 200
+    assert image.headers["content-type"] == "image/webp"
+    assert Image.open(BytesIO(image.content)).size == (256, 256)
+
+    # The background upload ran after the response
+    status = client.get(body["result_url"]).json()
+    assert status["status"] == "uploaded"
+    assert status["image_url"] == "https://fake.supabase.co/image.webp"
+
+    # ...and later identical requests get the permanent URL from the cache
+    repeat = post_generate()
+    assert repeat.json()["image_url"] == "https://fake.supabase.co/image.webp"
+    assert mock_openai_edit.call_count == 1
+
+
+# Test inline delivery returns the image itself as a data URL
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_inline_delivery_returns_data_url(mock_openai_edit, mock_upload):
+    mock_openai_edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+
+    body = post_generate(delivery="inline").json()
+
+    assert body["image_url"].startswith("data:image/webp;base64,")
+    data = base64.b64decode(body["image_url"].split(",", 1)[1])
+    assert Image.open(BytesIO(data)).size == (256, 256)
+
+
+# Test the idempotency store keeps a reference to an inline result, not the data URL
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_inline_delivery_is_not_stored_for_replay(mock_openai_edit, mock_upload):
+    mock_openai_edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+
+    def post():
+        return client.post(
+            "/api/generate",
+            files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")},
+            data={"delivery": "inline"},
+            headers={"Idempotency-Key": "inline-replay"}
+        )
+
+    with patch("backend.routes.generate.result_store.deliver", new_callable=AsyncMock):
+        first = post().json()
+    assert first["image_url"].startswith("data:")
+    assert not idempotency_store.get("inline-replay")["image_url"].startswith("data:")
+
+    replay = post()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["result_url"] == first["result_url"]
+    assert client.get(replay.json()["image_url"]).headers["content-type"] == "image/webp"
+    assert mock_openai_edit.call_count == 1
+
+
+# Test a deferred replay switches to the permanent URLs once the upload is done,
+# since the result store drops the local ones after RESULT_STORE_TTL
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_deferred_replay_outlives_the_result_store(mock_openai_edit, mock_upload, monkeypatch):
+    mock_openai_edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+
+    def post():
+        return client.post(
+            "/api/generate",
+            files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")},
+            data={"delivery": "local"},
+            headers={"Idempotency-Key": "local-replay"}
+        )
+
+    first = post().json()
+    monkeypatch.setattr(result_store, "ttl", 0)
+    assert result_store.get(first["result_id"]) is None  # local URLs are gone
+
+    replay = post()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    body = replay.json()
+    assert body["image_url"] == "https://fake.supabase.co/image.webp"
+    assert body["renditions"] == {"256": "https://fake.supabase.co/image.webp"}
+    assert "result_url" not in body
+    assert mock_openai_edit.call_count == 1
+
+
+# Test a deferred replay whose upload never finished expires with the result store entry
+@patch("backend.routes.generate.upload_image_to_supabase_async", side_effect=Exception("Supabase down"))
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_failed_upload_replay_expires_with_the_result(mock_openai_edit, mock_upload, monkeypatch):
+    mock_openai_edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+    monkeypatch.setattr(result_store, "ttl", 0)
+
+    for _ in range(2):
+        response = client.post(
+            "/api/generate",
+            files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")},
+            data={"delivery": "local"},
+            headers={"Idempotency-Key": "failed-replay"}
+        )
+        assert "Idempotent-Replayed" not in response.headers
+    assert mock_openai_edit.call_count == 2
+
+
+# Test a failing upload doesn't fail the request; the status endpoint reports it
+@patch("backend.routes.generate.upload_image_to_supabase_async", side_effect=Exception("Supabase down"))
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_background_upload_failure_is_reported(mock_openai_edit, mock_upload):
+    mock_openai_edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+
+    response = post_generate(delivery="local")
+
+    assert response.status_code == 200
+    status = client.get(response.json()["result_url"]).json()
+    assert status["status"] == "failed"
+    assert "Supabase down" in status["error"]
+    assert mock_upload.call_count > 1  # retried
+
+
+# Test unknown delivery modes and result ids
+def test_unknown_delivery_and_result():
+    assert post_generate(delivery="carrier-pigeon").status_code == 422
+    assert client.get("/api/results/nope").status_code == 404
+    assert client.get("/api/results/nope/image/256").status_code == 404
@@ -0,0 +1,89 @@
+# tests/test_single_flight.py
+import asyncio
+from ..services.single_flight import SingleFlight
+
+# Test that concurrent callers with the same key share one execution
+def test_single_flight_shares_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["result"] * 5
+    assert sum(shared for _, shared in results) == 4
+    assert not flight.in_flight("key")
+
+# Test that a failure reaches every waiter and the key is released afterwards
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*[flight.do("key", boom) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not flight.in_flight("key")
+
+    async def ok():
+        return "recovered"
+
+    assert asyncio.run(flight.do("key", ok)) == ("recovered", False)
+
+# Test cancelling the caller that started the work leaves the other callers' result intact
+def test_single_flight_survives_leader_cancellation():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        return leader.cancelled(), await follower
+
+    leader_cancelled, result = asyncio.run(run())
+
+    assert leader_cancelled
+    assert result == ("result", True)
+    assert not flight.in_flight("key")
+
+# Test the work itself is cancelled once every caller has gone away
+def test_single_flight_cancels_abandoned_work():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+
+    async def run():
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.06)
+
+    asyncio.run(run())
+
+    assert finished == []
+    assert not flight.in_flight("key")
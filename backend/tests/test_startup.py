@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def run_fresh(code: str, **env) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT, env={**os.environ, **env}, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# Test the serverless entry imports without loading the heavy upstream SDKs
+def test_entry_import_defers_sdks():
+    loaded = run_fresh(
+        "import json, sys; import backend.vercel_python_entry; "
+        "print(json.dumps([m for m in ('openai', 'supabase', 'pandas', 'sqlalchemy') if m in sys.modules]))"
+    )
+    assert loaded == []
+
+
+# Test the app imports even before Supabase/OpenAI credentials are configured
+def test_entry_import_without_credentials():
+    result = run_fresh(
+        "import json, os\n"
+        "for name in ('OPENAI_API_KEY', 'SUPABASE_URL', 'SUPABASE_API_KEY'): os.environ.pop(name, None)\n"
+        "from backend.main import app\n"
+        "print(json.dumps({'routes': len(app.routes)}))"
+    )
+    assert result["routes"] > 0
@@ -1,13 +1,15 @@
 # tests/test_supabase_uploader.py
-from unittest.mock import patch, MagicMock
-from ..services.supabase_uploader import upload_image_to_supabase
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from ..services.supabase_uploader import upload_image_to_supabase, upload_image_to_supabase_async, TempObjectBatch
 
 # Test successful image upload to Supabase
-@patch("backend.services.supabase_uploader.supabase")
-def test_upload_image_success(mock_supabase):
+@patch("backend.services.supabase_uploader.SUPABASE_URL", "https://project.supabase.co")
+@patch("backend.services.supabase_uploader.get_supabase")
+def test_upload_image_success(mock_get_supabase):
     mock_upload = MagicMock()
     mock_upload.upload.return_value = MagicMock(error=None)
-    mock_supabase.storage.from_.return_value = mock_upload
+    mock_get_supabase.return_value.storage.from_.return_value = mock_upload
 
     result = upload_image_to_supabase(b"fake-image-bytes", extension="jpeg")
 
@@ -15,13 +17,66 @@ def test_upload_image_success(mock_supabase):
     assert result.endswith(".jpeg")
 
 # Test handling of missing environment variables
-@patch("backend.services.supabase_uploader.supabase")
-def test_upload_image_failure(mock_supabase):
+@patch("backend.services.supabase_uploader.get_supabase")
+def test_upload_image_failure(mock_get_supabase):
     mock_upload = MagicMock()
     mock_upload.upload.return_value = MagicMock(error="Something went wrong")
-    mock_supabase.storage.from_.return_value = mock_upload
+    mock_get_supabase.return_value.storage.from_.return_value = mock_upload
 
     try:
         upload_image_to_supabase(b"bad", extension="png")
     except Exception as e:
         assert "Upload failed" in str(e)
+
+# Test the async upload path awaits the async storage client
+@patch("backend.services.supabase_uploader.SUPABASE_URL", "https://project.supabase.co")
+@patch("backend.services.supabase_uploader.get_async_supabase", new_callable=AsyncMock)
+def test_upload_image_async_success(mock_get_client):
+    mock_bucket = MagicMock()
+    mock_bucket.upload = AsyncMock(return_value=MagicMock(error=None))
+    mock_client = MagicMock()
+    mock_client.storage.from_.return_value = mock_bucket
+    mock_get_client.return_value = mock_client
+
+    result = asyncio.run(upload_image_to_supabase_async(b"fake-image-bytes", extension="jpeg"))
+
+    assert result.startswith("http")
+    assert result.endswith(".jpeg")
+    mock_bucket.upload.assert_awaited_once()
+
+# Test temp objects are removed with a single batched remove() call
+@patch("backend.services.supabase_uploader.upload_image_to_supabase_async", new_callable=AsyncMock)
+@patch("backend.services.supabase_uploader.get_async_supabase", new_callable=AsyncMock)
+def test_temp_objects_flush_in_one_batch(mock_get_client, mock_upload):
+    mock_upload.side_effect = [
+        f"http://x/storage/v1/object/public/dog-ai-images/tmp/{i}.jpeg" for i in range(3)
+    ]
+    mock_bucket = MagicMock()
+    mock_bucket.remove = AsyncMock()
+    mock_client = MagicMock()
+    mock_client.storage.from_.return_value = mock_bucket
+    mock_get_client.return_value = mock_client
+    batch = TempObjectBatch(batch_size=3, interval=3600)
+
+    async def scenario():
+        for _ in range(2):
+            await batch.upload(b"img")
+        assert not batch.due()
+        await batch.upload(b"img")
+        assert batch.due()
+        return await batch.flush_if_due()
+
+    assert asyncio.run(scenario()) == 3
+    mock_bucket.remove.assert_awaited_once_with(["tmp/0.jpeg", "tmp/1.jpeg", "tmp/2.jpeg"])
+    assert batch.pending == []
+
+
+# Test a failed cleanup keeps the paths for the next flush
+@patch("backend.services.supabase_uploader.get_async_supabase", new_callable=AsyncMock)
+def test_temp_objects_flush_failure_requeues(mock_get_client):
+    mock_get_client.side_effect = Exception("network down")
+    batch = TempObjectBatch()
+    batch.pending = ["tmp/a.jpeg"]
+
+    assert asyncio.run(batch.flush()) == 0
+    assert batch.pending == ["tmp/a.jpeg"]
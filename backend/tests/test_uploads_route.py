@@ -0,0 +1,111 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+from io import BytesIO
+from PIL import Image
+from backend.main import app
+from backend.services.direct_uploads import input_cache
+from .conftest import AI_IMAGE_B64, make_image_bytes
+from .fake_storage import FakeStorage
+
+client = TestClient(app)
+
+
+# Every test gets a fresh stand-in storage server and an empty input cache
+@pytest.fixture
+def storage():
+    fake = FakeStorage()
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://x/storage/v1")
+    input_cache.clear()
+    with patch.multiple("backend.services.supabase_uploader", get_storage_http=lambda: http, SUPABASE_URL="http://x"):
+        yield fake
+    input_cache.clear()
+
+
+# Client side of the flow: sign, then PUT the file straight to storage
+def upload_direct(storage: FakeStorage, data: bytes, extension="jpg") -> str:
+    signed = client.post("/api/uploads", json={"extension": extension}).json()
+    assert signed["method"] == "PUT"
+    path = signed["upload_url"].split("/storage/v1", 1)[1]
+    response = TestClient(storage.app).put(f"/storage/v1{path}", content=data)
+    assert response.status_code == 200
+    return signed["key"]
+
+
+# Test signing returns a fresh key under uploads/ and a usable URL
+def test_create_upload_signs_a_new_key(storage):
+    response = client.post("/api/uploads")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["key"].startswith("uploads/") and body["key"].endswith(".jpg")
+    assert body["upload_url"].startswith("http://x/storage/v1/object/upload/sign/dog-ai-images/uploads/")
+    assert body["token"] in storage.tokens
+
+
+# Test unknown extensions are refused
+def test_create_upload_rejects_bad_extension(storage):
+    response = client.post("/api/uploads", json={"extension": "exe"})
+    assert response.status_code == 422
+
+
+# Test /generate reads a directly uploaded photo once and caches its model input
+@patch("backend.routes.generate.upload_image_to_supabase_async")
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_from_upload_key_reads_storage_once(mock_openai_edit, mock_upload, storage):
+    mock_openai_edit.return_value = MagicMock(data=[MagicMock(b64_json=AI_IMAGE_B64)])
+    mock_upload.return_value = "https://fake.supabase.co/image.webp"
+    key = upload_direct(storage, make_image_bytes(size=(1600, 1200)))
+
+    first = client.post("/api/generate", data={"key": key})
+    second = client.post("/api/generate", data={"key": key, "output_format": "jpeg"})  # different result, same input
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert first.json()["image_url"] == "https://fake.supabase.co/image.webp"
+    assert storage.reads == [key]
+    assert mock_openai_edit.call_count == 2
+    # The model got the downscaled input both times
+    sent = mock_openai_edit.call_args.kwargs["image"]
+    assert max(Image.open(sent).size) <= 512
+
+
+# Test keys we never handed out are refused before touching storage
+@pytest.mark.parametrize("key", ["results/abc.png", "uploads/../secret.png", "uploads/x.jpg"])
+def test_generate_rejects_foreign_keys(storage, key):
+    response = client.post("/api/generate", data={"key": key})
+
+    assert response.status_code == 422
+    assert storage.reads == []
+
+
+# Test a key that was signed but never uploaded gives 404
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_missing_object_returns_404(mock_openai_edit, storage):
+    key = client.post("/api/uploads").json()["key"]
+
+    response = client.post("/api/generate", data={"key": key})
+
+    assert response.status_code == 404
+    mock_openai_edit.assert_not_called()
+
+
+# Test a stored object that is not an image is refused with 415
+@patch("backend.routes.generate.client.images.edit", new_callable=AsyncMock)
+def test_generate_stored_non_image_returns_415(mock_openai_edit, storage):
+    key = upload_direct(storage, b"definitely not a photo")
+
+    response = client.post("/api/generate", data={"key": key})
+
+    assert response.status_code == 415
+    mock_openai_edit.assert_not_called()
+
+
+# Test sending both a file and a key is ambiguous
+def test_generate_rejects_file_and_key(storage):
+    response = client.post(
+        "/api/generate",
+        files={"file": ("dog.jpg", BytesIO(make_image_bytes()), "image/jpeg")},
+        data={"key": "uploads/" + "0" * 32 + ".jpg"}
+    )
+    assert response.status_code == 422
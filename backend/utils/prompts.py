@@ -1,24 +1,129 @@
+import hashlib
 import json
 import os
+import threading
+import time
+from dataclasses import dataclass
 
 # File for storing base prompt and clothing/scenario descriptions
 
 PROMPT_BASE = "Same dog"
 
-# Load JSON once when module loads
-with open(os.path.join(os.path.dirname(__file__), "../assets/prompts.json"), "r", encoding="utf-8") as f:
-    prompt_data = json.load(f)
+PROMPTS_PATH = os.path.join(os.path.dirname(__file__), "../assets/prompts.json")
 
-CLOTHING_DESCRIPTIONS = prompt_data["clothing"]
-SCENARIO_DESCRIPTIONS = prompt_data["scenario"]
+# How often (seconds) to check prompts.json for edits; 0 = on every lookup
+PROMPTS_RELOAD_INTERVAL = float(os.getenv("PROMPTS_RELOAD_INTERVAL", "1.0"))
 
-def build_prompt(scenario: str | None = None, clothing: str | None = None) -> str:
-    clothing_part = CLOTHING_DESCRIPTIONS.get(clothing, "")
-    scenario_part = SCENARIO_DESCRIPTIONS.get(scenario, "")
 
+class UnknownPromptKey(ValueError):
+    pass
+
+
+# Stable id for a prompt's text (whitespace-insensitive), for cache keys
+def prompt_fingerprint(prompt: str) -> str:
+    return hashlib.sha256(" ".join(prompt.split()).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    text: str
+    fingerprint: str
+
+
+def _compose(clothing_part: str, scenario_part: str) -> str:
     prompt = PROMPT_BASE
     if clothing_part:
         prompt += f" {clothing_part}"
     if scenario_part:
         prompt += f" clothes are {scenario_part}"
     return prompt
+
+
+# Every scenario × clothing prompt (either side may be omitted) built once per
+# version of prompts.json. Lookups are a dict get; an unknown key raises
+# instead of quietly sending the bare base prompt to the model. The file is
+# re-read when its mtime changes, so prompt edits go live without a restart;
+# a broken edit is reported and the previous catalog stays in use.
+class PromptCatalog:
+    def __init__(self, path: str = PROMPTS_PATH, reload_interval: float = PROMPTS_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._data: dict | None = None
+        self._prompts: dict[tuple[str | None, str | None], CompiledPrompt] = {}
+        self._mtime: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.version = ""
+        self.reloads = 0
+
+    def _compile(self, data: dict) -> dict:
+        clothing = data.get("clothing")
+        scenario = data.get("scenario")
+        for name, section in (("clothing", clothing), ("scenario", scenario)):
+            if not isinstance(section, dict) or not all(isinstance(v, str) for v in section.values()):
+                raise ValueError(f"{self.path}: '{name}' must map names to prompt text")
+        prompts = {}
+        for clothing_key in [None, *clothing]:
+            for scenario_key in [None, *scenario]:
+                text = _compose(clothing.get(clothing_key, ""), scenario.get(scenario_key, ""))
+                prompts[(scenario_key, clothing_key)] = CompiledPrompt(text, prompt_fingerprint(text))
+        return prompts
+
+    def load(self) -> None:
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw)
+        prompts = self._compile(data)
+        with self._lock:
+            self._data, self._prompts, self._mtime = data, prompts, mtime
+            self.version = hashlib.sha256(raw).hexdigest()[:16]
+        print(f"📝 Prompt catalog {self.version}: {len(prompts)} prompts")
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        if self._data is None:
+            self.load()
+            return
+        try:
+            if os.stat(self.path).st_mtime_ns == self._mtime:
+                return
+            self.load()
+            self.reloads += 1
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Keeping prompt catalog {self.version}, reload failed:", e)
+
+    def data(self) -> dict:
+        self._refresh()
+        return self._data
+
+    def get(self, scenario: str | None = None, clothing: str | None = None) -> CompiledPrompt:
+        self._refresh()
+        compiled = self._prompts.get((scenario, clothing))
+        if compiled is None:
+            if scenario not in self._data["scenario"] and scenario is not None:
+                raise UnknownPromptKey(
+                    f"Unknown scenario '{scenario}' (choose from: {', '.join(self._data['scenario'])})"
+                )
+            raise UnknownPromptKey(
+                f"Unknown clothing '{clothing}' (choose from: {', '.join(self._data['clothing'])})"
+            )
+        return compiled
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._prompts)
+
+
+prompt_catalog = PromptCatalog()
+
+
+def prompt_data() -> dict:
+    return prompt_catalog.data()
+
+
+def build_prompt(scenario: str | None = None, clothing: str | None = None) -> str:
+    return prompt_catalog.get(scenario, clothing).text
@@ -1,5 +1,7 @@
 # backend/vercel_python_entry.py
-from fastapi import FastAPI
+# Keep this import-light: every cold lambda pays for whatever loads here.
+# The OpenAI/Supabase SDKs load on first use; prompts.json is compiled by the
+# app's lifespan at startup (see backend/main.py), not at import.
 from backend.main import app as fastapi_app
 # This is the entry point for Vercel to run the FastAPI application
 app = fastapi_app
@@ -31,7 +31,9 @@ export default function FinalSection({
       // Create and trigger download
       const link = document.createElement('a');
       link.href = url;
-      link.download = 'goodnatured-pup.png';
+      // Backend may return WebP/AVIF/JPEG, so name the file after the actual type
+      const extension = blob.type.split('/')[1] || 'png';
+      link.download = `goodnatured-pup.${extension}`;
       document.body.appendChild(link);
       link.click();
       